@@ -0,0 +1,30 @@
+"""
+Nombre del módulo: S00_CACHE_Manifiesto.py
+
+Descripción:
+Consulta y purga del cache de datos de generar_datos a partir del manifiesto
+({FOLDER_DATOS}/Manifiesto_Cache.csv). La purga borra además los resultados de Etapas/ con más de
+ETAPAS_DIAS_RETENCION días (ver purgar_etapas).
+
+Uso:
+    python S00_CACHE_Manifiesto.py inspeccionar [id_proveedor]
+    python S00_CACHE_Manifiesto.py purgar [id_proveedor]          -> solo artefactos vencidos
+    python S00_CACHE_Manifiesto.py purgar [id_proveedor] --todo   -> todo, incluida la historia de ventas
+"""
+import sys
+
+from funciones_forecast import inspeccionar_cache, purgar_cache, purgar_etapas
+
+if __name__ == "__main__":
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    comando = argumentos[0] if argumentos else 'inspeccionar'
+    id_proveedor = int(argumentos[1]) if len(argumentos) > 1 else None
+
+    if comando == 'inspeccionar':
+        inspeccionar_cache(id_proveedor)
+    elif comando == 'purgar':
+        purgar_cache(id_proveedor, solo_vencidos='--todo' not in sys.argv)
+        purgar_etapas()
+    else:
+        print(f"❌ Comando desconocido: {comando}. Usar 'inspeccionar' o 'purgar'.")
+        sys.exit(1)
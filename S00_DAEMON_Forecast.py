@@ -0,0 +1,146 @@
+"""
+Nombre del módulo: S00_DAEMON_Forecast.py
+
+Descripción:
+Proceso que queda corriendo y reemplaza la programación separada de S10, S20, S30 y S40 en el cron.
+Escucha los avisos de cambio de estado de spl_supply_forecast_execution_execute (LISTEN / NOTIFY; el trigger
+lo instala S00_MIGRACION_Esquema.py) y apenas aparece una ejecución pendiente la despacha a la etapa que corresponde:
+    10 -> pipeline completo en memoria (S00_PIPELINE_Completo.py) hasta 50
+    20 -> S20, 30 -> S30, 40 -> S40 (ejecuciones que quedaron a mitad de camino o vienen de los scripts)
+Cada ejecución se reclama con lease (reclamar_ejecuciones), así pueden correr varios daemons o convivir
+con los scripts en modo --worker sin procesar dos veces la misma.
+
+Si no llegan avisos (trigger no instalado, conexión caída) se sigue con un sondeo adaptativo: DAEMON_SONDEO_MIN
+segundos después de haber trabajado, duplicándose mientras no haya nada hasta DAEMON_SONDEO_MAX.
+Las librerías, el cache de referencia y las conexiones a CONNEXA (pool) quedan cargados entre ejecuciones.
+
+Uso:
+    python S00_DAEMON_Forecast.py
+
+Autor: EWE - Zeetrex
+Fecha de creación: [2026-10-18]
+"""
+import time
+import traceback
+
+from funciones_forecast import (
+    activar_pool_postgres,
+    cerrar_pool_postgres,
+    existe_aviso_estados,
+    abrir_escucha_estados,
+    esperar_avisos_estados,
+    atender_reclamo,
+    prioridad_proveedores,
+    PLANIFICAR_POR_COSTO,
+    get_execution_execute_by_ids,
+    id_trabajador,
+    purgar_etapas,
+    Close_Connection
+)
+from S00_PIPELINE_Completo import procesar_proveedor, PIPELINE_CHECKPOINTS
+from S20_GENERA_FORECAST_Extendido import extender_ejecucion
+from S30_GENERA_Grafico_Detalle import graficar_ejecucion
+from S40_SUBIR_Forecast_Connexa import publicar_fila
+
+from dotenv import dotenv_values
+secrets = dotenv_values(".env")
+
+SONDEO_MIN = float(secrets.get("DAEMON_SONDEO_MIN") or 5)
+SONDEO_MAX = float(secrets.get("DAEMON_SONDEO_MAX") or 300)
+
+def pipeline_reclamadas(fes):
+    # Ejecuciones reclamadas en 10 (ya en 15): todas las del proveedor con una sola carga de datos
+    for (id_proveedor, name), grupo in fes.groupby(["ext_supplier_code", fes["name"].str.split('_ALGO').str[0]], sort=False):
+        procesar_proveedor(id_proveedor, name, grupo, PIPELINE_CHECKPOINTS)
+
+def por_fila(etapa):
+    def procesar(fes):
+        for index, row in fes.iterrows():
+            etapa(row)
+    return procesar
+
+# (estado, rutina, reclamo por proveedor, etapa para el costo estimado). Primero se termina lo que ya
+# está más avanzado; dentro de cada estado se reclama primero el proveedor más costoso.
+ETAPAS = [
+    (40, por_fila(publicar_fila), False, 'S40'),
+    (30, por_fila(graficar_ejecucion), False, 'S30'),
+    (20, por_fila(extender_ejecucion), False, 'S20'),
+    (10, pipeline_reclamadas, True, 'pipeline'),
+]
+
+def prioridades():
+    # Orden de reclamo de cada estado (del proveedor más costoso al menos costoso): una vez por ciclo de sondeo
+    if not PLANIFICAR_POR_COSTO:
+        return {}
+    return {status: prioridad_proveedores(status, etapa) for status, _, _, etapa in ETAPAS}
+
+def despachar(owner, fallidas, ordenes):
+    # Atiende un reclamo de cada etapa. Retorna la cantidad de ejecuciones atendidas.
+    atendidas = 0
+    for status, procesar, por_proveedor, etapa in ETAPAS:
+        fes = atender_reclamo(status, procesar, por_proveedor, owner, excluir=fallidas, etapa=etapa,
+                              orden=ordenes.get(status) or [])
+        if fes is None or fes.empty:
+            continue
+        atendidas += len(fes)
+
+        # Las que siguen en el mismo estado fallaron: no se reintentan en este proceso (evita un loop de errores)
+        estado = get_execution_execute_by_ids(fes['forecast_execution_execute_id'].tolist())
+        if estado is not None:
+            sin_avance = estado.loc[estado['fee_status_id'] == status, 'forecast_execution_execute_id'].astype(str)
+            for exec_id in sin_avance:
+                print(f"⚠️ La ejecución {exec_id} sigue en estado {status}: no se reintenta hasta reiniciar el daemon")
+            fallidas.update(sin_avance)
+    return atendidas
+
+# Punto de entrada
+if __name__ == "__main__":
+    owner = id_trabajador()
+    print(f"🕒 Iniciando daemon de FORECAST ({owner}) ...")
+    activar_pool_postgres()
+    # Sin trigger no llegan avisos: solo sondeo (no se instala desde acá, ver S00_MIGRACION_Esquema.py)
+    con_avisos = existe_aviso_estados()
+    if not con_avisos:
+        print("⚠️ Trigger de aviso no instalado (correr S00_MIGRACION_Esquema.py): se sigue solo con el sondeo")
+    escucha = abrir_escucha_estados() if con_avisos else None
+
+    espera = SONDEO_MIN
+    fallidas = set()
+    ultima_purga = 0
+    ordenes = None
+    try:
+        while True:
+            try:
+                # Retención de Etapas/: una vez por día
+                if time.time() - ultima_purga > 86400:
+                    purgar_etapas()
+                    ultima_purga = time.time()
+                if ordenes is None:
+                    ordenes = prioridades()
+                if despachar(owner, fallidas, ordenes):
+                    espera = SONDEO_MIN
+                    continue
+            except Exception as e:
+                traceback.print_exc()
+                print(f"❌ Error despachando ejecuciones: {e}")
+
+            # Ciclo nuevo después de la espera: se vuelven a calcular las prioridades
+            ordenes = None
+
+            inicio = time.time()
+            avisos = esperar_avisos_estados(escucha, espera)
+            if avisos is None:
+                # Sin escucha: se sigue con el sondeo y, si hay trigger, se intenta volver a suscribir
+                Close_Connection(escucha)
+                escucha = abrir_escucha_estados() if con_avisos else None
+                espera = min(espera * 2, SONDEO_MAX)
+            elif avisos:
+                print(f"🔔 {len(avisos)} avisos de cambio de estado ({round(time.time() - inicio, 1)} s de espera)")
+                espera = SONDEO_MIN
+            else:
+                espera = min(espera * 2, SONDEO_MAX)
+    except KeyboardInterrupt:
+        print("🛑 Daemon detenido")
+    finally:
+        Close_Connection(escucha)
+        cerrar_pool_postgres()
@@ -0,0 +1,89 @@
+"""
+Nombre del módulo: S00_MIGRACION_Esquema.py
+
+Descripción:
+Cambios de esquema en CONNEXA (PostgreSQL) que necesitan los procesos de forecast. Se corre UNA vez,
+a mano, con un usuario con permisos de DDL; los procesos solo verifican que los objetos existan.
+Cada migración es idempotente (IF NOT EXISTS / OR REPLACE): volver a correr el script no rompe nada.
+
+Objetos que agrega (no se modifica ninguna tabla de CONNEXA):
+    public.spl_supply_forecast_execution_lease   -> dueño y vencimiento de los reclamos (ver reclamar_ejecuciones)
+    public.spl_avisar_estado_execute() y el trigger spl_aviso_estado_execute sobre
+    spl_supply_forecast_execution_execute        -> aviso en CANAL_EJECUCIONES de cada cambio de estado
+                                                    (lo escucha S00_DAEMON_Forecast.py)
+
+Uso:
+    python S00_MIGRACION_Esquema.py
+
+Autor: EWE - Zeetrex
+Fecha de creación: [2026-10-18]
+"""
+import sys
+
+from funciones_forecast import (
+    Open_Conn_Postgres,
+    Close_Connection,
+    CANAL_EJECUCIONES
+)
+
+MIGRACIONES = [
+    ('tabla de leases spl_supply_forecast_execution_lease', [
+        """
+        CREATE TABLE IF NOT EXISTS public.spl_supply_forecast_execution_lease (
+            supply_forecast_execution_execute_id text PRIMARY KEY,
+            owner text NOT NULL,
+            status_from integer NOT NULL,
+            status_to integer NOT NULL,
+            claimed_at timestamp NOT NULL DEFAULT now(),
+            expires_at timestamp NOT NULL
+        )
+        """,
+    ]),
+    ('aviso de cambio de estado (función y trigger spl_aviso_estado_execute)', [
+        f"""
+        CREATE OR REPLACE FUNCTION public.spl_avisar_estado_execute() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CANAL_EJECUCIONES}', json_build_object(
+                'id', NEW.id, 'status', NEW.supply_forecast_execution_status_id)::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        DROP TRIGGER IF EXISTS spl_aviso_estado_execute ON public.spl_supply_forecast_execution_execute
+        """,
+        """
+        CREATE TRIGGER spl_aviso_estado_execute
+        AFTER INSERT OR UPDATE OF supply_forecast_execution_status_id
+        ON public.spl_supply_forecast_execution_execute
+        FOR EACH ROW EXECUTE FUNCTION public.spl_avisar_estado_execute()
+        """,
+    ]),
+]
+
+def aplicar_migraciones():
+    # Cada migración en su propia transacción; se detiene en la primera que falla. Retorna True si aplicó todas.
+    conn = Open_Conn_Postgres()
+    if conn is None:
+        print("❌ No se pudo conectar a CONNEXA")
+        return False
+    try:
+        for nombre, sentencias in MIGRACIONES:
+            try:
+                cur = conn.cursor()
+                for sentencia in sentencias:
+                    cur.execute(sentencia)
+                conn.commit()
+                cur.close()
+                print(f"✅ Migración aplicada: {nombre}")
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Error en la migración '{nombre}': {e}")
+                return False
+        return True
+    finally:
+        Close_Connection(conn)
+
+# Punto de entrada
+if __name__ == "__main__":
+    sys.exit(0 if aplicar_migraciones() else 1)
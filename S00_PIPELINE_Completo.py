@@ -0,0 +1,192 @@
+"""
+Nombre del módulo: S00_PIPELINE_Completo.py
+
+Descripción:
+Lleva cada ejecución en estado 10 por todas las etapas (S10 -> S20 -> S30 -> S40) en un solo proceso,
+pasando los DataFrames en memoria en lugar de grabar y volver a leer los CSV intermedios
+(_Solicitudes_Compra, _Pronostico_Extendido, _Con_Graficos y _FINAL).
+Los estados en CONNEXA se actualizan igual que con los scripts separados: 10 -> 15 -> 20 -> 30 -> 35 -> 40 -> 45 -> 50.
+
+Con PIPELINE_CHECKPOINTS = 'S' en el .env (o --checkpoints) se graban además los CSV de cada etapa,
+así una ejecución que falla a mitad de camino puede seguir con el script de la etapa siguiente.
+Los scripts S10..S40 siguen funcionando por separado sin cambios.
+
+Con --procesos N los proveedores se reparten en N procesos según su costo estimado (el más largo primero,
+al proceso con menos carga; ver planificar_lotes), para que un proveedor grande no quede para el final.
+
+Uso:
+    python S00_PIPELINE_Completo.py [id_proveedor ...] [--checkpoints] [--procesos N]
+
+Autor: EWE - Zeetrex
+Fecha de creación: [2026-10-18]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import traceback
+
+from funciones_forecast import (
+    get_execution_execute_by_status,
+    get_forecast_multiple,
+    generar_datos_lote,
+    EXTRACCION_LOTE,
+    update_execution_execute,
+    indexar_ventas_graficos,
+    leer_cache,
+    COLUMNAS_VENTAS,
+    estimar_costo,
+    registrar_tiempo,
+    costos_por_proveedor,
+    ordenar_grupos_por_costo,
+    planificar_lotes,
+    purgar_etapas
+)
+from S10_GENERA_FORECAST_Planificado import leer_parametros
+from S20_GENERA_FORECAST_Extendido import extender_datos_forecast
+from S30_GENERA_Grafico_Detalle import insertar_graficos_forecast
+from S40_SUBIR_Forecast_Connexa import publicar_ejecucion
+
+from dotenv import dotenv_values
+secrets = dotenv_values(".env")
+folder = secrets["FOLDER_DATOS"]
+
+PIPELINE_CHECKPOINTS = (secrets.get("PIPELINE_CHECKPOINTS") or 'N').upper() == 'S'
+
+def registrar_error(name, execution_id, etapa, e):
+    traceback.print_exc()
+    print(f"❌ Error en {etapa} de {name}: {e}")
+    with open(os.path.join(folder, "errores_pipeline.log"), "a", encoding="utf-8") as log_file:
+        log_file.write(f"[{name}] ID: {execution_id} - {etapa} - ERROR: {str(e)}\n")
+
+def completar_ejecucion(ejecucion, df_forecast, df_ventas, indice_graficos, checkpoint):
+    # Etapas S20, S30 y S40 de una ejecución cuyo forecast (S10) ya está en memoria
+    algoritmo = ejecucion['name']
+    name = algoritmo.split('_ALGO')[0]
+    id_proveedor = ejecucion['id_proveedor']
+    fee_id = ejecucion['forecast_execution_execute_id']
+
+    # S20: datos extendidos (20 -> 30)
+    df_extendido = extender_datos_forecast(algoritmo, name, id_proveedor, df_forecast)
+    # Las columnas categóricas del cache Parquet pasan a texto, como quedan al releer el CSV (S30 y S40 hacen fillna(0))
+    categoricas = df_extendido.select_dtypes('category').columns
+    df_extendido[categoricas] = df_extendido[categoricas].astype(object)
+    if checkpoint:
+        df_extendido.to_csv(f"{folder}/{algoritmo}_Pronostico_Extendido.csv", index=False)
+    update_execution_execute(fee_id, supply_forecast_execution_status_id=30)
+
+    # S30: gráficos de detalle (30 -> 35 -> 40)
+    update_execution_execute(fee_id, supply_forecast_execution_status_id=35)
+    df_graficos = insertar_graficos_forecast(algoritmo, name, id_proveedor, df_extendido, df_ventas, indice_graficos, checkpoint)
+    if checkpoint:
+        df_graficos.to_csv(f"{folder}/{algoritmo}_Pronostico_Extendido_FINAL.csv", index=False)
+    update_execution_execute(fee_id, supply_forecast_execution_status_id=40)
+
+    # S40: publicación (40 -> 45 -> 50). El gráfico se pasa como texto, igual que cuando
+    # S40 lo lee del _FINAL.csv, para que CONNEXA reciba exactamente el mismo contenido.
+    df_graficos['GRAFICO'] = df_graficos['GRAFICO'].map(str)
+    publicar_ejecucion(algoritmo, name, id_proveedor, fee_id, ejecucion['supplier_id'],
+                       df_graficos, df_ventas, checkpoint)
+
+def procesar_proveedor(id_proveedor, name, grupo, checkpoint):
+    print(f"Procesando proveedor: {name} - Ejecuciones: {len(grupo)}")
+    start_time = time.time()
+    estimacion = estimar_costo('pipeline', id_proveedor, name, grupo['method'].tolist())
+
+    # S10: todas las ejecuciones del proveedor con una sola carga de datos (10 -> 15 -> 20)
+    ejecuciones = []
+    for index, row in grupo.iterrows():
+        try:
+            ventana, f1, f2, f3 = leer_parametros(row["forecast_model_id"], row["forecast_execution_id"])
+            update_execution_execute(row["forecast_execution_execute_id"], supply_forecast_execution_status_id=15)
+            ejecuciones.append({'algoritmo': row["method"], 'ventana': ventana, 'f1': f1, 'f2': f2, 'f3': f3,
+                                'forecast_execution_execute_id': row["forecast_execution_execute_id"],
+                                'name': row["name"], 'id_proveedor': id_proveedor, 'supplier_id': row["supplier_id"],
+                                'forecast_execution_id': row["forecast_execution_id"]})
+        except Exception as e:
+            print(f"❌ Error preparando la ejecución {row['name']}: {e}")
+    if not ejecuciones:
+        return
+
+    publicadas = 0
+    resultados = get_forecast_multiple(id_proveedor, name, ejecuciones, checkpoint=checkpoint)
+
+    # Historia de ventas e índice de gráficos: una sola vez para todas las ejecuciones del proveedor
+    df_ventas = indice_graficos = None
+    for ejecucion, resultado in zip(ejecuciones, resultados):
+        if not resultado['ok']:
+            print(f"❌ FORECAST : {ejecucion['name']} con error: {resultado['error']}")
+            continue
+        update_execution_execute(ejecucion['forecast_execution_execute_id'], supply_forecast_execution_status_id=20)
+        print(f"✅ FORECAST : {ejecucion['name']} procesado - Tiempo: {resultado['segundos']} segundos")
+        try:
+            if df_ventas is None:
+                df_ventas = leer_cache(f'{name}_Ventas', COLUMNAS_VENTAS)
+                indice_graficos = indexar_ventas_graficos(df_ventas)
+            completar_ejecucion(ejecucion, resultado['forecast'], df_ventas, indice_graficos, checkpoint)
+            publicadas += 1
+            print(f"✅ {ejecucion['name']} publicado - Tiempo parcial: {round(time.time() - start_time, 2)} segundos")
+        except Exception as e:
+            registrar_error(ejecucion['name'], ejecucion['forecast_execution_id'], 'pipeline', e)
+
+    registrar_tiempo('pipeline', id_proveedor, name, grupo['method'].tolist(), estimacion,
+                     time.time() - start_time, ok=publicadas == len(grupo))
+    print(f"✅ Pipeline completado para {name} - Tiempo: {round(time.time() - start_time, 2)} segundos")
+
+def leer_argumentos(argumentos=None):
+    parser = argparse.ArgumentParser(description='Pipeline completo en memoria (S10 -> S40) de las ejecuciones en estado 10.')
+    parser.add_argument('proveedores', nargs='*', type=int, help='códigos de proveedor a procesar (por defecto todos)')
+    parser.add_argument('--checkpoints', action='store_true', help='grabar además los CSV de cada etapa')
+    parser.add_argument('--procesos', type=int, default=1, help='procesos entre los que se reparten los proveedores')
+    args = parser.parse_args(argumentos)
+    if args.procesos < 1:
+        parser.error('--procesos debe ser al menos 1')
+    return args
+
+# Punto de entrada
+if __name__ == "__main__":
+    args = leer_argumentos()
+    checkpoint = PIPELINE_CHECKPOINTS or args.checkpoints
+    procesos = args.procesos
+    proveedores = set(args.proveedores)
+    print(f"🕒 Iniciando pipeline completo en memoria (checkpoints: {'SI' if checkpoint else 'NO'}) ...")
+    try:
+        purgar_etapas()
+        fes = get_execution_execute_by_status(10)
+        fes = fes[fes["fee_status_id"] == 10]
+        if proveedores:
+            fes = fes[fes["ext_supplier_code"].astype(int).isin(proveedores)]
+
+        # Un solo proceso: del proveedor más costoso al menos costoso (PLANIFICAR_POR_COSTO), como el daemon
+        grupos = ordenar_grupos_por_costo(fes, 'pipeline')
+
+        # Varios procesos: cada uno corre este mismo script con su lote de proveedores
+        if procesos > 1 and len(grupos) > 1:
+            costos = costos_por_proveedor(fes, 'pipeline').groupby('ext_supplier_code', sort=False)['estimado_seg'].sum()
+            lotes, cargas = planificar_lotes(list(costos.items()), procesos)
+            hijos = [subprocess.Popen([sys.executable, os.path.abspath(__file__), *map(str, lote)] +
+                                      (['--checkpoints'] if checkpoint else []))
+                     for lote in lotes if lote]
+            for hijo in hijos:
+                hijo.wait()
+            sys.exit(0)
+
+        # Extracción en lote: una consulta por tabla de origen para todos los proveedores pendientes
+        if EXTRACCION_LOTE and len(grupos) > 1:
+            try:
+                pedidos = []
+                for (id_proveedor, name), grupo in grupos:
+                    primera = grupo.iloc[0]
+                    pedidos.append((id_proveedor, name, leer_parametros(primera["forecast_model_id"], primera["forecast_execution_id"])[0]))
+                generar_datos_lote(pedidos)
+            except Exception as e:
+                print(f"⚠️ Falló la extracción en lote, se sigue proveedor por proveedor: {e}")
+
+        for (id_proveedor, name), grupo in grupos:
+            try:
+                procesar_proveedor(id_proveedor, name, grupo, checkpoint)
+            except Exception as e:
+                registrar_error(name, id_proveedor, 'S10', e)
+    except Exception as e:
+        print(f"❌ Error general al iniciar el pipeline: {e}")
@@ -13,6 +13,7 @@ Autor: EWE - Zeetrex
 Fecha de creación: [2025-05-23]
 """
 import pandas as pd
+import sys
 import time
 from datetime import datetime
 
@@ -27,116 +28,123 @@ from funciones_forecast import (
     Procesar_ALGO_05,
     Procesar_ALGO_06,    
     generar_datos,    
+    generar_datos_lote,
+    EXTRACCION_LOTE,
     get_execution_execute_by_status,
     get_full_parameters,
     update_execution,
-    update_execution_execute
+    update_execution_execute,
+    drenar_cola,
+    estimar_costo,
+    ordenar_grupos_por_costo,
+    registrar_tiempo
 )
 
 # FUNCIONES LOCALES
-# RUTINA PRINCIPAL para obtener el pronóstico
-def get_forecast( id_proveedor, lbl_proveedor, period_lengh=30, algorithm='basic', f1=None, f2=None, f3=None, current_date=None ):
-    """
-    Genera la predicción de demanda según el algoritmo seleccionado.
-
-    Parámetros:
-    - id_proveedor: ID del proveedor.
-    - lbl_proveedor: Etiqueta del proveedor.
-    - period_lengh: Número de días del período a analizar (por defecto 30).
-    - algorithm: Algoritmo a utilizar.
-    - current_date: Fecha de referencia; si es None, se toma la fecha máxima de los datos.
-    - factores de ponderación: F1, F2, F3  (No importa en que unidades estén, luego los hace relativos al total del peso)
-
-    Retorna:
-    - Un DataFrame con las predicciones.
-    """
-    
-    print('Dentro del get_forecast')
-    print(f'FORECAST control: {id_proveedor} - {lbl_proveedor} - ventana: {period_lengh} - {algorithm} factores: {f1} - {f2} - {f3}')
-    # Generar los datos de entrada
-    data, articulos = generar_datos(id_proveedor, lbl_proveedor, period_lengh)
-
-    # Determinar la fecha base
-    if current_date is None:
-        current_date = data['Fecha'].max()  # Se toma la última fecha en los datos
-    else:
-        current_date = pd.to_datetime(current_date)  # Se asegura que sea un objeto datetime
-    print(f'Fecha actual {current_date}')
-    
-
-    # Selección del algoritmo de predicción
-    match algorithm:
-        case 'ALGO_01':
-            return Procesar_ALGO_01(data, id_proveedor, lbl_proveedor, period_lengh, current_date, f1, f2, f3)  # Promedio Ponderado x 3 Factores
-        case 'ALGO_02':
-            return Procesar_ALGO_02(data, id_proveedor, lbl_proveedor, period_lengh, current_date) # Doble Exponencial - Modelo Holt (Tendencia)
-        case 'ALGO_03':
-            return Procesar_ALGO_03(data, id_proveedor, lbl_proveedor, period_lengh, current_date, f1, f2, f3) # Triple Exponencial Holt-WInter (Tendencia + Estacionalidad) (periodos, add, add)
-        case 'ALGO_04':
-            return Procesar_ALGO_04(data, id_proveedor, lbl_proveedor, period_lengh, current_date, f1) # EWMA con Factor alpha
-        case 'ALGO_05':
-            return Procesar_ALGO_05(data, id_proveedor, lbl_proveedor, period_lengh, current_date) # Promedio Venta Simple en Ventana
-        case 'ALGO_06':
-            return Procesar_ALGO_06(data, id_proveedor, lbl_proveedor, period_lengh, current_date) # Tendencias Ventas Semanales
-        case _:
-            raise ValueError(f"Error: El algoritmo '{algorithm}' no está implementado.")
+def leer_parametros(supply_forecast_model_id, execution_id):
+    # Ventana y factores de la ejecución (por posición, como se cargan en CONNEXA)
+    df_params = get_full_parameters(supply_forecast_model_id, execution_id) 
+    ventana = 30
+    f1 = f2 = f3 = None
+
+    try:
+        if df_params is not None and not df_params.empty:
+            if len(df_params) >= 1:
+                ventana = int(float(df_params.iloc[0]['value']))
+            if len(df_params) >= 2:
+                f1 = df_params.iloc[1]['value']
+            if len(df_params) >= 3:
+                f2 = df_params.iloc[2]['value']
+            if len(df_params) >= 4:
+                f3 = df_params.iloc[3]['value']
+    except Exception as e:
+        print(f"⚠️ Error interpretando parámetros: {e}")
+        ventana = 30
+        f1 = f2 = f3 = None
+    return ventana, f1, f2, f3
+
+def procesar_grupo(id_proveedor, name, grupo):
+    # Todas las ejecuciones de un mismo proveedor se resuelven con una sola carga de datos
+    print(f"Procesando proveedor: {name} - Ejecuciones: {len(grupo)}")
+    start_time = time.time()
+    estimacion = estimar_costo('S10', id_proveedor, name, grupo['method'].tolist())
+
+    ejecuciones = []
+    for index, row in grupo.iterrows():
+        try:
+            ventana, f1, f2, f3 = leer_parametros(row["forecast_model_id"], row["forecast_execution_id"])
+            update_execution_execute(row["forecast_execution_execute_id"], supply_forecast_execution_status_id=15)
+            ejecuciones.append({'algoritmo': row["method"], 'ventana': ventana, 'f1': f1, 'f2': f2, 'f3': f3,
+                                'forecast_execution_execute_id': row["forecast_execution_execute_id"],
+                                'name': row["name"]})
+        except Exception as e:
+            print(f"❌ Error preparando la ejecución {row['name']}: {e}")
+
+    if not ejecuciones:
+        return
+
+    try:
+        ## RUTINA PRINCIPAL
+        resultados = get_forecast(id_proveedor, name, algorithm=ejecuciones)
+        registrar_tiempo('S10', id_proveedor, name, grupo['method'].tolist(), estimacion,
+                         time.time() - start_time, ok=all(r['ok'] for r in resultados) and len(ejecuciones) == len(grupo))
+
+        for ejecucion, resultado in zip(ejecuciones, resultados):
+            if resultado['ok']:
+                update_execution_execute(ejecucion['forecast_execution_execute_id'], supply_forecast_execution_status_id=20)
+                print(f"✅ FORECAST : {ejecucion['name']} procesado - Tiempo: {resultado['segundos']} segundos")
+            else:
+                print(f"❌ FORECAST : {ejecucion['name']} con error: {resultado['error']}")
+
+        elapsed = round(time.time() - start_time, 2)
+        print(f"✅ Ejecución completada para {name} - Tiempo parcial: {elapsed} segundos")
+    except Exception as e:
+        print(f"❌ Error durante la ejecución del forecast: {e}")
+
+def agrupar_por_proveedor(fes):
+    return fes.groupby(["ext_supplier_code", fes["name"].str.split('_ALGO').str[0]], sort=False)
+
+def procesar_reclamadas(fes):
+    # Modo --worker: las ejecuciones ya vienen reclamadas en estado 15 (todas las del proveedor)
+    for (id_proveedor, name), grupo in agrupar_por_proveedor(fes):
+        procesar_grupo(id_proveedor, name, grupo)
 
 #----------------------------------------------------------------
 # RUTINA PRINCIPAL
 #----------------------------------------------------------------       
 
 if __name__ == "__main__":
+    # Con --worker se pueden lanzar varios procesos en paralelo: cada uno reclama un proveedor
+    # por vez (10 -> 15 con lease) y los demás no lo ven más en estado 10.
+    if '--worker' in sys.argv:
+        print("🕒 Iniciando worker del FORECAST ...")
+        drenar_cola(10, procesar_reclamadas, por_proveedor=True)
+        sys.exit(0)
+
     # Aquí se inicia la ejecución programada del pronóstico
     print("🕒 Iniciando ejecución programada del FORECAST ...")
     try:
         # Ejecuta la rutina completa
         fes = get_execution_execute_by_status(10)
-        for index, row in fes[fes["fee_status_id"] == 10].iterrows():
-            algoritmo = row["name"]
-            name = algoritmo.split('_ALGO')[0]
-            method = row["method"]
-            execution_id = row["forecast_execution_id"]
-            id_proveedor = row["ext_supplier_code"]
-            forecast_execution_execute_id = row["forecast_execution_execute_id"]
-            supplier_id = row["supplier_id"]
-            supply_forecast_model_id = row["forecast_model_id"]
-
-            print(f"Procesando ejecución: {name} - Método: {method}")
-            
-            start_time = time.time()
+        fes = fes[fes["fee_status_id"] == 10]
 
+        # Del proveedor más costoso al menos costoso (PLANIFICAR_POR_COSTO), como el daemon
+        grupos = ordenar_grupos_por_costo(fes, 'S10')
+
+        # Extracción en lote: una consulta por tabla de origen para todos los proveedores pendientes
+        if EXTRACCION_LOTE and len(grupos) > 1:
             try:
-                df_params = get_full_parameters(supply_forecast_model_id, execution_id) 
-                ventana = 30
-                f1 = f2 = f3 = None
-
-                try:
-                    if df_params is not None and not df_params.empty:
-                        if len(df_params) >= 1:
-                            ventana = int(float(df_params.iloc[0]['value']))
-                        if len(df_params) >= 2:
-                            f1 = df_params.iloc[1]['value']
-                        if len(df_params) >= 3:
-                            f2 = df_params.iloc[2]['value']
-                        if len(df_params) >= 4:
-                            f3 = df_params.iloc[3]['value']
-                except Exception as e:
-                    print(f"⚠️ Error interpretando parámetros: {e}")
-                    ventana = 30
-                    f1 = f2 = f3 = None
-                
-                update_execution_execute(forecast_execution_execute_id, supply_forecast_execution_status_id=15)
-                ## RUTINA PRINCIPAL
-                get_forecast(id_proveedor, name, ventana, method, f1, f2, f3)
-                
-                update_execution_execute(forecast_execution_execute_id, supply_forecast_execution_status_id=20)
-                
-                elapsed = round(time.time() - start_time, 2)
-                print(f"✅ FORECAST : {algoritmo} procesado - Tiempo parcial: {elapsed} segundos")
-
-                print("✅ Ejecución completada con éxito.")
+                pedidos = []
+                for (id_proveedor, name), grupo in grupos:
+                    primera = grupo.iloc[0]
+                    ventana = leer_parametros(primera["forecast_model_id"], primera["forecast_execution_id"])[0]
+                    pedidos.append((id_proveedor, name, ventana))
+                generar_datos_lote(pedidos)
             except Exception as e:
-                print(f"❌ Error durante la ejecución del forecast: {e}")
+                print(f"⚠️ Falló la extracción en lote, se sigue proveedor por proveedor: {e}")
+
+        for (id_proveedor, name), grupo in grupos:
+            procesar_grupo(id_proveedor, name, grupo)
     except Exception as e:
         print(f"❌ Error general al iniciar ejecuciones programadas: {e}")
 
@@ -15,7 +15,16 @@ from funciones_forecast import (
     Close_Connection,
     get_execution_execute_by_status,
     update_execution,
-    update_execution_execute
+    update_execution_execute,
+    unir_articulos,
+    mapear_ids,
+    obtener_referencia,
+    clave_etapa,
+    huella_df,
+    huella_artefacto,
+    marca_cache,
+    leer_resultado_etapa,
+    guardar_resultado_etapa
 )
 
 import pandas as pd # uso localmente la lectura de archivos.
@@ -26,44 +35,37 @@ secrets = dotenv_values(".env")
 folder = secrets["FOLDER_DATOS"]
 
 # También podés importar funciones adicionales si tu módulo las necesita
-def extender_datos_forecast(algoritmo, name, id_proveedor):
-    # Recuperar Historial de Ventas
-    df_ventas = pd.read_csv(f'{folder}/{name}_Ventas.csv')
-    df_ventas['Codigo_Articulo']= df_ventas['Codigo_Articulo'].astype(int)
-    df_ventas['Sucursal']= df_ventas['Sucursal'].astype(int)
-    df_ventas['Fecha']= pd.to_datetime(df_ventas['Fecha'])
-
-    # Recuperar Maestro de Artículos
-    articulos = pd.read_csv(f'{folder}/{name}_Articulos.csv')
-
-    # Recuperando Forecast Calculado
-    df_forecast = pd.read_csv(f'{folder}/{algoritmo}_Solicitudes_Compra.csv')
+# Columnas del maestro de artículos que se agregan al forecast
+columnas_seleccionadas = [
+    'C_PROVEEDOR_PRIMARIO', 'C_ARTICULO', 'C_SUCU_EMPR', 'I_PRECIO_VTA', 'I_COSTO_ESTADISTICO',
+    'Q_FACTOR_VTA_SUCU', 'Q_STOCK_UNIDADES', 'Q_STOCK_PESO', 'F_ULTIMA_VTA',
+    'Q_VTA_ULTIMOS_15DIAS', 'Q_VTA_ULTIMOS_30DIAS', 'Q_TRANSF_PEND', 'Q_TRANSF_EN_PREP',
+    'C_FAMILIA', 'C_RUBRO', 'Q_DIAS_CON_STOCK', 'M_OFERTA_SUCU', 'M_HABILITADO_SUCU', 
+    'Q_REPONER', 'Q_REPONER_INCLUIDO_SOBRE_STOCK', 'Q_VENTA_DIARIA_NORMAL', 
+    'Q_DIAS_STOCK', 'Q_DIAS_SOBRE_STOCK', 'Q_DIAS_ENTREGA_PROVEEDOR', 
+    'Q_FACTOR_PROVEEDOR', 'U_PISO_PALETIZADO', 'U_ALTURA_PALETIZADO', 'I_LISTA_CALCULADO'
+]
+
+def extender_datos_forecast(algoritmo, name, id_proveedor, df_forecast=None):
+    # Recuperando Forecast Calculado (df_forecast: el de S10 en memoria, ver S00_PIPELINE_Completo.py)
+    if df_forecast is None:
+        df_forecast = pd.read_csv(f'{folder}/{algoritmo}_Solicitudes_Compra.csv')
+        print(f"-> Datos Recuperados del CACHE: {id_proveedor}, Label: {name}")
     df_forecast.fillna(0)   # Por si se filtró algún missing value
-    print(f"-> Datos Recuperados del CACHE: {id_proveedor}, Label: {name}")
-    
-    conn = Open_Conn_Postgres()
-    
-    # Obtener Sites
-    stores = pd.read_sql("SELECT code, name, id FROM public.fnd_site", conn)
-    stores = stores[pd.to_numeric(stores['code'], errors='coerce').notna()].copy()
-    stores['code'] = stores['code'].astype(int)
-
-    # Obtener Productos
-    products = pd.read_sql("SELECT ext_code, description, id FROM public.fnd_product", conn)
-    products = products[pd.to_numeric(products['ext_code'], errors='coerce').notna()].copy()
-    products['ext_code'] = products['ext_code'].astype(int)
-
-    Close_Connection(conn)
 
-    # Unir con productos y validar
-    df_merged = df_forecast.merge(products, left_on='Codigo_Articulo', right_on='ext_code', how='left')
-    df_merged.rename(columns={'id': 'product_id'}, inplace=True)
-    df_merged.drop(columns=['ext_code', 'description'], inplace=True)
-
-    # Unir con sites y validar
-    df_merged = df_merged.merge(stores, left_on='Sucursal', right_on='code', how='left')
-    df_merged.rename(columns={'id': 'site_id'}, inplace=True)
-    df_merged.drop(columns=['code', 'name'], inplace=True)
+    # Mismo forecast, mismo maestro de artículos y mismas referencias de CONNEXA (productos y sitios)
+    # que una corrida anterior: se retoma el resultado guardado
+    clave = clave_etapa('S20', forecast=huella_df(df_forecast), articulos=huella_artefacto(f'{name}_Articulos'),
+                        columnas=columnas_seleccionadas,
+                        referencias={nombre: obtener_referencia(nombre)['firma'] for nombre in ('productos', 'sitios')})
+    df_guardado = leer_resultado_etapa('S20', clave)
+    if df_guardado is not None:
+        return df_guardado
+    
+    # Productos y sitios de CONNEXA desde el cache de referencia (índices código -> id ya armados)
+    df_merged = df_forecast.copy()
+    df_merged['product_id'] = mapear_ids('productos', df_merged['Codigo_Articulo'])
+    df_merged['site_id'] = mapear_ids('sitios', df_merged['Sucursal'])
 
     # Validación de integridad referencial
     errores = df_merged[df_merged['site_id'].isna() | df_merged['product_id'].isna()]
@@ -77,59 +79,44 @@ def extender_datos_forecast(algoritmo, name, id_proveedor):
         #'Q_BULTOS_PENDIENTE_OC', 'Q_PESO_PENDIENTE_OC', 'Q_UNID_PESO_PEND_RECEP_TRANSF',  
         #'M_FOLDER','C_CLASIFICACION_COMPRA',  'M_BAJA', 'Q_VENTA_ACUM_30',
     
-    # Agregar datos de reposición
-    columnas_seleccionadas = [
-        'C_PROVEEDOR_PRIMARIO', 'C_ARTICULO', 'C_SUCU_EMPR', 'I_PRECIO_VTA', 'I_COSTO_ESTADISTICO',
-        'Q_FACTOR_VTA_SUCU', 'Q_STOCK_UNIDADES', 'Q_STOCK_PESO', 'F_ULTIMA_VTA',
-        'Q_VTA_ULTIMOS_15DIAS', 'Q_VTA_ULTIMOS_30DIAS', 'Q_TRANSF_PEND', 'Q_TRANSF_EN_PREP',
-        'C_FAMILIA', 'C_RUBRO', 'Q_DIAS_CON_STOCK', 'M_OFERTA_SUCU', 'M_HABILITADO_SUCU', 
-        'Q_REPONER', 'Q_REPONER_INCLUIDO_SOBRE_STOCK', 'Q_VENTA_DIARIA_NORMAL', 
-        'Q_DIAS_STOCK', 'Q_DIAS_SOBRE_STOCK', 'Q_DIAS_ENTREGA_PROVEEDOR', 
-        'Q_FACTOR_PROVEEDOR', 'U_PISO_PALETIZADO', 'U_ALTURA_PALETIZADO', 'I_LISTA_CALCULADO'
-    ]
-    df_nuevo = articulos[columnas_seleccionadas].copy()
-    df_nuevo['C_SUCU_EMPR'] = df_nuevo['C_SUCU_EMPR'].astype(int)
-
-    df_merged = df_merged.merge(
-        df_nuevo,
-        left_on=['Sucursal', 'Codigo_Articulo'],
-        right_on=['C_SUCU_EMPR', 'C_ARTICULO'],
-        how='left'
-    )
-    df_merged.drop(columns=['C_SUCU_EMPR', 'C_ARTICULO'], inplace=True)
+    # Agregar datos de reposición desde la dimensión artículo x sucursal (solo las columnas que se agregan)
+    df_merged = unir_articulos(df_merged, name, columnas_seleccionadas)
 
+    guardar_resultado_etapa('S20', clave, df_merged, id_proveedor, marca_cache(f'{name}_Ventas'))
     return df_merged
 
-# Punto de entrada
-if __name__ == "__main__":
-    fes = get_execution_execute_by_status(20)
+def extender_ejecucion(row):
+    algoritmo = row["name"]
+    name = algoritmo.split('_ALGO')[0]
+    execution_id = row["forecast_execution_id"]
+    id_proveedor = row["ext_supplier_code"]
+    forecast_execution_execute_id = row["forecast_execution_execute_id"]
 
-    # Filtrar registros con supply_forecast_execution_status_id = 20  # FORECAST OK
-    for index, row in fes[fes["fee_status_id"] == 20].iterrows():
-        algoritmo = row["name"]
-        name = algoritmo.split('_ALGO')[0]
-        execution_id = row["forecast_execution_id"]
-        id_proveedor = row["ext_supplier_code"]
-        forecast_execution_execute_id = row["forecast_execution_execute_id"]
+    print(f"Algoritmo: {algoritmo}  - Name: {name} exce_id: {execution_id} id: Proveedor {id_proveedor}")
 
-        print(f"Algoritmo: {algoritmo}  - Name: {name} exce_id: {execution_id} id: Proveedor {id_proveedor}")
+    try:
+        df_extendido = extender_datos_forecast(algoritmo, name, id_proveedor)
 
-        try:
-            df_extendido = extender_datos_forecast(algoritmo, name, id_proveedor)
+        # Guardar archivo extendido
+        file_path = f"{folder}/{algoritmo}_Pronostico_Extendido.csv"
+        df_extendido.to_csv(file_path, index=False)
+        print(f"✅ Archivo guardado: {file_path}")
 
-            # Guardar archivo extendido
-            file_path = f"{folder}/{algoritmo}_Pronostico_Extendido.csv"
-            df_extendido.to_csv(file_path, index=False)
-            print(f"✅ Archivo guardado: {file_path}")
+        # Actualizar el estado a 30 sólo si no hubo errores
+        update_execution_execute(forecast_execution_execute_id, supply_forecast_execution_status_id=30)
+        print(f"✅ Estado actualizado a 30 para {execution_id}")
 
-            # Actualizar el estado a 30 sólo si no hubo errores
-            update_execution_execute(forecast_execution_execute_id, supply_forecast_execution_status_id=30)
-            print(f"✅ Estado actualizado a 30 para {execution_id}")
+    except ValueError as ve:
+        print(f"❌ Error VALIDACIÓN {name}: {ve}")
 
-        except ValueError as ve:
-            print(f"❌ Error VALIDACIÓN {name}: {ve}")
+    except Exception as e:
+        print(f"❌ Error procesando {name}: {e}")
 
-        except Exception as e:
-            print(f"❌ Error procesando {name}: {e}")
+# Punto de entrada
+if __name__ == "__main__":
+    fes = get_execution_execute_by_status(20)
 
+    # Filtrar registros con supply_forecast_execution_status_id = 20  # FORECAST OK
+    for index, row in fes[fes["fee_status_id"] == 20].iterrows():
+        extender_ejecucion(row)
 
@@ -11,6 +11,7 @@ Fecha de creación: [2025-03-22]
 """
 import traceback
 import os
+import sys
 import time
 from datetime import datetime
 
@@ -19,7 +20,19 @@ from funciones_forecast import (
     get_execution_execute_by_status,
     update_execution_execute,
     generar_grafico_base64,
-    generar_grafico_json
+    generar_grafico_json,
+    indexar_ventas_graficos,
+    leer_cache,
+    COLUMNAS_VENTAS,
+    drenar_cola,
+    estimar_costo,
+    registrar_tiempo,
+    clave_etapa,
+    huella_df,
+    huella_artefacto,
+    marca_cache,
+    leer_resultado_etapa,
+    guardar_resultado_etapa
 )
 
 import pandas as pd # uso localmente la lectura de archivos.
@@ -30,29 +43,37 @@ secrets = dotenv_values(".env")
 folder = secrets["FOLDER_DATOS"]
 
 # RUTINA MEJORADA, Con RESGUARDO PARCIAL de Trabajo Realizado.
-def insertar_graficos_forecast(algoritmo, name, id_proveedor):
+def insertar_graficos_forecast(algoritmo, name, id_proveedor, df_forecast=None, df_ventas=None, indice_graficos=None, checkpoint=True):
+    # df_forecast / df_ventas / indice_graficos: datos ya en memoria (ver S00_PIPELINE_Completo.py); si faltan se leen del disco.
+    # checkpoint=False no graba ni retoma el resguardo parcial _Con_Graficos.csv
     print("📊 Insertando Gráficos Forecast:   " + name)
     start_time = time.time()
 
     # Paths
-    path_ventas = f'{folder}/{name}_Ventas.csv'
     path_forecast = f'{folder}/{algoritmo}_Pronostico_Extendido.csv'
     path_backup = f'{folder}/{algoritmo}_Pronostico_Extendido_Con_Graficos.csv'
     path_log = f'{folder}/log_graficos_{name}.txt'
 
-    # Cargar historial de ventas
-    df_ventas = pd.read_csv(path_ventas)
-    df_ventas['Codigo_Articulo'] = df_ventas['Codigo_Articulo'].astype(int)
-    df_ventas['Sucursal'] = df_ventas['Sucursal'].astype(int)
-    df_ventas['Fecha'] = pd.to_datetime(df_ventas['Fecha'])
-
     # Cargar forecast extendido
-    df_forecast = pd.read_csv(path_forecast)
+    if df_forecast is None:
+        df_forecast = pd.read_csv(path_forecast)
+        print(f"-> Datos Recuperados del CACHE: {id_proveedor}, Label: {name}")
     df_forecast.fillna(0, inplace=True)
-    print(f"-> Datos Recuperados del CACHE: {id_proveedor}, Label: {name}")
+
+    # Mismo extendido y misma historia de ventas que una corrida anterior: se retoman los gráficos guardados
+    clave_guardado = clave_etapa('S30', extendido=huella_df(df_forecast), ventas=huella_artefacto(f'{name}_Ventas', con_fecha=False))
+    df_guardado = leer_resultado_etapa('S30', clave_guardado)
+    if df_guardado is not None:
+        return df_guardado
+
+    # Cargar historial de ventas
+    if df_ventas is None:
+        df_ventas = leer_cache(f'{name}_Ventas', COLUMNAS_VENTAS)
+    if indice_graficos is None:
+        indice_graficos = indexar_ventas_graficos(df_ventas)    # Una sola pasada sobre las ventas para todos los gráficos
 
     # Verificar si ya existe archivo con avances
-    if os.path.exists(path_backup):
+    if checkpoint and os.path.exists(path_backup):
         df_backup = pd.read_csv(path_backup)
         procesados = set(zip(df_backup['Codigo_Articulo'], df_backup['Sucursal']))
         print(f"🔁 Recuperando avance previo: {len(procesados)} registros ya procesados")
@@ -61,7 +82,9 @@ def insertar_graficos_forecast(algoritmo, name, id_proveedor):
         procesados = set()
 
     nuevos = 0
+    errores = 0
     total = len(df_forecast)
+    filas = []   # Filas nuevas pendientes de agregar a df_backup (un solo concat por resguardo)
 
     for i, row in df_forecast.iterrows():
         clave = (row['Codigo_Articulo'], row['Sucursal'])
@@ -77,15 +100,19 @@ def insertar_graficos_forecast(algoritmo, name, id_proveedor):
                 row['Average'],
                 row['ventas_last'],
                 row['ventas_previous'],
-                row['ventas_same_year']
+                row['ventas_same_year'],
+                indice=indice_graficos
             )
             row_data = row.to_dict()
             row_data['GRAFICO'] = grafico
-            df_backup = pd.concat([df_backup, pd.DataFrame([row_data])], ignore_index=True)
+            filas.append(row_data)
             nuevos += 1
 
             if nuevos % 50 == 0 or i == total - 1:
-                df_backup.to_csv(path_backup, index=False)
+                df_backup = pd.concat([df_backup, pd.DataFrame(filas)], ignore_index=True)
+                filas = []
+                if checkpoint:
+                    df_backup.to_csv(path_backup, index=False)
                 elapsed = round(time.time() - start_time, 2)
                 print(f"🖼️ Procesados {nuevos} nuevos registros ({i+1}/{total}) - Tiempo: {elapsed} seg")
                 with open(path_log, "a", encoding="utf-8") as log:
@@ -95,10 +122,16 @@ def insertar_graficos_forecast(algoritmo, name, id_proveedor):
             print(f"❌ Error procesando gráfico para Art {row['Codigo_Articulo']} - Suc {row['Sucursal']}: {e}")
             with open(path_log, "a", encoding="utf-8") as log:
                 log.write(f"[{datetime.now()}] ERROR Art {row['Codigo_Articulo']} - Suc {row['Sucursal']}: {e}\n")
+            errores += 1
             continue
 
     # Guardar completo al final
-    df_backup.to_csv(path_backup, index=False)
+    if filas:
+        df_backup = pd.concat([df_backup, pd.DataFrame(filas)], ignore_index=True)
+    if checkpoint:
+        df_backup.to_csv(path_backup, index=False)
+    if errores == 0:   # Solo se reutiliza un resultado completo
+        guardar_resultado_etapa('S30', clave_guardado, df_backup, id_proveedor, marca_cache(f'{name}_Ventas'))
     elapsed = round(time.time() - start_time, 2)
     print(f"✅ Finalizado: {name} - Total nuevos: {nuevos} - Tiempo total: {elapsed} segundos")
     with open(path_log, "a", encoding="utf-8") as log:
@@ -106,46 +139,60 @@ def insertar_graficos_forecast(algoritmo, name, id_proveedor):
 
     return df_backup
 
+def graficar_ejecucion(row):
+    algoritmo = row["name"] 
+    name = algoritmo.split('_ALGO')[0]
+    execution_id = row["forecast_execution_id"]
+    id_proveedor = row["ext_supplier_code"]
+    forecast_execution_execute_id = row["forecast_execution_execute_id"]
+
+    print(f"Algoritmo: {algoritmo}  - Name: {name}  exce_id: {execution_id}  Proveedor: {id_proveedor}")
+    inicio = time.time()
+    estimacion = estimar_costo('S30', id_proveedor, name, [row["method"]])
+
+    try:
+        # Estado intermedio: 35 (procesando gráficos)
+        print(f"🛠 Marcando como 'Procesando Gráficos' para {execution_id}")
+        update_execution_execute(forecast_execution_execute_id, supply_forecast_execution_status_id=35)
+        print(f"🛠 Iniciando graficación para {execution_id}...")
+
+        # Generación del dataframe extendido con gráficos
+        df_merged = insertar_graficos_forecast(algoritmo, name, id_proveedor)
+
+        # Guardar el CSV con datos extendidos y gráficos
+        file_path = f"{folder}/{algoritmo}_Pronostico_Extendido_FINAL.csv"
+        df_merged.to_csv(file_path, index=False)
+        print(f"📁 Archivo guardado correctamente: {file_path}")
+
+        # ✅ Solo si todo fue exitoso, actualizamos el estado a 40
+        update_execution_execute(forecast_execution_execute_id, supply_forecast_execution_status_id=40)
+        print(f"✅ Estado actualizado a 40 para {execution_id}")
+        registrar_tiempo('S30', id_proveedor, name, [row["method"]], estimacion, time.time() - inicio)
+
+    except Exception as e:
+        traceback.print_exc()
+        print(f"❌ Error procesando {name}: {e}")
+        registrar_tiempo('S30', id_proveedor, name, [row["method"]], estimacion, time.time() - inicio, ok=False)
+        
+        log_path = os.path.join(folder, "errores_s30.log")
+        with open(log_path, "a", encoding="utf-8") as log_file:
+            log_file.write(f"[{name}] ID: {execution_id} - ERROR: {str(e)}\n")
+
+def graficar_reclamadas(fes):
+    # Modo --worker: las ejecuciones ya vienen reclamadas en estado 35
+    for index, row in fes.iterrows():
+        graficar_ejecucion(row)
+
 # Punto de entrada
 if __name__ == "__main__":
+    # Con --worker se pueden lanzar varios procesos en paralelo (reclamo 30 -> 35 con lease)
+    if '--worker' in sys.argv:
+        drenar_cola(30, graficar_reclamadas)
+        sys.exit(0)
+
     fes = get_execution_execute_by_status(30)
 
     # Filtrar registros con supply_forecast_execution_status_id = 30  #FORECAST con DFATOSK
     for index, row in fes[fes["fee_status_id"].isin([30])].iterrows():
-        algoritmo = row["name"] 
-        name = algoritmo.split('_ALGO')[0]
-        execution_id = row["forecast_execution_id"]
-        id_proveedor = row["ext_supplier_code"]
-        forecast_execution_execute_id = row["forecast_execution_execute_id"]
-
-        print(f"Algoritmo: {algoritmo}  - Name: {name}  exce_id: {execution_id}  Proveedor: {id_proveedor}")
-
-        try:
-            # Estado intermedio: 35 (procesando gráficos)
-            print(f"🛠 Marcando como 'Procesando Gráficos' para {execution_id}")
-            update_execution_execute(forecast_execution_execute_id, supply_forecast_execution_status_id=35)
-            print(f"🛠 Iniciando graficación para {execution_id}...")
-
-            # Generación del dataframe extendido con gráficos
-            df_merged = insertar_graficos_forecast(algoritmo, name, id_proveedor)
-
-            # Guardar el CSV con datos extendidos y gráficos
-            file_path = f"{folder}/{algoritmo}_Pronostico_Extendido_FINAL.csv"
-            df_merged.to_csv(file_path, index=False)
-            print(f"📁 Archivo guardado correctamente: {file_path}")
-
-            # ✅ Solo si todo fue exitoso, actualizamos el estado a 40
-            update_execution_execute(forecast_execution_execute_id, supply_forecast_execution_status_id=40)
-            print(f"✅ Estado actualizado a 40 para {execution_id}")
-
-        except Exception as e:
-            traceback.print_exc()
-            print(f"❌ Error procesando {name}: {e}")
-            
-            log_path = os.path.join(folder, "errores_s30.log")
-            with open(log_path, "a", encoding="utf-8") as log_file:
-                log_file.write(f"[{name}] ID: {execution_id} - ERROR: {str(e)}\n")
-            
-            continue
-
+        graficar_ejecucion(row)
 
@@ -9,7 +9,9 @@ from dotenv import dotenv_values
 from funciones_forecast import (
     get_execution_execute_by_status,
     update_execution_execute,
-    generar_grafico_base64_plotly
+    generar_grafico_base64_plotly,
+    leer_cache,
+    COLUMNAS_VENTAS
 )
 
 secrets = dotenv_values(".env")
@@ -40,15 +42,11 @@ def insertar_graficos_forecast(algoritmo, name, id_proveedor):
     print("📊 Insertando Gráficos Forecast:   " + name)
     start_time = time.time()
 
-    path_ventas = f'{folder}/{name}_Ventas.csv'
     path_forecast = f'{folder}/{algoritmo}_Pronostico_Extendido.csv'
     path_backup = f'{folder}/{algoritmo}_Pronostico_Extendido_Con_Graficos.csv'
     path_log = f'{folder}/log_graficos_{name}.txt'
 
-    df_ventas = pd.read_csv(path_ventas)
-    df_ventas['Codigo_Articulo'] = df_ventas['Codigo_Articulo'].astype(int)
-    df_ventas['Sucursal'] = df_ventas['Sucursal'].astype(int)
-    df_ventas['Fecha'] = pd.to_datetime(df_ventas['Fecha'])
+    df_ventas = leer_cache(f'{name}_Ventas', COLUMNAS_VENTAS)
 
     df_forecast = pd.read_csv(path_forecast)
     df_forecast.fillna(0, inplace=True)
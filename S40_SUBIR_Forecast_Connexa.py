@@ -20,7 +20,6 @@ Fecha de creación: [2025-03-22]
 
 # Solo importar lo necesario desde el módulo de funciones
 from funciones_forecast import (
-    Open_Conn_Postgres,
     mover_archivos_procesados,
     actualizar_site_ids,
     get_precios,
@@ -31,7 +30,11 @@ from funciones_forecast import (
     Open_Postgres_retry,
     id_aleatorio,
     Close_Connection,
-    obtener_datos_stock
+    obtener_datos_stock,
+    obtener_datos_complementarios,
+    drenar_cola,
+    estimar_costo,
+    registrar_tiempo
 )
 
 import pandas as pd # uso localmente la lectura de archivos.
@@ -49,6 +52,7 @@ from random import randint
 from datetime import datetime
 import shutil
 import os
+import sys
 import math
 import time
 from functools import wraps
@@ -231,48 +235,6 @@ def publicar_forecast_a_connexa(df_forecast_ext, forecast_execution_execute_id,
     else:
         print("⚠️ Inserción parcial. Archivos NO fueron movidos.")
 
-def actualizar_site_ids(df_forecast_ext, conn, name):
-    """
-    Reemplaza site_id en df_forecast_ext con datos válidos desde fnd_site.
-    Asegura que no haya conflictos de columnas durante el merge.
-    """
-    query = """
-    SELECT code, name, id FROM public.fnd_site
-    WHERE company_id = 'e7498b2e-2669-473f-ab73-e2c8b4dcc585'
-    ORDER BY code
-    """
-    stores = pd.read_sql(query, conn)
-
-    # Asegurar que el campo 'code' sea numérico y entero
-    stores = stores[pd.to_numeric(stores['code'], errors='coerce').notna()].copy()
-    stores['code'] = stores['code'].astype(int)
-
-    # Eliminar columna 'site_id' si ya existe
-    df_forecast_ext = df_forecast_ext.drop(columns=['site_id'], errors='ignore')
-
-    # Eliminar columna 'code' si ya existe en df_forecast_ext para evitar colisión en el merge
-    if 'code' in df_forecast_ext.columns:
-        df_forecast_ext = df_forecast_ext.drop(columns=['code'])
-
-    # Realizar el merge con stores (fnd_site) para traer el site_id
-    df_forecast_ext = df_forecast_ext.merge(
-        stores[['code', 'id']],
-        left_on='Sucursal',
-        right_on='code',
-        how='left'
-    ).rename(columns={'id': 'site_id'})
-
-    # Validar valores faltantes de site_id
-    missing = df_forecast_ext[df_forecast_ext['site_id'].isna()]
-    if not missing.empty:
-        print(f"⚠️ Faltan site_id en {len(missing)} registros")
-        missing.to_csv(f"{folder}/{name}_Missing_Site_IDs.csv", index=False)
-    else:
-        print("✅ Todos los registros tienen site_id válido")
-
-    return df_forecast_ext
-
-
 def mover_archivos_procesados(algoritmo, folder):
     destino = os.path.join(folder, "procesado")
     os.makedirs(destino, exist_ok=True)  # Crea la carpeta si no existe
@@ -284,156 +246,182 @@ def mover_archivos_procesados(algoritmo, folder):
             shutil.move(origen, destino_final)
             print(f"📁 Archivo movido: {archivo} → {destino_final}")
 
+def publicar_ejecucion(algoritmo, name, id_proveedor, forecast_execution_execute_id, supplier_id,
+                       df_forecast_ext=None, df_ventas=None, checkpoint=True):
+    """
+    Pasos 2 a 4 para una ejecución en estado 40: cabecera (45), detalle y estado 50.
+    - df_forecast_ext / df_ventas: datos ya en memoria (ver S00_PIPELINE_Completo.py); si faltan se leen del disco.
+    - checkpoint: si es False no se vuelve a grabar el _Pronostico_Extendido_FINAL.csv.
+    """
+    # Leer forecast extendido
+    if df_forecast_ext is None:
+        df_forecast_ext = pd.read_csv(f'{folder}/{algoritmo}_Pronostico_Extendido_FINAL.csv')
+        print(f"-> Datos Recuperados del CACHE: {id_proveedor}, Label: {name}")
+    df_forecast_ext['Codigo_Articulo'] = df_forecast_ext['Codigo_Articulo'].astype(int)
+    df_forecast_ext['Sucursal'] = df_forecast_ext['Sucursal'].astype(int)
+    df_forecast_ext.fillna(0, inplace=True)
+    print("❗Filas con site_id inválido:", df_forecast_ext['site_id'].isna().sum())
+    print("❗Filas con product_id inválido:", df_forecast_ext['product_id'].isna().sum())
+
+    # Agregar site_id desde fnd_site (el índice de referencia abre y devuelve su propia conexión si hace falta)
+    df_forecast_ext = actualizar_site_ids(df_forecast_ext, None, name)
+    print(f"-> Se actualizaron los site_ids: {id_proveedor}, Label: {name}")
+
+    # Verificar columnas necesarias después del merge
+    columnas_requeridas = ['I_PRECIO_VTA', 'I_COSTO_ESTADISTICO']
+    for col in columnas_requeridas:
+        if col not in df_forecast_ext.columns:
+            print(f"❌ ERROR: Falta la columna requerida '{col}' en df_forecast_ext para el proveedor {id_proveedor}")
+            df_forecast_ext.to_csv(f"{folder}/{algoritmo}_ERROR_MERGE.csv", index=False)
+            raise ValueError(f"Column '{col}' missing in df_forecast_ext. No se puede continuar.")
+
+    # Hacer merge solo si no existen las columnas de precios y costos
+    if 'I_PRECIO_VTA' not in df_forecast_ext.columns or 'I_COSTO_ESTADISTICO' not in df_forecast_ext.columns:
+        #print(f"❌ ERROR: Falta la columna requerida '{col}' procedemos a actualizar {id_proveedor}")
+        precio = get_precios(id_proveedor, algoritmo)
+        precio['C_ARTICULO'] = precio['C_ARTICULO'].astype(int)
+        precio['C_SUCU_EMPR'] = precio['C_SUCU_EMPR'].astype(int)
+
+        df_forecast_ext = df_forecast_ext.merge(
+            precio,
+            left_on=['Codigo_Articulo', 'Sucursal'],
+            right_on=['C_ARTICULO', 'C_SUCU_EMPR'],
+            how='left'
+        )
+    else:
+        print(f"⚠️ El DataFrame ya contiene precios y costos. Merge evitado para {id_proveedor}")            
+
+    # Cálculo de métricas x Línea en miles
+    df_forecast_ext['Forecast_VENTA'] = (df_forecast_ext['Forecast'] * df_forecast_ext['I_PRECIO_VTA'] / 1000).round(2)
+    df_forecast_ext['Forecast_COSTO'] = (df_forecast_ext['Forecast'] * df_forecast_ext['I_COSTO_ESTADISTICO'] / 1000).round(2)
+    df_forecast_ext['MARGEN'] = (df_forecast_ext['Forecast_VENTA'] - df_forecast_ext['Forecast_COSTO'])
+
+    # Guardar CSV actualizado
+    if checkpoint:
+        file_path = f"{folder}/{algoritmo}_Pronostico_Extendido_FINAL.csv"
+        df_forecast_ext.to_csv(file_path, index=False)
+        print(f"Archivo guardado: {file_path}")
+
+    # Asegurar que los valores son del tipo float (nativo de Python)
+    total_venta = float(round(df_forecast_ext['Forecast_VENTA'].sum() / 1000, 2))
+    total_costo = float(round(df_forecast_ext['Forecast_COSTO'].sum() / 1000, 2))
+    total_margen = float(round(df_forecast_ext['MARGEN'].sum() / 1000, 2))
+    total_productos = df_forecast_ext['Codigo_Articulo'].nunique()
+    total_unidades = float(round(df_forecast_ext['Forecast'].sum() , 0))
+
+    # Mini gráfico
+    mini_grafico = generar_mini_grafico(folder, name, df_ventas)
+
+    # DATOS COMPLEMENTARIOS (stock y OC demoradas se consultan en paralelo)
+    complementarios = obtener_datos_complementarios(id_proveedor, algoritmo, ['stock', 'demora'])
+    df_stock = complementarios['stock']
+    if df_stock is None or df_stock.empty:
+        print(f"⚠️ No se pudo recuperar datos de stock para el proveedor {id_proveedor}. Se omite cálculo de stock.")
+        total_stock_valorizado = 0
+        total_venta_valorizada = 0
+        days = 0
+        semaforo = 'white'
+    else:
+        total_stock_valorizado = float(round(df_stock['Stock_Valorizado'].sum() / 1000000, 2))
+        total_venta_valorizada = float(round(df_stock['Venta_Valorizada'].sum() / 1000000, 2))
+        if total_venta_valorizada == 0:
+            days = 0
+        else:
+            days = int(total_stock_valorizado / total_venta_valorizada * 30)
+
+    # Condiciones Dias de STOCK
+    if days > 30:
+        semaforo= 'green'
+    elif 10 < days <= 30:
+        semaforo ='yellow'
+    elif days <= 10:
+        semaforo ='red'
+    else:
+        semaforo = 'white' # Valor predeterminado
+
+    # DEMORA de OC
+    df_demora = complementarios['demora']
+    if df_demora.empty:  # Verifica si el DataFrame está vacío
+        maximo_atraso_oc = 0
+    else:
+        maximo_atraso_oc = int(round(df_demora['Demora'].max()))
+
+    # ARTICULOS FALTANTES
+    articulos_faltantes = df_stock[df_stock["Stock_Unidades"] == 0]["Codigo_Articulo"].nunique()
+    if articulos_faltantes > 5:
+        quiebres= 'R'
+    elif 1 < articulos_faltantes <= 5:
+        quiebres ='Y'
+    elif articulos_faltantes <= 1:
+        quiebres ='G'
+    else:
+        quiebres = 'white' # Valor predeterminado
+
+    update_execution_execute(
+        forecast_execution_execute_id,
+        supply_forecast_execution_status_id=45,
+        monthly_sales_in_millions=total_venta,
+        monthly_purchases_in_millions=total_costo,
+        monthly_net_margin_in_millions=total_margen,
+        graphic=mini_grafico,
+        total_products=total_productos,
+        total_units=total_unidades,
+        otif = randint(70, 100),  # Simulación de OTIF entre 70 y 100
+        sotck_days = days, # Viene de la Nueva Rutina              
+        sotck_days_colors = semaforo, # Nueva Rutina
+        maximum_backorder_days = maximo_atraso_oc, # Calcula Mäxima Demora
+        contains_breaks = quiebres  # ICONO de FALTANTES
+    )
+
+    ### NUEVA RUTINA BULK            
+    publicar_forecast_a_connexa(df_forecast_ext, forecast_execution_execute_id, id_proveedor, supplier_id, folder, algoritmo, batch_size=500)
+    print(f"-> Detalle Forecast Publicado CONNEXA: {id_proveedor}, Label: {name}")
+
+    # ✅ Actualizar Estado intermedio de Procesamiento....
+    update_execution_execute(forecast_execution_execute_id, supply_forecast_execution_status_id=50)
+    print(f"✅ Estado actualizado a 50 para {forecast_execution_execute_id}")
+
 # --------------------------------
 # Punto de Entrada del Módulo
 # --------------------------------
 
+def publicar_fila(row):
+    algoritmo = row["name"]
+    name = algoritmo.split('_ALGO')[0]
+    id_proveedor = row["ext_supplier_code"]
+    forecast_execution_execute_id = row["forecast_execution_execute_id"]
+    supplier_id = row["supplier_id"]
+
+    print(f"Algoritmo: {algoritmo}  - Name: {name} exce_id: {forecast_execution_execute_id} id: Proveedor {id_proveedor}")
+    print(f"supplier-id: {supplier_id} ----------------------------------------------------")
+    inicio = time.time()
+    estimacion = estimar_costo('S40', id_proveedor, name, [row["method"]])
+
+    try:
+        publicar_ejecucion(algoritmo, name, id_proveedor, forecast_execution_execute_id, supplier_id)
+        registrar_tiempo('S40', id_proveedor, name, [row["method"]], estimacion, time.time() - inicio)
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        print(f"❌ Error procesando {name}: {e}")
+        registrar_tiempo('S40', id_proveedor, name, [row["method"]], estimacion, time.time() - inicio, ok=False)
+
+def publicar_reclamadas(fes):
+    # Modo --worker: las ejecuciones ya vienen reclamadas en estado 45
+    for index, row in fes.iterrows():
+        publicar_fila(row)
+
 if __name__ == "__main__":
+    # Con --worker se pueden lanzar varios procesos en paralelo (reclamo 40 -> 45 con lease)
+    if '--worker' in sys.argv:
+        drenar_cola(40, publicar_reclamadas)
+        sys.exit(0)
 
     # Leer Dataframe de FORECAST EXECUTION LISTOS PARA IMPORTAR A CONNEXA (DE 40 A 50)
     fes = get_execution_execute_by_status(40)
     
     for index, row in fes[fes["fee_status_id"] == 40].iterrows():
-        algoritmo = row["name"]
-        name = algoritmo.split('_ALGO')[0]
-        execution_id = row["forecast_execution_id"]
-        id_proveedor = row["ext_supplier_code"]
-        forecast_execution_execute_id = row["forecast_execution_execute_id"]
-        supplier_id = row["supplier_id"]
-
-        print(f"Algoritmo: {algoritmo}  - Name: {name} exce_id: {forecast_execution_execute_id} id: Proveedor {id_proveedor}")
-        print(f"supplier-id: {supplier_id} ----------------------------------------------------")
-
-        try:
-            # Leer forecast extendido
-            df_forecast_ext = pd.read_csv(f'{folder}/{algoritmo}_Pronostico_Extendido_FINAL.csv')
-            df_forecast_ext['Codigo_Articulo'] = df_forecast_ext['Codigo_Articulo'].astype(int)
-            df_forecast_ext['Sucursal'] = df_forecast_ext['Sucursal'].astype(int)
-            df_forecast_ext.fillna(0, inplace=True)
-            print(f"-> Datos Recuperados del CACHE: {id_proveedor}, Label: {name}")
-            print("❗Filas con site_id inválido:", df_forecast_ext['site_id'].isna().sum())
-            print("❗Filas con product_id inválido:", df_forecast_ext['product_id'].isna().sum())
-
-            # Agregar site_id desde fnd_site
-            conn = Open_Conn_Postgres()
-            df_forecast_ext = actualizar_site_ids(df_forecast_ext, conn, name)
-            print(f"-> Se actualizaron los site_ids: {id_proveedor}, Label: {name}")
-            
-            # Verificar columnas necesarias después del merge
-            columnas_requeridas = ['I_PRECIO_VTA', 'I_COSTO_ESTADISTICO']
-            for col in columnas_requeridas:
-                if col not in df_forecast_ext.columns:
-                    print(f"❌ ERROR: Falta la columna requerida '{col}' en df_forecast_ext para el proveedor {id_proveedor}")
-                    df_forecast_ext.to_csv(f"{folder}/{algoritmo}_ERROR_MERGE.csv", index=False)
-                    raise ValueError(f"Column '{col}' missing in df_forecast_ext. No se puede continuar.")
-            
-            # Hacer merge solo si no existen las columnas de precios y costos
-            if 'I_PRECIO_VTA' not in df_forecast_ext.columns or 'I_COSTO_ESTADISTICO' not in df_forecast_ext.columns:
-                #print(f"❌ ERROR: Falta la columna requerida '{col}' procedemos a actualizar {id_proveedor}")
-                precio = get_precios(id_proveedor)
-                precio['C_ARTICULO'] = precio['C_ARTICULO'].astype(int)
-                precio['C_SUCU_EMPR'] = precio['C_SUCU_EMPR'].astype(int)
-
-                df_forecast_ext = df_forecast_ext.merge(
-                    precio,
-                    left_on=['Codigo_Articulo', 'Sucursal'],
-                    right_on=['C_ARTICULO', 'C_SUCU_EMPR'],
-                    how='left'
-                )
-            else:
-                print(f"⚠️ El DataFrame ya contiene precios y costos. Merge evitado para {id_proveedor}")            
-
-            # Cálculo de métricas x Línea en miles
-            df_forecast_ext['Forecast_VENTA'] = (df_forecast_ext['Forecast'] * df_forecast_ext['I_PRECIO_VTA'] / 1000).round(2)
-            df_forecast_ext['Forecast_COSTO'] = (df_forecast_ext['Forecast'] * df_forecast_ext['I_COSTO_ESTADISTICO'] / 1000).round(2)
-            df_forecast_ext['MARGEN'] = (df_forecast_ext['Forecast_VENTA'] - df_forecast_ext['Forecast_COSTO'])
-
-            # Guardar CSV actualizado
-            file_path = f"{folder}/{algoritmo}_Pronostico_Extendido_FINAL.csv"
-            df_forecast_ext.to_csv(file_path, index=False)
-            print(f"Archivo guardado: {file_path}")
-            
-            # Asegurar que los valores son del tipo float (nativo de Python)
-            total_venta = float(round(df_forecast_ext['Forecast_VENTA'].sum() / 1000, 2))
-            total_costo = float(round(df_forecast_ext['Forecast_COSTO'].sum() / 1000, 2))
-            total_margen = float(round(df_forecast_ext['MARGEN'].sum() / 1000, 2))
-            total_productos = df_forecast_ext['Codigo_Articulo'].nunique()
-            total_unidades = float(round(df_forecast_ext['Forecast'].sum() , 0))
-
-            # Mini gráfico
-            mini_grafico = generar_mini_grafico(folder, name)
-
-            # DATOS COMPLEMENTARIOS
-            df_stock = obtener_datos_stock(id_proveedor= id_proveedor, etiqueta= algoritmo )
-            if df_stock is None or df_stock.empty:
-                print(f"⚠️ No se pudo recuperar datos de stock para el proveedor {id_proveedor}. Se omite cálculo de stock.")
-                total_stock_valorizado = 0
-                total_venta_valorizada = 0
-                days = 0
-                semaforo = 'white'
-            else:
-                total_stock_valorizado = float(round(df_stock['Stock_Valorizado'].sum() / 1000000, 2))
-                total_venta_valorizada = float(round(df_stock['Venta_Valorizada'].sum() / 1000000, 2))
-                if total_venta_valorizada == 0:
-                    days = 0
-                else:
-                    days = int(total_stock_valorizado / total_venta_valorizada * 30)
-
-            # Condiciones Dias de STOCK
-            if days > 30:
-                semaforo= 'green'
-            elif 10 < days <= 30:
-                semaforo ='yellow'
-            elif days <= 10:
-                semaforo ='red'
-            else:
-                semaforo = 'white' # Valor predeterminado
-
-            # DEMORA de OC
-            df_demora = obtener_demora_oc(id_proveedor= id_proveedor, etiqueta= algoritmo )
-            if df_demora.empty:  # Verifica si el DataFrame está vacío
-                maximo_atraso_oc = 0
-            else:
-                maximo_atraso_oc = int(round(df_demora['Demora'].max()))
-            
-            # ARTICULOS FALTANTES
-            articulos_faltantes = df_stock[df_stock["Stock_Unidades"] == 0]["Codigo_Articulo"].nunique()
-            if articulos_faltantes > 5:
-                quiebres= 'R'
-            elif 1 < articulos_faltantes <= 5:
-                quiebres ='Y'
-            elif articulos_faltantes <= 1:
-                quiebres ='G'
-            else:
-                quiebres = 'white' # Valor predeterminado
-                                    
-            update_execution_execute(
-                forecast_execution_execute_id,
-                supply_forecast_execution_status_id=45,
-                monthly_sales_in_millions=total_venta,
-                monthly_purchases_in_millions=total_costo,
-                monthly_net_margin_in_millions=total_margen,
-                graphic=mini_grafico,
-                total_products=total_productos,
-                total_units=total_unidades,
-                otif = randint(70, 100),  # Simulación de OTIF entre 70 y 100
-                sotck_days = days, # Viene de la Nueva Rutina              
-                sotck_days_colors = semaforo, # Nueva Rutina
-                maximum_backorder_days = maximo_atraso_oc, # Calcula Mäxima Demora
-                contains_breaks = quiebres  # ICONO de FALTANTES
-            )
-            
-            ### NUEVA RUTINA BULK            
-            publicar_forecast_a_connexa(df_forecast_ext, forecast_execution_execute_id, id_proveedor, supplier_id, folder, algoritmo, batch_size=500)
-            print(f"-> Detalle Forecast Publicado CONNEXA: {id_proveedor}, Label: {name}")
-                        
-            # ✅ Actualizar Estado intermedio de Procesamiento....
-            update_execution_execute(forecast_execution_execute_id, supply_forecast_execution_status_id=50)
-            print(f"✅ Estado actualizado a 50 para {execution_id}")
-
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            print(f"❌ Error procesando {name}: {e}")
+        publicar_fila(row)
             
 # --------------------------------
\ No newline at end of file
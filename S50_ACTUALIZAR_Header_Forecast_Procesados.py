@@ -17,7 +17,9 @@ from funciones_forecast import (
     update_execution_execute,
     generar_mini_grafico,
     Open_Connection,
-    Close_Connection
+    Close_Connection,
+    consultar_en_paralelo,
+    obtener_datos_stock
 )
 
 import pandas as pd # uso localmente la lectura de archivos.
@@ -46,73 +48,6 @@ def mover_archivos_procesados(algoritmo, folder):
             shutil.move(origen, destino_final)
             print(f"📁 Archivo movido: {archivo} → {destino_final}")
             
-def obtener_datos_stock(id_proveedor, etiqueta):
-    secrets = dotenv_values(".env")   # Connection String from .env
-    folder = secrets["FOLDER_DATOS"]
-    
-    #  Intento recuperar datos cacheados
-    try:         
-        print(f"-> Generando datos para ID: {id_proveedor}, Label: {etiqueta}")
-        # Configuración de conexión
-        conn = Open_Connection()
-        
-        # ----------------------------------------------------------------
-        # FILTRA solo PRODUCTOS HABILITADOS y Traer datos de STOCK y PENDIENTES desde PRODUCCIÓN
-        # ----------------------------------------------------------------
-        query = f"""              
-        SELECT A.[C_PROVEEDOR_PRIMARIO] as Codigo_Proveedor
-            ,S.[C_ARTICULO] as Codigo_Articulo
-            ,S.[C_SUCU_EMPR] as Codigo_Sucursal
-            ,S.[I_PRECIO_VTA] as Precio_Venta
-            ,S.[I_COSTO_ESTADISTICO] as Precio_Costo
-            ,S.[Q_FACTOR_VTA_SUCU] as Factor_Venta
-            ,ST.Q_UNID_ARTICULO + ST.Q_PESO_ARTICULO AS Stock_Unidades-- Stock Cierre Dia Anterior
-            ,(R.[Q_VENTA_30_DIAS] + R.[Q_VENTA_15_DIAS]) * S.[Q_FACTOR_VTA_SUCU] AS Venta_Unidades_30_Dias -- OJO convertida desde BULTOS DIARCO
-                    
-            ,(ST.Q_UNID_ARTICULO + ST.Q_PESO_ARTICULO)* S.[I_COSTO_ESTADISTICO] AS Stock_Valorizado-- Stock Cierre Dia Anterior
-            ,(R.[Q_VENTA_30_DIAS] + R.[Q_VENTA_15_DIAS]) * S.[Q_FACTOR_VTA_SUCU] * S.[I_COSTO_ESTADISTICO] AS Venta_Valorizada
-
-            ,ROUND(((ST.Q_UNID_ARTICULO + ST.Q_PESO_ARTICULO)* S.[I_COSTO_ESTADISTICO]) / 	
-                ((R.[Q_VENTA_30_DIAS] + R.[Q_VENTA_15_DIAS]+0.0001) * S.[Q_FACTOR_VTA_SUCU] * S.[I_COSTO_ESTADISTICO] ),0) * 30
-                AS Dias_Stock
-                    
-            ,S.[F_ULTIMA_VTA]
-            ,S.[Q_VTA_ULTIMOS_15DIAS] * S.[Q_FACTOR_VTA_SUCU] AS VENTA_UNIDADES_1Q -- OJO esto está en BULTOS DIARCO
-            ,S.[Q_VTA_ULTIMOS_30DIAS] * S.[Q_FACTOR_VTA_SUCU] AS VENTA_UNIDADES_2Q -- OJO esto está en BULTOS DIARCO
-                
-        FROM [DIARCOP001].[DiarcoP].[dbo].[T051_ARTICULOS_SUCURSAL] S
-        INNER JOIN [DIARCOP001].[DiarcoP].[dbo].[T050_ARTICULOS] A
-            ON A.[C_ARTICULO] = S.[C_ARTICULO]
-        LEFT JOIN [DIARCOP001].[DiarcoP].[dbo].[T060_STOCK] ST
-            ON ST.C_ARTICULO = S.[C_ARTICULO] 
-            AND ST.C_SUCU_EMPR = S.[C_SUCU_EMPR]
-        LEFT JOIN [DIARCOP001].[DiarcoP].[dbo].[T710_ESTADIS_REPOSICION] R
-            ON R.[C_ARTICULO] = S.[C_ARTICULO]
-            AND R.[C_SUCU_EMPR] = S.[C_SUCU_EMPR]
-
-        WHERE S.[M_HABILITADO_SUCU] = 'S' -- Permitido Reponer
-            AND A.M_BAJA = 'N'  -- Activo en Maestro Artículos
-            AND A.[C_PROVEEDOR_PRIMARIO] = {id_proveedor} -- Solo del Proveedor
-                        
-        ORDER BY S.[C_ARTICULO],S.[C_SUCU_EMPR];
-        """
-        # Ejecutar la consulta SQL
-        df_stock = pd.read_sql(query, conn)
-        file_path = f'{folder}/{etiqueta}_Stock.csv'
-        df_stock['Codigo_Proveedor']= df_stock['Codigo_Proveedor'].astype(int)
-        df_stock['Codigo_Articulo']= df_stock['Codigo_Articulo'].astype(int)
-        df_stock['Codigo_Sucursal']= df_stock['Codigo_Sucursal'].astype(int)
-        df_stock.fillna(0, inplace= True)
-        # df_stock.to_csv(file_path, index=False, encoding='utf-8')        
-        print(f"---> Datos de STOCK guardados: {file_path}")
-        return df_stock
-    except Exception as e:
-        print(f"Error en get_execution: {e}")
-        return None
-    finally:
-        Close_Connection(conn)
-
-
 def obtener_demora_oc(id_proveedor, etiqueta):
     secrets = dotenv_values(".env")   # Connection String from .env
     folder = secrets["FOLDER_DATOS"]
@@ -197,7 +132,7 @@ if __name__ == "__main__":
             # Hacer merge solo si no existen las columnas de precios y costos
             if 'I_PRECIO_VTA' not in df_forecast_ext.columns or 'I_COSTO_ESTADISTICO' not in df_forecast_ext.columns:
                 print(f"❌ ERROR: Falta la columna requerida '{col}' procedemos a actualizar {id_proveedor}")
-                precio = get_precios(id_proveedor)
+                precio = get_precios(id_proveedor, algoritmo)
                 precio['C_ARTICULO'] = precio['C_ARTICULO'].astype(int)
                 precio['C_SUCU_EMPR'] = precio['C_SUCU_EMPR'].astype(int)
 
@@ -233,8 +168,12 @@ if __name__ == "__main__":
             # Mini gráfico
             mini_grafico = generar_mini_grafico(folder, name)
             
-            # DATOS COMPLEMENTARIOS
-            df_stock = obtener_datos_stock(id_proveedor= id_proveedor, etiqueta= algoritmo )
+            # DATOS COMPLEMENTARIOS (stock y OC demoradas se consultan en paralelo)
+            complementarios, _ = consultar_en_paralelo({
+                'stock': lambda: obtener_datos_stock(id_proveedor= id_proveedor, etiqueta= algoritmo ),
+                'demora': lambda: obtener_demora_oc(id_proveedor= id_proveedor, etiqueta= algoritmo ),
+            }, algoritmo, propagar=False)
+            df_stock = complementarios['stock']
             total_stock_valorizado = float(round(df_stock['Stock_Valorizado'].sum() / 1000000, 2))
             total_venta_valorizada = float(round(df_stock['Venta_Valorizada'].sum() / 1000000, 2))
             days= int( total_stock_valorizado / total_venta_valorizada * 30 )
@@ -249,7 +188,7 @@ if __name__ == "__main__":
                 semaforo = 'white' # Valor predeterminado
 
             # DEMORA de OC
-            df_demora = obtener_demora_oc(id_proveedor= id_proveedor, etiqueta= algoritmo )
+            df_demora = complementarios['demora']
             if df_demora.empty:  # Verifica si el DataFrame está vacío
                 maximo_atraso_oc = 0
             else:
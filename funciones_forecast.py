@@ -30,6 +30,7 @@ from datetime import datetime, timedelta
 # Acceso a Datos
 from dotenv import dotenv_values
 import psycopg2 as pg2
+from psycopg2.pool import ThreadedConnectionPool
 import pyodbc
 import sqlalchemy
 from sqlalchemy import text
@@ -39,9 +40,21 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from io import BytesIO
 import base64
-from multiprocessing import Pool, cpu_count
+from multiprocessing import Pool, cpu_count, TimeoutError as PoolTimeoutError
+import atexit
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import select
+import signal
+import socket
+import threading
+import psutil
+import pyarrow as pa
+import pyarrow.parquet as pq
 from statsmodels.tsa.holtwinters import ExponentialSmoothing, Holt
+from scipy.signal import lfilter
 import ace_tools_open as tools
 
 # Configuración global
@@ -94,6 +107,10 @@ def Open_Diarco_Data():
         return None
 
 def Open_Conn_Postgres():
+    if _POOL_POSTGRES is not None:   # Procesos largos (S00_DAEMON_Forecast.py): conexión ya abierta del pool
+        conn = tomar_conexion_pool()
+        if conn is not None:
+            return conn
     secrets = dotenv_values(".env")   # Cargar credenciales desde .env    
     conn_str = f"dbname={secrets['BASE4']} user={secrets['USUARIO4']} password={secrets['CONTRASENA4']} host={secrets['SERVIDOR4']} port={secrets['PUERTO4']}"
     for i in range(5):
@@ -139,83 +156,805 @@ def Open_Connexa_Alquemy():
 
 def Close_Connection(conn): 
     if conn is not None:
-        conn.close()
+        if id(conn) in _CONEXIONES_POOL:
+            devolver_conexion_pool(conn)
+        else:
+            conn.close()
         # print("✅ Conexión cerrada.")    
     return True
 
+# Pool de conexiones a CONNEXA para procesos que quedan corriendo (daemon): Open_Conn_Postgres toma
+# una conexión abierta y Close_Connection la devuelve en lugar de cerrarla. Desactivado por defecto.
+_POOL_POSTGRES = None
+_CONEXIONES_POOL = set()
+
+def activar_pool_postgres(minimo=1, maximo=8):
+    global _POOL_POSTGRES
+    secrets = dotenv_values(".env")
+    conn_str = f"dbname={secrets['BASE4']} user={secrets['USUARIO4']} password={secrets['CONTRASENA4']} host={secrets['SERVIDOR4']} port={secrets['PUERTO4']}"
+    try:
+        _POOL_POSTGRES = ThreadedConnectionPool(minimo, maximo, conn_str)
+        print(f"🔌 Pool de conexiones a CONNEXA activo ({minimo}-{maximo})")
+    except Exception as e:
+        print(f"⚠️ No se pudo crear el pool de conexiones, se sigue con conexiones sueltas: {e}")
+        _POOL_POSTGRES = None
+    return _POOL_POSTGRES is not None
+
+def tomar_conexion_pool():
+    # Retorna None si el pool está agotado o caído (Open_Conn_Postgres abre una conexión suelta)
+    try:
+        conn = _POOL_POSTGRES.getconn()
+        if conn.closed:
+            _POOL_POSTGRES.putconn(conn, close=True)
+            conn = _POOL_POSTGRES.getconn()
+        _CONEXIONES_POOL.add(id(conn))
+        return conn
+    except Exception as e:
+        print(f"⚠️ Pool de conexiones no disponible: {e}")
+        return None
+
+def devolver_conexion_pool(conn):
+    # El pool hace rollback de la transacción abierta; las conexiones rotas se descartan
+    _CONEXIONES_POOL.discard(id(conn))
+    try:
+        _POOL_POSTGRES.putconn(conn, close=bool(conn.closed))
+    except Exception as e:
+        print(f"⚠️ Error devolviendo la conexión al pool: {e}")
+        conn.close()
+
+def cerrar_pool_postgres():
+    global _POOL_POSTGRES
+    if _POOL_POSTGRES is not None:
+        _POOL_POSTGRES.closeall()
+        _POOL_POSTGRES = None
+        _CONEXIONES_POOL.clear()
+
 def id_aleatorio():       # Helper para generar identificadores únicos
     return str(uuid.uuid4())
 
-def generar_datos(id_proveedor, etiqueta, ventana):
-    secrets = dotenv_values(".env")   # Connection String from .env
-    folder = secrets["FOLDER_DATOS"]
-    
-    #  Intento recuperar datos cacheados
+###----------------------------------------------------------------
+# CACHE DE DATOS EN PARQUET (esquema tipado, lectura por columnas)
+# {etiqueta}_Ventas (hechos: Fecha, Codigo_Articulo, Sucursal, Unidades) y {etiqueta}_Articulos
+# (dimensión artículo x sucursal) se guardan por separado como .parquet con:
+#   códigos (C_*, Codigo_Articulo, Sucursal, Familia, Rubro, SubRubro) int32, Fecha date32,
+#   Unidades float32 y marcas (M_*, Clasificacion) categóricas.
+# Se lee el archivo del formato configurado; si no existe se lee el del otro formato, así los
+# caches viejos siguen sirviendo. CACHE_FORMATO = 'csv' en el .env vuelve a grabar en texto.
+###----------------------------------------------------------------
+CACHE_FORMATO = (secrets.get("CACHE_FORMATO") or 'parquet').lower()
+COLUMNAS_VENTAS = ['Fecha', 'Codigo_Articulo', 'Sucursal', 'Unidades']
+CODIGOS_CACHE = ('Codigo_Articulo', 'Sucursal', 'Familia', 'Rubro', 'SubRubro')
+MARCAS_CACHE = ('Clasificacion',)
+
+def aplicar_esquema_cache(df):
+    # Tipos del cache; las columnas que no entran en ninguna regla quedan como vienen
+    df = df.copy()
+    for columna in df.columns:
+        if columna.startswith('C_') or columna in CODIGOS_CACHE:
+            valores = pd.to_numeric(df[columna], errors='coerce')
+            df[columna] = valores.astype('int32') if valores.notna().all() else valores.astype('Int32')
+        elif columna.startswith('M_') or columna in MARCAS_CACHE:
+            df[columna] = df[columna].astype('category')
+        elif columna == 'Fecha':
+            df[columna] = pd.to_datetime(df[columna]).dt.normalize()
+        elif columna == 'Unidades':
+            df[columna] = pd.to_numeric(df[columna], errors='coerce').astype('float32')
+    return df
+
+def tabla_cache(df, esquema=None):
+    # DataFrame -> tabla Arrow con el esquema del cache (Fecha como date32)
+    tabla = pa.Table.from_pandas(aplicar_esquema_cache(df), preserve_index=False)
+    if 'Fecha' in tabla.column_names:
+        i = tabla.column_names.index('Fecha')
+        tabla = tabla.set_column(i, 'Fecha', tabla.column('Fecha').cast(pa.date32()))
+    if esquema is not None and not tabla.schema.equals(esquema):
+        tabla = tabla.select(esquema.names).cast(esquema)
+    return tabla
+
+def ruta_cache(nombre, formato=None):
+    return f'{folder}/{nombre}.{formato or CACHE_FORMATO}'
+
+def guardar_cache(df, nombre, formato=None):
+    formato = formato or CACHE_FORMATO
+    file_path = ruta_cache(nombre, formato)
+    if formato == 'parquet':
+        pq.write_table(tabla_cache(df), file_path, compression='zstd')
+    else:
+        df.to_csv(file_path, index=False, encoding='utf-8')
+    return file_path
+
+def formato_cache_existente(nombre):
+    # Formato a leer: el de CACHE_FORMATO y, solo si ese archivo no existe, el otro (caches anteriores)
+    otro = 'csv' if CACHE_FORMATO == 'parquet' else 'parquet'
+    if not os.path.exists(ruta_cache(nombre, CACHE_FORMATO)) and os.path.exists(ruta_cache(nombre, otro)):
+        return otro
+    return CACHE_FORMATO
+
+def leer_cache(nombre, columnas=None):
+    """
+    Lee un cache de datos ({folder}/{nombre} en el formato de CACHE_FORMATO o, si no existe, en el otro).
+
+    - columnas: lista de columnas a leer (None = todas). En Parquet solo se leen esas columnas del disco.
+    Fecha se devuelve como datetime64 y los códigos de artículo / sucursal como enteros.
+    Lanza FileNotFoundError si no hay cache.
+    """
+    if formato_cache_existente(nombre) == 'parquet':
+        df = pq.read_table(ruta_cache(nombre, 'parquet'), columns=columnas).to_pandas(date_as_object=False)
+        if 'Fecha' in df.columns:
+            df['Fecha'] = df['Fecha'].astype('datetime64[ns]')
+        return df
+
+    df = pd.read_csv(ruta_cache(nombre, 'csv'), usecols=columnas)
+    for columna in ('Codigo_Articulo', 'Sucursal'):
+        if columna in df.columns:
+            df[columna] = df[columna].astype(int)
+    if 'Fecha' in df.columns:
+        df['Fecha'] = pd.to_datetime(df['Fecha'])
+    return df
+
+def comparar_formatos_cache(nombre, repeticiones=3, columnas=None):
+    """
+    Compara tamaño en disco y tiempo de carga del cache en CSV y en Parquet.
+    Graba ambas versiones a partir del cache existente y retorna un DataFrame con los resultados.
+    """
+    df = leer_cache(nombre)
+    rutas = {'csv': guardar_cache(df, f'{nombre}_benchmark', 'csv'),
+             'parquet': guardar_cache(df, f'{nombre}_benchmark', 'parquet')}
+    lectores = {
+        'csv': lambda: pd.read_csv(rutas['csv'], usecols=columnas).assign(Fecha=lambda d: pd.to_datetime(d['Fecha'])),
+        'parquet': lambda: pq.read_table(rutas['parquet'], columns=columnas).to_pandas(date_as_object=False),
+    }
+    resultados = []
+    for formato, leer in lectores.items():
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            leido = leer()
+            tiempos.append(time.perf_counter() - inicio)
+        resultados.append({'formato': formato,
+                           'mb_disco': round(os.path.getsize(rutas[formato]) / 2**20, 2),
+                           'mb_memoria': round(leido.memory_usage(deep=True).sum() / 2**20, 2),
+                           'segundos_carga': round(min(tiempos), 3)})
+        os.remove(rutas[formato])
+    resultados = pd.DataFrame(resultados)
+    print(f"📦 Cache {nombre} ({len(df)} filas):")
+    print(resultados.to_string(index=False))
+    return resultados
+
+###----------------------------------------------------------------
+# LECTURA Y ESCRITURA DEL CACHE POR BLOQUES (memoria acotada)
+# Las ventas se leen de la base en bloques de VENTAS_FILAS_BLOQUE filas, se reducen de tipo
+# y se agregan al archivo sin armar nunca el DataFrame completo. El pico de memoria (RSS)
+# se muestrea en cada bloque y se informa por proveedor.
+###----------------------------------------------------------------
+VENTAS_FILAS_BLOQUE = int(secrets.get("VENTAS_FILAS_BLOQUE") or 250000)
+
+def memoria_rss_mb():
+    return psutil.Process().memory_info().rss / 2**20
+
+def medir_memoria(medicion):
+    # Actualiza el pico de RSS observado en el diccionario de medición
+    if medicion is not None:
+        medicion['pico_mb'] = max(medicion.get('pico_mb', 0), memoria_rss_mb())
+
+def abrir_escritor_cache(nombre, esquema=None):
+    """
+    Escritor incremental de un cache: se le pasan bloques con escribir_bloque_cache y se cierra
+    con cerrar_escritor_cache. Escribe sobre un temporal y lo renombra al cerrar, así una corrida
+    cortada no deja el cache a medias.
+    - esquema: esquema Arrow fijo (si es None se toma el del primer bloque).
+    """
+    file_path = ruta_cache(nombre)
+    return {'nombre': nombre, 'file_path': file_path, 'temporal': f'{file_path}.tmp',
+            'esquema': esquema, 'parquet': None, 'filas': 0}
+
+def escribir_bloque_cache(escritor, bloque):
+    if bloque.empty:
+        return
+    if CACHE_FORMATO == 'parquet':
+        tabla = tabla_cache(bloque, escritor['esquema'])
+        if escritor['parquet'] is None:
+            escritor['esquema'] = tabla.schema
+            escritor['parquet'] = pq.ParquetWriter(escritor['temporal'], tabla.schema, compression='zstd')
+        escritor['parquet'].write_table(tabla)
+    else:
+        bloque.to_csv(escritor['temporal'], mode='a' if escritor['filas'] else 'w',
+                      header=not escritor['filas'], index=False, encoding='utf-8')
+    escritor['filas'] += len(bloque)
+
+def cerrar_escritor_cache(escritor, descartar=False):
+    # Cierra el escritor y publica el archivo (o borra el temporal si descartar=True). Retorna (file_path, filas).
+    if escritor['parquet'] is not None:
+        escritor['parquet'].close()
+    if descartar:
+        if os.path.exists(escritor['temporal']):
+            os.remove(escritor['temporal'])
+        return escritor['file_path'], 0
+    if escritor['filas'] == 0:
+        # Sin datos: queda un archivo vacío con el esquema conocido
+        esquema = escritor['esquema']
+        if CACHE_FORMATO == 'parquet':
+            pq.write_table((esquema or pa.schema([])).empty_table(), escritor['temporal'])
+        else:
+            pd.DataFrame(columns=esquema.names if esquema is not None else []).to_csv(escritor['temporal'], index=False)
+    os.replace(escritor['temporal'], escritor['file_path'])
+    return escritor['file_path'], escritor['filas']
+
+def guardar_cache_por_bloques(bloques, nombre, esquema=None, medicion=None):
+    """
+    Graba un cache a partir de un iterable de DataFrames sin juntarlos en memoria.
+    Retorna (file_path, filas).
+    """
+    escritor = abrir_escritor_cache(nombre, esquema)
     try:
-        data = pd.read_csv(f'{folder}/{etiqueta}.csv')
-        data['Codigo_Articulo']= data['Codigo_Articulo'].astype(int)
-        data['Sucursal']= data['Sucursal'].astype(int)
-        data['Fecha']= pd.to_datetime(data['Fecha'])
-
-        articulos = pd.read_csv(f'{folder}/{etiqueta}_articulos.csv')
-        #articulos.head()
-        print(f"-> Datos Recuperados del CACHE: {id_proveedor}, Label: {etiqueta}")
-        return data, articulos
-    except:     
-        print(f"-> Generando datos para ID: {id_proveedor}, Label: {etiqueta}")
-        # Configuración de conexión
-        conn = Open_Connection()
-        
-        # ----------------------------------------------------------------
-        # FILTRA solo PRODUCTOS HABILITADOS y Traer datos de STOCK y PENDIENTES desde PRODUCCIÓN
-        # ----------------------------------------------------------------
-        query = f"""
-        SELECT A.[C_PROVEEDOR_PRIMARIO]
-            ,S.[C_ARTICULO]
-            ,S.[C_SUCU_EMPR]
-            ,S.[I_PRECIO_VTA]
-            ,S.[I_COSTO_ESTADISTICO]
-            ,S.[Q_FACTOR_VTA_SUCU]
-            ,S.[Q_BULTOS_PENDIENTE_OC]-- OJO esto está en BULTOS DIARCO
-            ,S.[Q_PESO_PENDIENTE_OC]
-            ,S.[Q_UNID_PESO_PEND_RECEP_TRANSF]
-            ,ST.Q_UNID_ARTICULO AS Q_STOCK_UNIDADES-- Stock Cierre Dia Anterior
-            ,ST.Q_PESO_ARTICULO AS Q_STOCK_PESO
-            ,S.[M_OFERTA_SUCU]
-            ,S.[M_HABILITADO_SUCU]
-            ,S.[M_FOLDER]
-            ,A.M_BAJA  --- Puede no ser necesaria al hacer inner
-            ,S.[F_ULTIMA_VTA]
-            ,S.[Q_VTA_ULTIMOS_15DIAS]-- OJO esto está en BULTOS DIARCO
-            ,S.[Q_VTA_ULTIMOS_30DIAS]-- OJO esto está en BULTOS DIARCO
-            ,S.[Q_TRANSF_PEND]-- OJO esto está en BULTOS DIARCO
-            ,S.[Q_TRANSF_EN_PREP]-- OJO esto está en BULTOS DIARCO
-            --- ,A.[N_ARTICULO]
-            ,A.[C_FAMILIA]
-            ,A.[C_RUBRO]
-            ,A.[C_CLASIFICACION_COMPRA] -- ojo nombre erroneo en la contratabla
-            ,(R.[Q_VENTA_30_DIAS] + R.[Q_VENTA_15_DIAS]) AS Q_VENTA_ACUM_30 -- OJO esto está en BULTOS DIARCO
-            ,R.[Q_DIAS_CON_STOCK] -- Cantidad de dias para promediar venta diaria
-            ,R.[Q_REPONER] -- OJO esto está en BULTOS DIARCO
-            ,R.[Q_REPONER_INCLUIDO_SOBRE_STOCK]-- OJO esto está en BULTOS DIARCO (Venta Promedio * Comprar Para + Lead Time - STOCK - PEND, OC)
-                --- Ojo la venta promerio excluye  las oferta para no alterar el promedio
-            ,R.[Q_VENTA_DIARIA_NORMAL]-- OJO esto está en BULTOS DIARCO
-            ,R.[Q_DIAS_STOCK]
-            ,R.[Q_DIAS_SOBRE_STOCK]
-            ,R.[Q_DIAS_ENTREGA_PROVEEDOR]
+        for bloque in bloques:
+            medir_memoria(medicion)
+            escribir_bloque_cache(escritor, bloque)
+    except Exception:
+        cerrar_escritor_cache(escritor, descartar=True)
+        raise
+    medir_memoria(medicion)
+    return cerrar_escritor_cache(escritor)
+
+def leer_cache_por_bloques(nombre, columnas=None, filas_bloque=None):
+    # Generador de DataFrames de un cache (Parquet o CSV) de a filas_bloque filas
+    filas_bloque = filas_bloque or VENTAS_FILAS_BLOQUE
+    if formato_cache_existente(nombre) == 'parquet':
+        with pq.ParquetFile(ruta_cache(nombre, 'parquet')) as archivo:
+            for lote in archivo.iter_batches(batch_size=filas_bloque, columns=columnas):
+                df = lote.to_pandas(date_as_object=False)
+                if 'Fecha' in df.columns:
+                    df['Fecha'] = df['Fecha'].astype('datetime64[ns]')
+                yield df
+    else:
+        for df in pd.read_csv(ruta_cache(nombre, 'csv'), usecols=columnas, chunksize=filas_bloque):
+            if 'Fecha' in df.columns:
+                df['Fecha'] = pd.to_datetime(df['Fecha'])
+            yield df
+
+###----------------------------------------------------------------
+# ARCHIVOS COMPARTIDOS ENTRE PROCESOS
+# Manifiesto_Cache.csv, Marcas_Ventas.csv y Tiempos_Ejecuciones.csv se leen, modifican y regraban
+# desde varios procesos a la vez (--procesos del pipeline, daemons, workers). Cada actualización se hace
+# con el archivo {ruta}.lock tomado (creación exclusiva, portable a Windows) y se publica con un
+# reemplazo atómico, así no se pierden filas ni se lee un archivo a medio escribir.
+###----------------------------------------------------------------
+BLOQUEO_ESPERA_SEGUNDOS = float(secrets.get("BLOQUEO_ESPERA_SEGUNDOS") or 120)
+BLOQUEO_VENCIDO_SEGUNDOS = float(secrets.get("BLOQUEO_VENCIDO_SEGUNDOS") or 600)
+
+@contextmanager
+def bloquear_archivo(ruta, espera=None, vencido=None):
+    """
+    Toma el bloqueo de 'ruta' mientras dura el bloque.
+    - espera: segundos máximos esperando el bloqueo (TimeoutError al vencer).
+    - vencido: un bloqueo más viejo que esto se considera abandonado (proceso caído) y se descarta.
+    """
+    espera = BLOQUEO_ESPERA_SEGUNDOS if espera is None else espera
+    vencido = BLOQUEO_VENCIDO_SEGUNDOS if vencido is None else vencido
+    candado = f'{ruta}.lock'
+    limite = time.time() + espera
+    while True:
+        try:
+            descriptor = os.open(candado, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(candado) > vencido:
+                    print(f"⚠️ Se descarta el bloqueo abandonado {candado}")
+                    os.remove(candado)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() > limite:
+                raise TimeoutError(f'No se pudo tomar el bloqueo {candado} en {espera} seg')
+            time.sleep(0.05)
+    try:
+        os.write(descriptor, f'{socket.gethostname()}:{os.getpid()}'.encode('utf-8'))
+        os.close(descriptor)
+        yield
+    finally:
+        try:
+            os.remove(candado)
+        except FileNotFoundError:
+            pass
+
+def reemplazar_csv(df, ruta, **kwargs):
+    # Graba en un temporal y lo publica con os.replace (quien lee ve el archivo anterior o el nuevo, nunca uno a medias)
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    df.to_csv(temporal, index=False, **kwargs)
+    os.replace(temporal, ruta)
+
+###----------------------------------------------------------------
+# EXTRACCIÓN INCREMENTAL DE VENTAS (marca de agua por proveedor)
+# La historia de ventas de cada proveedor se guarda en {folder}/{id_proveedor}_Historia_Ventas
+# y en Marcas_Ventas.csv queda la última F_VENTA cargada. En cada extracción solo se piden
+# los días posteriores a la marca menos VENTAS_DIAS_SOLAPE (ventas que llegan tarde);
+# esos días se reemplazan completos en la historia, así repetir la carga no duplica filas.
+# VENTAS_INCREMENTAL = 'N' en el .env o recarga_completa=True vuelven a traer todo desde FECHA_INICIO_VENTAS.
+###----------------------------------------------------------------
+VENTAS_INCREMENTAL = (secrets.get("VENTAS_INCREMENTAL") or 'S').upper() == 'S'
+VENTAS_DIAS_SOLAPE = int(secrets.get("VENTAS_DIAS_SOLAPE") or 7)
+FECHA_INICIO_VENTAS = secrets.get("FECHA_INICIO_VENTAS") or '20230101'
+ESQUEMA_VENTAS = pa.schema([
+    ('Fecha', pa.date32()), ('Codigo_Articulo', pa.int32()), ('Sucursal', pa.int32()),
+    ('Precio', pa.float32()), ('Costo', pa.float32()), ('Unidades', pa.float32()),
+    ('Familia', pa.int32()), ('Rubro', pa.int32()), ('SubRubro', pa.int32()),
+    ('Nombre_Articulo', pa.string()), ('Clasificacion', pa.dictionary(pa.int32(), pa.string())),
+])
+
+def ruta_marcas_ventas():
+    return f'{folder}/Marcas_Ventas.csv'
+
+def leer_marca_ventas(id_proveedor):
+    # Última F_VENTA cargada para el proveedor (None si nunca se cargó)
+    try:
+        marcas = pd.read_csv(ruta_marcas_ventas())
+    except FileNotFoundError:
+        return None
+    fila = marcas[marcas['id_proveedor'] == int(id_proveedor)]
+    if fila.empty or pd.isna(fila['f_venta'].iloc[0]):
+        return None
+    return pd.to_datetime(fila['f_venta'].iloc[0])
+
+def guardar_marca_ventas(id_proveedor, f_venta, registros, modo):
+    fila = pd.DataFrame([{'id_proveedor': int(id_proveedor),
+                          'f_venta': None if pd.isna(f_venta) else pd.Timestamp(f_venta).strftime('%Y-%m-%d'),
+                          'registros': int(registros), 'modo': modo,
+                          'f_actualizacion': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}])
+    with bloquear_archivo(ruta_marcas_ventas()):
+        try:
+            marcas = pd.read_csv(ruta_marcas_ventas())
+            marcas = marcas[marcas['id_proveedor'] != int(id_proveedor)]
+        except FileNotFoundError:
+            marcas = pd.DataFrame(columns=['id_proveedor', 'f_venta', 'registros', 'modo', 'f_actualizacion'])
+        marcas = fila if marcas.empty else pd.concat([marcas, fila], ignore_index=True)
+        reemplazar_csv(marcas.sort_values('id_proveedor'), ruta_marcas_ventas())
+
+def borrar_marca_ventas(id_proveedor):
+    with bloquear_archivo(ruta_marcas_ventas()):
+        try:
+            marcas = pd.read_csv(ruta_marcas_ventas())
+        except FileNotFoundError:
+            return
+        reemplazar_csv(marcas[marcas['id_proveedor'] != int(id_proveedor)], ruta_marcas_ventas())
+
+def reducir_bloque_ventas(bloque):
+    # Tipos chicos para un bloque de ventas recién leído de la base
+    bloque['Fecha'] = pd.to_datetime(bloque['Fecha'])
+    bloque = aplicar_esquema_cache(bloque)
+    for columna in ('Precio', 'Costo'):
+        bloque[columna] = pd.to_numeric(bloque[columna], errors='coerce').astype('float32')
+    return bloque
+
+def consultar_ventas_proveedores(conn, desde_por_proveedor, filas_bloque=None):
+    """
+    Generador con las ventas de varios proveedores en UNA sola consulta, en bloques de
+    filas_bloque filas (cursor fetchmany vía read_sql chunksize) ya reducidos de tipo.
+    - desde_por_proveedor: dict id_proveedor -> fecha desde (AAAAMMDD). Los proveedores con la
+      misma fecha van juntos en una lista IN.
+    Cada bloque trae la columna Proveedor para repartirlo.
+    """
+    grupos = {}
+    for id_proveedor, desde in desde_por_proveedor.items():
+        grupos.setdefault(desde, []).append(str(int(id_proveedor)))
+    filtro = '\n        OR '.join(f"(A.[C_PROVEEDOR_PRIMARIO] IN ({', '.join(ids)}) AND V.F_VENTA >= '{desde}')"
+                                for desde, ids in grupos.items())
+    query = f"""
+    SELECT V.[F_VENTA] as Fecha
+        ,V.[C_ARTICULO] as Codigo_Articulo
+        ,V.[C_SUCU_EMPR] as Sucursal
+        ,V.[I_PRECIO_VENTA] as Precio
+        ,V.[I_PRECIO_COSTO] as Costo
+        ,V.[Q_UNIDADES_VENDIDAS] as Unidades
+        ,V.[C_FAMILIA] as Familia
+        ,A.[C_RUBRO] as Rubro
+        ,A.[C_SUBRUBRO_1] as SubRubro
+        ,LTRIM(RTRIM(REPLACE(REPLACE(REPLACE(A.N_ARTICULO, CHAR(9), ''), CHAR(13), ''), CHAR(10), ''))) as Nombre_Articulo
+        ,A.[C_CLASIFICACION_COMPRA] as Clasificacion
+        ,A.[C_PROVEEDOR_PRIMARIO] as Proveedor
+    FROM [DCO-DBCORE-P02].[DiarcoEst].[dbo].[T702_EST_VTAS_POR_ARTICULO] V
+    LEFT JOIN [DCO-DBCORE-P02].[DiarcoEst].[dbo].[T050_ARTICULOS] A 
+        ON V.C_ARTICULO = A.C_ARTICULO
+    WHERE ({filtro})
+        AND A.M_BAJA ='N'
+    ORDER BY V.F_VENTA ;
+    """
+    for bloque in pd.read_sql(query, conn, chunksize=filas_bloque or VENTAS_FILAS_BLOQUE):
+        bloque['Proveedor'] = bloque['Proveedor'].astype(int)
+        yield reducir_bloque_ventas(bloque)
+
+def extraer_ventas_proveedores(conn, proveedores, recarga_completa=False, medicion=None):
+    """
+    Actualiza la historia de ventas de uno o varios proveedores trayendo de la base solo lo nuevo,
+    con una única consulta para todos (ver consultar_ventas_proveedores).
+
+    - Sin historia local, sin marca o con recarga_completa=True: trae todo desde FECHA_INICIO_VENTAS.
+    - Si no: trae desde (marca - VENTAS_DIAS_SOLAPE días), descarta esos días de la historia y agrega lo traído.
+    La historia vieja y lo nuevo pasan por bloques a cada archivo, sin juntarse en memoria.
+    Actualiza las marcas de agua y retorna un dict id_proveedor -> nueva marca (última F_VENTA de la historia).
+    """
+    planes = {}
+    for id_proveedor in dict.fromkeys(int(p) for p in proveedores):
+        nombre = f'{id_proveedor}_Historia_Ventas'
+        marca = None if (recarga_completa or not VENTAS_INCREMENTAL) else leer_marca_ventas(id_proveedor)
+        if marca is not None and not any(os.path.exists(ruta_cache(nombre, f)) for f in ('parquet', 'csv')):
+            marca = None
+        desde = pd.to_datetime(FECHA_INICIO_VENTAS) if marca is None else marca - pd.Timedelta(days=VENTAS_DIAS_SOLAPE)
+        planes[id_proveedor] = {'nombre': nombre, 'marca': marca, 'desde': desde, 'nuevas': 0, 'maximo': None,
+                                'modo': 'completa' if marca is None else 'incremental',
+                                'escritor': abrir_escritor_cache(nombre, ESQUEMA_VENTAS)}
+
+    def escribir(plan, bloque):
+        if len(bloque):
+            maximo = bloque['Fecha'].max()
+            plan['maximo'] = maximo if plan['maximo'] is None else max(plan['maximo'], maximo)
+        escribir_bloque_cache(plan['escritor'], bloque)
+        medir_memoria(medicion)
+
+    inicio = time.perf_counter()
+    try:
+        # Reemplazo completo de los días solapados: idempotente aunque se repita la carga
+        for plan in planes.values():
+            if plan['modo'] == 'incremental':
+                for bloque in leer_cache_por_bloques(plan['nombre']):
+                    escribir(plan, bloque[bloque['Fecha'] < plan['desde']])
+        desde = {p: plan['desde'].strftime('%Y%m%d') for p, plan in planes.items()}
+        for bloque in consultar_ventas_proveedores(conn, desde):
+            for id_proveedor, parte in bloque.groupby('Proveedor', sort=False):
+                if id_proveedor in planes:
+                    planes[id_proveedor]['nuevas'] += len(parte)
+                    escribir(planes[id_proveedor], parte.drop(columns='Proveedor'))
+    except Exception:
+        for plan in planes.values():
+            cerrar_escritor_cache(plan['escritor'], descartar=True)
+        raise
+    segundos = time.perf_counter() - inicio
+
+    marcas = {}
+    for id_proveedor, plan in planes.items():
+        _, filas = cerrar_escritor_cache(plan['escritor'])
+        marcas[id_proveedor] = plan['maximo'] if plan['maximo'] is not None else plan['marca']
+        guardar_marca_ventas(id_proveedor, marcas[id_proveedor], filas, plan['modo'])
+        registrar_cache(plan['nombre'], id_proveedor, 'historia', filas, marcas[id_proveedor])
+        print(f"---> Ventas {plan['modo']} proveedor {id_proveedor}: desde {plan['desde']:%Y-%m-%d}, "
+              f"{plan['nuevas']} filas traídas, historia {filas} filas")
+    if len(planes) > 1:
+        print(f"---> Ventas de {len(planes)} proveedores en una consulta: {segundos:.1f}s")
+    return marcas
+
+def extraer_ventas_proveedor(conn, id_proveedor, recarga_completa=False, medicion=None):
+    # Un solo proveedor: retorna su nueva marca de agua
+    return extraer_ventas_proveedores(conn, [id_proveedor], recarga_completa, medicion)[int(id_proveedor)]
+
+###----------------------------------------------------------------
+# MANIFIESTO DEL CACHE (vigencia por TTL, marca de agua o forzado)
+# Cada artefacto que graba generar_datos (_Articulos, _Ventas y la historia)
+# queda registrado en {folder}/Manifiesto_Cache.csv con fecha de creación, marca de ventas,
+# filas y versión de esquema. CACHE_POLITICA (lista separada por comas) decide cuándo se renueva:
+#   ttl    -> vencido si tiene más de CACHE_TTL_HORAS horas
+#   marca  -> vencido si la historia del proveedor avanzó o si las ventas tienen más de CACHE_DIAS_MARCA días de atraso
+#   forzar -> siempre se renueva
+# Un archivo sin entrada en el manifiesto o con otra versión de esquema se considera vencido.
+###----------------------------------------------------------------
+VERSION_ESQUEMA_CACHE = 2   # 1 = CSV sin tipos, 2 = Parquet tipado
+CACHE_POLITICA = {p.strip().lower() for p in (secrets.get("CACHE_POLITICA") or 'ttl,marca').split(',') if p.strip()}
+CACHE_TTL_HORAS = float(secrets.get("CACHE_TTL_HORAS") or 24)
+CACHE_DIAS_MARCA = int(secrets.get("CACHE_DIAS_MARCA") or 3)
+COLUMNAS_MANIFIESTO = ['nombre', 'id_proveedor', 'artefacto', 'f_creacion', 'marca_ventas', 'filas', 'version_esquema', 'formato']
+
+def ruta_manifiesto_cache():
+    return f'{folder}/Manifiesto_Cache.csv'
+
+def leer_manifiesto_cache():
+    try:
+        manifiesto = pd.read_csv(ruta_manifiesto_cache(), parse_dates=['f_creacion', 'marca_ventas'])
+    except FileNotFoundError:
+        manifiesto = pd.DataFrame(columns=COLUMNAS_MANIFIESTO)
+    return manifiesto
+
+def guardar_manifiesto_cache(manifiesto):
+    # Quien modifica el manifiesto debe tener tomado bloquear_archivo(ruta_manifiesto_cache()) desde la lectura
+    reemplazar_csv(manifiesto[COLUMNAS_MANIFIESTO].sort_values(['id_proveedor', 'nombre']), ruta_manifiesto_cache(),
+                   date_format='%Y-%m-%d %H:%M:%S')
+
+def quitar_del_manifiesto(nombres):
+    # Borra las entradas de esos artefactos (lectura y escritura con el manifiesto bloqueado)
+    with bloquear_archivo(ruta_manifiesto_cache()):
+        manifiesto = leer_manifiesto_cache()
+        if manifiesto['nombre'].isin(nombres).any():
+            guardar_manifiesto_cache(manifiesto[~manifiesto['nombre'].isin(nombres)])
+
+def registrar_cache(nombre, id_proveedor, artefacto, df, marca_ventas=None):
+    # Agrega o reemplaza la entrada del artefacto en el manifiesto (df puede ser el DataFrame o su cantidad de filas)
+    fila = pd.DataFrame([{'nombre': nombre, 'id_proveedor': int(id_proveedor), 'artefacto': artefacto,
+                          'f_creacion': pd.Timestamp.now().floor('s'), 'marca_ventas': pd.to_datetime(marca_ventas),
+                          'filas': df if isinstance(df, int) else len(df), 'version_esquema': VERSION_ESQUEMA_CACHE, 'formato': CACHE_FORMATO}])
+    with bloquear_archivo(ruta_manifiesto_cache()):
+        manifiesto = leer_manifiesto_cache()
+        manifiesto = manifiesto[manifiesto['nombre'] != nombre]
+        manifiesto = fila if manifiesto.empty else pd.concat([manifiesto, fila], ignore_index=True)
+        guardar_manifiesto_cache(manifiesto)
+
+def evaluar_entrada_cache(entrada, politica=None, ahora=None, marcas=None):
+    """
+    Retorna (vigente, motivo) de una entrada del manifiesto según la política.
+    - marcas: dict id_proveedor -> última marca de ventas (si no se pasa se lee Marcas_Ventas.csv).
+    """
+    politica = CACHE_POLITICA if politica is None else politica
+    ahora = ahora or pd.Timestamp.now()
+    if not any(os.path.exists(ruta_cache(entrada['nombre'], f)) for f in ('parquet', 'csv')):
+        return False, 'archivo inexistente'
+    if 'forzar' in politica:
+        return False, 'renovación forzada'
+    if int(entrada['version_esquema']) != VERSION_ESQUEMA_CACHE:
+        return False, f"esquema v{int(entrada['version_esquema'])} (actual v{VERSION_ESQUEMA_CACHE})"
+    edad = (ahora - pd.Timestamp(entrada['f_creacion'])).total_seconds() / 3600
+    if 'ttl' in politica and CACHE_TTL_HORAS > 0 and edad > CACHE_TTL_HORAS:
+        return False, f'TTL vencido ({edad:.1f} h)'
+    if 'marca' in politica and entrada['artefacto'] != 'historia':
+        marca = entrada['marca_ventas']
+        if pd.isna(marca):
+            return False, 'sin marca de ventas'
+        actual = (marcas or {}).get(int(entrada['id_proveedor'])) if marcas is not None else leer_marca_ventas(entrada['id_proveedor'])
+        if actual is not None and pd.Timestamp(marca) < actual:
+            return False, f'historia avanzó a {actual:%Y-%m-%d} (cache hasta {pd.Timestamp(marca):%Y-%m-%d})'
+        atraso = (ahora.normalize() - pd.Timestamp(marca)).days
+        if atraso > CACHE_DIAS_MARCA:
+            return False, f'ventas atrasadas {atraso} días'
+    return True, 'vigente'
+
+def estado_cache(nombre, politica=None):
+    manifiesto = leer_manifiesto_cache()
+    entrada = manifiesto[manifiesto['nombre'] == nombre]
+    if entrada.empty:
+        return False, 'sin entrada en el manifiesto'
+    return evaluar_entrada_cache(entrada.iloc[0], politica)
+
+def edad_cache_horas(nombre):
+    # Horas desde que se grabó el artefacto según el manifiesto (None si no está registrado)
+    manifiesto = leer_manifiesto_cache()
+    entrada = manifiesto[manifiesto['nombre'] == nombre]
+    if entrada.empty or pd.isna(entrada['f_creacion'].iloc[0]):
+        return None
+    return (pd.Timestamp.now() - pd.Timestamp(entrada['f_creacion'].iloc[0])).total_seconds() / 3600
+
+def artefacto_cache(nombre):
+    # Tipo de artefacto registrado en el manifiesto (None si no está registrado)
+    manifiesto = leer_manifiesto_cache()
+    entrada = manifiesto[manifiesto['nombre'] == nombre]
+    return None if entrada.empty else entrada['artefacto'].iloc[0]
+
+def marca_cache(nombre):
+    # Fecha de la última venta con que se generó el artefacto (None si no está registrado)
+    manifiesto = leer_manifiesto_cache()
+    entrada = manifiesto[manifiesto['nombre'] == nombre]
+    return None if entrada.empty or pd.isna(entrada['marca_ventas'].iloc[0]) else pd.Timestamp(entrada['marca_ventas'].iloc[0])
+
+def inspeccionar_cache(id_proveedor=None, politica=None):
+    """
+    Lista las entradas del manifiesto (de un proveedor o de todos) con edad, vigencia y motivo.
+    """
+    manifiesto = leer_manifiesto_cache()
+    if id_proveedor is not None:
+        manifiesto = manifiesto[manifiesto['id_proveedor'] == int(id_proveedor)]
+    if manifiesto.empty:
+        print('📦 Manifiesto de cache vacío')
+        return manifiesto
+    ahora = pd.Timestamp.now()
+    try:
+        marcas = pd.read_csv(ruta_marcas_ventas())
+        marcas = dict(zip(marcas['id_proveedor'].astype(int), pd.to_datetime(marcas['f_venta'])))
+    except FileNotFoundError:
+        marcas = {}
+    estados = [evaluar_entrada_cache(e, politica, ahora, marcas) for _, e in manifiesto.iterrows()]
+    manifiesto = manifiesto.assign(edad_horas=((ahora - manifiesto['f_creacion']).dt.total_seconds() / 3600).round(1),
+                                   vigente=[v for v, _ in estados], motivo=[m for _, m in estados])
+    print(manifiesto.to_string(index=False))
+    return manifiesto
+
+def borrar_cache(nombre, manifiesto=True):
+    # Borra los archivos de un cache (Parquet y CSV) y, si se pide, su entrada del manifiesto
+    for formato in ('parquet', 'csv'):
+        if os.path.exists(ruta_cache(nombre, formato)):
+            os.remove(ruta_cache(nombre, formato))
+    if manifiesto:
+        quitar_del_manifiesto([nombre])
+
+def unir_articulos(df, etiqueta, columnas=None, how='left'):
+    """
+    Agrega a df (con Codigo_Articulo y Sucursal) los atributos de la dimensión {etiqueta}_Articulos.
+    - columnas: atributos a traer (None = todos); solo esas columnas se leen del cache.
+    Reemplaza al archivo ancho {etiqueta}, que repetía los atributos en cada fila de venta.
+    """
+    if columnas is not None:
+        columnas = list(dict.fromkeys(['C_ARTICULO', 'C_SUCU_EMPR'] + list(columnas)))
+    articulos = leer_cache(f'{etiqueta}_Articulos', columnas)
+    articulos['C_ARTICULO'] = articulos['C_ARTICULO'].astype(int)
+    articulos['C_SUCU_EMPR'] = articulos['C_SUCU_EMPR'].astype(int)
+    unido = df.merge(articulos, left_on=['Codigo_Articulo', 'Sucursal'], right_on=['C_ARTICULO', 'C_SUCU_EMPR'], how=how)
+    return unido.drop(columns=['C_ARTICULO', 'C_SUCU_EMPR'])
+
+def purgar_cache(id_proveedor=None, solo_vencidos=True, politica=None):
+    """
+    Borra los archivos de cache y sus entradas del manifiesto.
+    - id_proveedor: limita la purga a un proveedor (None = todos).
+    - solo_vencidos: si es False borra todo lo seleccionado, incluida la historia de ventas
+      (lo que obliga a una recarga completa en la próxima extracción).
+    Retorna la lista de nombres purgados.
+    """
+    manifiesto = inspeccionar_cache(id_proveedor, politica)
+    if manifiesto.empty:
+        return []
+    purgar = manifiesto[~manifiesto['vigente']] if solo_vencidos else manifiesto
+    if solo_vencidos:
+        purgar = purgar[purgar['artefacto'] != 'historia']
+    for _, entrada in purgar.iterrows():
+        borrar_cache(entrada['nombre'], manifiesto=False)
+        if entrada['artefacto'] == 'historia':
+            borrar_marca_ventas(entrada['id_proveedor'])
+    quitar_del_manifiesto(purgar['nombre'].tolist())
+    print(f"🗑️ Purgados {len(purgar)} artefactos de cache")
+    return purgar['nombre'].tolist()
+
+def avisar_atraso_ventas(etiqueta, marca):
+    # Deja constancia cuando el pronóstico se va a calcular con ventas viejas
+    if marca is None:
+        print(f"⚠️ {etiqueta}: no se conoce la fecha de la última venta del cache")
+        return
+    atraso = (pd.Timestamp.now().normalize() - pd.Timestamp(marca)).days
+    if atraso > CACHE_DIAS_MARCA:
+        print(f"⚠️ {etiqueta}: pronóstico con ventas hasta {pd.Timestamp(marca):%Y-%m-%d} ({atraso} días de atraso)")
+
+###----------------------------------------------------------------
+# RESULTADOS DE ETAPAS GUARDADOS POR CONTENIDO
+# La salida de S10 (forecast), S20 (extendido) y S30 (con gráficos) se guarda en
+# {folder}/Etapas/{etapa}_{clave}.csv, donde la clave es un hash de todo lo que la determina:
+# marca de ventas, parámetros, versión del algoritmo / etapa y huella del resultado de la etapa anterior.
+# Al volver a correr una ejecución (p. ej. después de un error en S40) cada etapa con los mismos
+# insumos retoma su resultado en lugar de recalcularlo. Se registran en el manifiesto del cache
+# (artefacto 'etapa_Sxx'), así S00_CACHE_Manifiesto.py los lista y purga.
+# REUSAR_ETAPAS = 'N' en el .env desactiva la reutilización (se siguen guardando).
+# Los archivos de Etapas/ con más de ETAPAS_DIAS_RETENCION días se borran con purgar_etapas.
+###----------------------------------------------------------------
+REUSAR_ETAPAS = (secrets.get("REUSAR_ETAPAS") or 'S').upper() == 'S'
+VERSION_ETAPAS = {'S10': 1, 'S20': 1, 'S30': 1}   # Subir al cambiar lo que produce la etapa
+ETAPAS_DIAS_RETENCION = float(secrets.get("ETAPAS_DIAS_RETENCION") or 7)
+
+def _columna_huella(serie):
+    # Los números se comparan como float64 y el resto como el texto que queda en el CSV
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(np.float64)
+    if serie.dtype == object:
+        numerica = pd.to_numeric(serie, errors='coerce')
+        if numerica.notna().sum() == serie.notna().sum():
+            return numerica.astype(np.float64)
+    return serie.astype(str).where(serie.notna(), '')
+
+def huella_df(df):
+    # Hash vectorizado del contenido: el mismo DataFrame en memoria o releído del CSV da la misma huella
+    normalizado = pd.DataFrame({columna: _columna_huella(df[columna]) for columna in df.columns})
+    h = hashlib.sha256('|'.join(map(str, df.columns)).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(normalizado, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def huella_artefacto(nombre, con_fecha=True):
+    # Identifica la versión de un artefacto del cache por su entrada en el manifiesto.
+    # con_fecha=False: solo filas y marca de ventas (la historia se regraba en cada refresco sin cambiar su contenido)
+    manifiesto = leer_manifiesto_cache()
+    entrada = manifiesto[manifiesto['nombre'] == nombre]
+    if entrada.empty:
+        return None
+    entrada = entrada.iloc[0]
+    huella = f"{entrada['filas']}|{entrada['marca_ventas']}"
+    return f"{entrada['f_creacion']}|{huella}" if con_fecha else huella
+
+def clave_etapa(etapa, **insumos):
+    insumos['version_etapa'] = VERSION_ETAPAS[etapa]
+    texto = json.dumps(insumos, sort_keys=True, default=str)
+    return hashlib.sha256(f'{etapa}|{texto}'.encode('utf-8')).hexdigest()[:32]
+
+def nombre_etapa(etapa, clave):
+    return f'Etapas/{etapa}_{clave}'
+
+def leer_resultado_etapa(etapa, clave):
+    # Resultado guardado de la etapa con esa clave (None si no hay o REUSAR_ETAPAS = 'N')
+    if not REUSAR_ETAPAS or not os.path.exists(ruta_cache(nombre_etapa(etapa, clave), 'csv')):
+        return None
+    try:
+        df = pd.read_csv(ruta_cache(nombre_etapa(etapa, clave), 'csv'))
+        print(f"♻️ {etapa}: se reutiliza el resultado guardado {clave[:12]} ({len(df)} filas)")
+        return df
+    except Exception as e:
+        print(f"⚠️ No se pudo leer el resultado guardado de {etapa} ({clave[:12]}): {e}")
+        return None
+
+def guardar_resultado_etapa(etapa, clave, df, id_proveedor, marca_ventas=None):
+    try:
+        os.makedirs(f'{folder}/Etapas', exist_ok=True)
+        guardar_cache(df, nombre_etapa(etapa, clave), 'csv')
+        registrar_cache(nombre_etapa(etapa, clave), id_proveedor, f'etapa_{etapa}', df, marca_ventas)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el resultado de {etapa}: {e}")
+
+def purgar_etapas(dias=None):
+    """
+    Borra los resultados de Etapas/ con más de 'dias' días (ETAPAS_DIAS_RETENCION) y sus entradas del
+    manifiesto. Retorna la cantidad de archivos borrados.
+    """
+    dias = ETAPAS_DIAS_RETENCION if dias is None else dias
+    carpeta = f'{folder}/Etapas'
+    if dias <= 0 or not os.path.isdir(carpeta):
+        return 0
+    limite = time.time() - dias * 86400
+    borrados = []
+    for archivo in os.listdir(carpeta):
+        ruta = os.path.join(carpeta, archivo)
+        try:
+            if os.path.isfile(ruta) and os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+                borrados.append(f'Etapas/{os.path.splitext(archivo)[0]}')
+        except OSError as e:
+            print(f"⚠️ No se pudo borrar {ruta}: {e}")
+    if borrados:
+        quitar_del_manifiesto(borrados)
+        print(f"🗑️ Purgados {len(borrados)} resultados de etapas con más de {dias:g} días")
+    return len(borrados)
+
+def consultar_articulos_proveedores(conn, proveedores):
+    # ----------------------------------------------------------------
+    # FILTRA solo PRODUCTOS HABILITADOS y Traer datos de STOCK y PENDIENTES desde PRODUCCIÓN
+    # De uno o varios proveedores en una sola consulta (lista IN)
+    # ----------------------------------------------------------------
+    lista = ', '.join(str(int(p)) for p in dict.fromkeys(proveedores))
+    query = f"""
+    SELECT A.[C_PROVEEDOR_PRIMARIO]
+        ,S.[C_ARTICULO]
+        ,S.[C_SUCU_EMPR]
+        ,S.[I_PRECIO_VTA]
+        ,S.[I_COSTO_ESTADISTICO]
+        ,S.[Q_FACTOR_VTA_SUCU]
+        ,S.[Q_BULTOS_PENDIENTE_OC]-- OJO esto está en BULTOS DIARCO
+        ,S.[Q_PESO_PENDIENTE_OC]
+        ,S.[Q_UNID_PESO_PEND_RECEP_TRANSF]
+        ,ST.Q_UNID_ARTICULO AS Q_STOCK_UNIDADES-- Stock Cierre Dia Anterior
+        ,ST.Q_PESO_ARTICULO AS Q_STOCK_PESO
+        ,S.[M_OFERTA_SUCU]
+        ,S.[M_HABILITADO_SUCU]
+        ,S.[M_FOLDER]
+        ,A.M_BAJA  --- Puede no ser necesaria al hacer inner
+        ,S.[F_ULTIMA_VTA]
+        ,S.[Q_VTA_ULTIMOS_15DIAS]-- OJO esto está en BULTOS DIARCO
+        ,S.[Q_VTA_ULTIMOS_30DIAS]-- OJO esto está en BULTOS DIARCO
+        ,S.[Q_TRANSF_PEND]-- OJO esto está en BULTOS DIARCO
+        ,S.[Q_TRANSF_EN_PREP]-- OJO esto está en BULTOS DIARCO
+        --- ,A.[N_ARTICULO]
+        ,A.[C_FAMILIA]
+        ,A.[C_RUBRO]
+        ,A.[C_CLASIFICACION_COMPRA] -- ojo nombre erroneo en la contratabla
+        ,(R.[Q_VENTA_30_DIAS] + R.[Q_VENTA_15_DIAS]) AS Q_VENTA_ACUM_30 -- OJO esto está en BULTOS DIARCO
+        ,R.[Q_VENTA_30_DIAS] -- Se guardan por separado para armar la vista de stock (ver vista_stock)
+        ,R.[Q_VENTA_15_DIAS]
+        ,R.[Q_DIAS_CON_STOCK] -- Cantidad de dias para promediar venta diaria
+        ,R.[Q_REPONER] -- OJO esto está en BULTOS DIARCO
+        ,R.[Q_REPONER_INCLUIDO_SOBRE_STOCK]-- OJO esto está en BULTOS DIARCO (Venta Promedio * Comprar Para + Lead Time - STOCK - PEND, OC)
+            --- Ojo la venta promerio excluye  las oferta para no alterar el promedio
+        ,R.[Q_VENTA_DIARIA_NORMAL]-- OJO esto está en BULTOS DIARCO
+        ,R.[Q_DIAS_STOCK]
+        ,R.[Q_DIAS_SOBRE_STOCK]
+        ,R.[Q_DIAS_ENTREGA_PROVEEDOR]
 			,AP.[Q_FACTOR_PROVEEDOR]
 			,AP.[U_PISO_PALETIZADO]
 			,AP.[U_ALTURA_PALETIZADO]
 			,CCP.[I_LISTA_CALCULADO]
-                
-        FROM [DIARCOP001].[DiarcoP].[dbo].[T051_ARTICULOS_SUCURSAL] S
-        INNER JOIN [DIARCOP001].[DiarcoP].[dbo].[T050_ARTICULOS] A
-            ON A.[C_ARTICULO] = S.[C_ARTICULO]
-        LEFT JOIN [DIARCOP001].[DiarcoP].[dbo].[T060_STOCK] ST
-            ON ST.C_ARTICULO = S.[C_ARTICULO] 
-            AND ST.C_SUCU_EMPR = S.[C_SUCU_EMPR]
-
-        LEFT JOIN [DIARCOP001].[DiarcoP].[dbo].[T052_ARTICULOS_PROVEEDOR] AP
+            
+    FROM [DIARCOP001].[DiarcoP].[dbo].[T051_ARTICULOS_SUCURSAL] S
+    INNER JOIN [DIARCOP001].[DiarcoP].[dbo].[T050_ARTICULOS] A
+        ON A.[C_ARTICULO] = S.[C_ARTICULO]
+    LEFT JOIN [DIARCOP001].[DiarcoP].[dbo].[T060_STOCK] ST
+        ON ST.C_ARTICULO = S.[C_ARTICULO] 
+        AND ST.C_SUCU_EMPR = S.[C_SUCU_EMPR]
+
+    LEFT JOIN [DIARCOP001].[DiarcoP].[dbo].[T052_ARTICULOS_PROVEEDOR] AP
 			ON A.[C_PROVEEDOR_PRIMARIO] = AP.[C_PROVEEDOR]
 				AND S.[C_ARTICULO] = AP.[C_ARTICULO]
 		LEFT JOIN [DIARCOP001].[DiarcoP].[dbo].[T055_ARTICULOS_CONDCOMPRA_COSTOS] CCP
@@ -224,89 +963,156 @@ def generar_datos(id_proveedor, etiqueta, ventana):
 				AND S.[C_SUCU_EMPR] = CCP.[C_SUCU_EMPR]
 
 		LEFT JOIN [DIARCOP001].[DiarcoP].[dbo].[T710_ESTADIS_REPOSICION] R
-            ON R.[C_ARTICULO] = S.[C_ARTICULO]
-            AND R.[C_SUCU_EMPR] = S.[C_SUCU_EMPR]
+        ON R.[C_ARTICULO] = S.[C_ARTICULO]
+        AND R.[C_SUCU_EMPR] = S.[C_SUCU_EMPR]
 
-        WHERE S.[M_HABILITADO_SUCU] = 'S' -- Permitido Reponer
-            AND A.M_BAJA = 'N'  -- Activo en Maestro Artículos
-            AND A.[C_PROVEEDOR_PRIMARIO] = {id_proveedor} -- Solo del Proveedor
-        
-        ORDER BY S.[C_ARTICULO],S.[C_SUCU_EMPR];
-        """
-        # Ejecutar la consulta SQL
-        articulos = pd.read_sql(query, conn)
-        file_path = f'{folder}/{etiqueta}_Articulos.csv'
-        articulos['C_PROVEEDOR_PRIMARIO']= articulos['C_PROVEEDOR_PRIMARIO'].astype(int)
-        articulos['C_ARTICULO']= articulos['C_ARTICULO'].astype(int)
-        articulos['C_FAMILIA']= articulos['C_FAMILIA'].astype(int)
-        articulos['C_RUBRO']= articulos['C_RUBRO'].astype(int)
-            # Convertir a enteros y reemplazar valores nulos por el valor de ventana
-        articulos['Q_DIAS_STOCK'] = articulos['Q_DIAS_STOCK'].fillna(ventana).astype(int)
-        articulos['Q_DIAS_SOBRE_STOCK'] = articulos['Q_DIAS_SOBRE_STOCK'].fillna(0).astype(int)
-        articulos.to_csv(file_path, index=False, encoding='utf-8')        
-        print(f"---> Datos de Artículos guardados: {file_path}")
-        
-        # ----------------------------------------------------------------
-        # Consulta SQL para obtener las VENTAS de un proveedor específico   
-        # Reemplazar {proveedor} en la consulta con el ID de la tienda actual
-        # ----------------------------------------------------------------
-        query = f"""
-        SELECT V.[F_VENTA] as Fecha
-            ,V.[C_ARTICULO] as Codigo_Articulo
-            ,V.[C_SUCU_EMPR] as Sucursal
-            ,V.[I_PRECIO_VENTA] as Precio
-            ,V.[I_PRECIO_COSTO] as Costo
-            ,V.[Q_UNIDADES_VENDIDAS] as Unidades
-            ,V.[C_FAMILIA] as Familia
-            ,A.[C_RUBRO] as Rubro
-            ,A.[C_SUBRUBRO_1] as SubRubro
-            ,LTRIM(RTRIM(REPLACE(REPLACE(REPLACE(A.N_ARTICULO, CHAR(9), ''), CHAR(13), ''), CHAR(10), ''))) as Nombre_Articulo
-            ,A.[C_CLASIFICACION_COMPRA] as Clasificacion
-        FROM [DCO-DBCORE-P02].[DiarcoEst].[dbo].[T702_EST_VTAS_POR_ARTICULO] V
-        LEFT JOIN [DCO-DBCORE-P02].[DiarcoEst].[dbo].[T050_ARTICULOS] A 
-            ON V.C_ARTICULO = A.C_ARTICULO
-        WHERE A.[C_PROVEEDOR_PRIMARIO] = {id_proveedor} AND V.F_VENTA >= '20230101' AND A.M_BAJA ='N'
-        ORDER BY V.F_VENTA ;
-        """
+    WHERE S.[M_HABILITADO_SUCU] = 'S' -- Permitido Reponer
+        AND A.M_BAJA = 'N'  -- Activo en Maestro Artículos
+        AND A.[C_PROVEEDOR_PRIMARIO] IN ({lista}) -- Solo de los Proveedores
+    
+    ORDER BY S.[C_ARTICULO],S.[C_SUCU_EMPR];
+    """
+    # Ejecutar la consulta SQL
+    articulos = pd.read_sql(query, conn)
+    articulos['C_PROVEEDOR_PRIMARIO']= articulos['C_PROVEEDOR_PRIMARIO'].astype(int)
+    articulos['C_ARTICULO']= articulos['C_ARTICULO'].astype(int)
+    articulos['C_FAMILIA']= articulos['C_FAMILIA'].astype(int)
+    articulos['C_RUBRO']= articulos['C_RUBRO'].astype(int)
+    return articulos
+
+def preparar_articulos(articulos, ventana):
+    # Convertir a enteros y reemplazar valores nulos por el valor de ventana
+    articulos = articulos.reset_index(drop=True)
+    articulos['Q_DIAS_STOCK'] = articulos['Q_DIAS_STOCK'].fillna(ventana).astype(int)
+    articulos['Q_DIAS_SOBRE_STOCK'] = articulos['Q_DIAS_SOBRE_STOCK'].fillna(0).astype(int)
+    return articulos
+
+def armar_datos_proveedor(id_proveedor, etiqueta, articulos, marca, medicion=None):
+    """
+    Graba el cache de una etiqueta a partir de la historia de ventas ya actualizada:
+    {etiqueta}_Articulos (dimensión) y {etiqueta}_Ventas (hechos). Retorna la cantidad de filas de ventas.
+    """
+    file_path = guardar_cache(articulos, f'{etiqueta}_Articulos')
+    print(f"---> Datos de Artículos guardados: {file_path}")
+    registrar_cache(f'{etiqueta}_Articulos', id_proveedor, 'articulos', articulos, marca)
+    
+    # FILTRAR solo la demanda de los Artículos VALIDOS, bloque a bloque de la historia.
+    # Se guarda solo la tabla de hechos angosta; los atributos quedan en {etiqueta}_Articulos
+    # y se agregan recién donde hacen falta (ver unir_articulos).
+    claves = articulos[['C_ARTICULO', 'C_SUCU_EMPR']].drop_duplicates()
+    claves = claves.rename(columns={'C_ARTICULO': 'Codigo_Articulo', 'C_SUCU_EMPR': 'Sucursal'}).astype('int32')
+    compactos = (demanda.merge(claves, on=['Codigo_Articulo', 'Sucursal'], how='inner')
+                 for demanda in leer_cache_por_bloques(f'{id_proveedor}_Historia_Ventas', COLUMNAS_VENTAS))
+
+    # El archivo ancho {etiqueta} de versiones anteriores ya no se usa
+    borrar_cache(etiqueta)
+    
+    # Guardar los datos Compactos de VENTAS con el nombre del Proveedor y sufijo _Ventas, bloque a bloque
+    # (la historia filtrada nunca se junta entera en memoria)
+    esquema = pa.schema([ESQUEMA_VENTAS.field(c) for c in COLUMNAS_VENTAS])
+    file_path, filas = guardar_cache_por_bloques(compactos, f'{etiqueta}_Ventas', esquema, medicion)
+    print(f"---> Datos de Ventas guardados: {file_path}")  
+    registrar_cache(f'{etiqueta}_Ventas', id_proveedor, 'ventas', filas, marca)
+    avisar_atraso_ventas(etiqueta, marca)
+    return filas
+
+def estado_datos(etiqueta, recarga_completa=False):
+    # Vigencia del cache de una etiqueta (hechos y dimensión) según el manifiesto
+    if recarga_completa:
+        return False, 'recarga completa solicitada'
+    vigente, motivo = estado_cache(f'{etiqueta}_Ventas')
+    if vigente and artefacto_cache(f'{etiqueta}_Ventas') == 'ventas_cola':
+        # Solo los últimos días que grabó generar_sumas_ventanas para los gráficos
+        return False, 'solo cola de ventas (VENTANAS_EN_SERVIDOR)'
+    if vigente:
+        vigente, motivo = estado_cache(f'{etiqueta}_Articulos')
+    return vigente, motivo
+
+def generar_datos(id_proveedor, etiqueta, ventana, recarga_completa=False):
+    #  Intento recuperar datos cacheados (solo las columnas que usan los algoritmos)
+    #  si el manifiesto los da por vigentes (ver CACHE_POLITICA).
+    #  recarga_completa=True ignora el cache y vuelve a traer toda la historia de ventas
+    vigente, motivo = estado_datos(etiqueta, recarga_completa)
+    if vigente:
+        try:
+            data = leer_cache(f'{etiqueta}_Ventas', COLUMNAS_VENTAS)
+            articulos = leer_cache(f'{etiqueta}_Articulos')
+            print(f"-> Datos Recuperados del CACHE: {id_proveedor}, Label: {etiqueta}")
+            avisar_atraso_ventas(etiqueta, marca_cache(f'{etiqueta}_Ventas'))
+            return data, articulos
+        except Exception as e:
+            motivo = f'error de lectura: {e}'
+
+    print(f"-> Generando datos para ID: {id_proveedor}, Label: {etiqueta} ({motivo})")
+    medicion = {'inicio_mb': memoria_rss_mb()}
+    # ----------------------------------------------------------------
+    # ARTÍCULOS y VENTAS del proveedor en paralelo, cada consulta con su conexión.
+    # Las ventas traen solo los días nuevos desde la marca de agua (ver extraer_ventas_proveedores)
+    # ----------------------------------------------------------------
+    resultados, _ = consultar_en_paralelo({
+        'articulos': lambda: con_conexion(consultar_articulos_proveedores, [id_proveedor]),
+        'ventas': lambda: con_conexion(extraer_ventas_proveedor, id_proveedor, recarga_completa, medicion),
+    }, etiqueta)
+    articulos = preparar_articulos(resultados['articulos'], ventana)
+    marca = resultados['ventas']
+    armar_datos_proveedor(id_proveedor, etiqueta, articulos, marca, medicion)
+    data = leer_cache(f'{etiqueta}_Ventas', COLUMNAS_VENTAS)
+    medir_memoria(medicion)
+    print(f"🧠 Memoria {id_proveedor}: pico RSS {medicion['pico_mb']:.0f} MB (inicio {medicion['inicio_mb']:.0f} MB)")
+    return data, articulos
 
-        # Ejecutar la consulta SQL
-        demanda = pd.read_sql(query, conn)
-        
-        # UNIR Y FILTRAR solo la demanda de los Hartículos VALIDOS.
-        # Realizar la unión (merge) de los DataFrames por las claves especificadas
-        data = pd.merge(
-            articulos,  # DataFrame de artículos
-            demanda,    # DataFrame de demanda
-            left_on=['C_ARTICULO', 'C_SUCU_EMPR'],  # Claves en 'articulos'
-            right_on=['Codigo_Articulo', 'Sucursal'],  # Claves en 'demanda'
-            how='inner'  # Solo traer los productos que están en 'articulos'
-        )
-            
-        # Guardar los resultados en un archivo CSV con el nombre del Proveedor
-        # en el  mismo formato que hubiera generado el Query.
-        # Esto se utilizaría como cache de datos.
-
-        file_path = f'{folder}/{etiqueta}.csv'
-        data['C_ARTICULO']= data['C_ARTICULO'].astype(int)
-        data['C_SUCU_EMPR']= data['C_SUCU_EMPR'].astype(int)
-        data['C_FAMILIA']= articulos['C_FAMILIA'].astype(int)
-        data['C_RUBRO']= articulos['C_RUBRO'].astype(int)
-        data['Codigo_Articulo']= data['Codigo_Articulo'].astype(int)
-        data['Sucursal']= data['Sucursal'].astype(int)
-        data.to_csv(file_path, index=False, encoding='utf-8')
-        print(f"---> Datos de RECUPERACIÓN guardados: {file_path}")  
-
-        # Eliminar Columnas Innecesarias
-        data = data[['Fecha', 'Codigo_Articulo', 'Sucursal', 'Unidades']]
-        
-        # Guardar los datos Compactos de VENTAS en un archivo CSV con el nombre del Proveedor y sufijo _Ventas
-        file_path = f'{folder}/{etiqueta}_Ventas.csv'
-        data.to_csv(file_path, index=False, encoding='utf-8')
-        print(f"---> Datos de Ventas guardados: {file_path}")  
-        
-        # Cerrar la conexión después de la iteración
-        Close_Connection(conn)
-        return data, articulos
+###----------------------------------------------------------------
+# EXTRACCIÓN EN LOTE DE VARIOS PROVEEDORES
+# En lugar de dos consultas por proveedor contra el servidor vinculado, se junta a todos los
+# proveedores pendientes (de a PROVEEDORES_POR_LOTE) en una consulta de artículos y una de ventas
+# con lista IN, y el resultado se reparte localmente en el cache de cada etiqueta.
+# Después generar_datos encuentra el cache vigente y no vuelve a consultar.
+###----------------------------------------------------------------
+EXTRACCION_LOTE = (secrets.get("EXTRACCION_LOTE") or 'S').upper() == 'S'
+PROVEEDORES_POR_LOTE = int(secrets.get("PROVEEDORES_POR_LOTE") or 50)
+
+def generar_datos_lote(pedidos, recarga_completa=False):
+    """
+    Genera el cache de varias etiquetas con una consulta por tabla de origen.
+
+    - pedidos: lista de (id_proveedor, etiqueta, ventana).
+    - recarga_completa: ignora cache y marcas de agua.
+    Solo se consultan los proveedores cuyo cache no está vigente. Retorna las etiquetas generadas.
+    """
+    pendientes = []
+    for id_proveedor, etiqueta, ventana in pedidos:
+        vigente, motivo = estado_datos(etiqueta, recarga_completa)
+        if not vigente:
+            pendientes.append((int(id_proveedor), etiqueta, ventana))
+            print(f"-> Lote: {etiqueta} pendiente ({motivo})")
+    if not pendientes:
+        print("-> Lote: todos los datos en cache están vigentes")
+        return []
+
+    proveedores = list(dict.fromkeys(p for p, _, _ in pendientes))
+    medicion = {'inicio_mb': memoria_rss_mb()}
+    generadas = []
+    for k in range(0, len(proveedores), PROVEEDORES_POR_LOTE):
+        lote = proveedores[k:k + PROVEEDORES_POR_LOTE]
+        inicio = time.perf_counter()
+        resultados, _ = consultar_en_paralelo({
+            'articulos': lambda: con_conexion(consultar_articulos_proveedores, lote),
+            'ventas': lambda: con_conexion(extraer_ventas_proveedores, lote, recarga_completa, medicion),
+        }, f'lote de {len(lote)} proveedores')
+        articulos, marcas = resultados['articulos'], resultados['ventas']
+        for id_proveedor, etiqueta, ventana in pendientes:
+            if id_proveedor not in marcas:
+                continue
+            try:
+                propios = preparar_articulos(articulos[articulos['C_PROVEEDOR_PRIMARIO'] == id_proveedor], ventana)
+                armar_datos_proveedor(id_proveedor, etiqueta, propios, marcas[id_proveedor], medicion)
+                generadas.append(etiqueta)
+            except Exception as e:
+                print(f"❌ Error armando los datos de {etiqueta}: {e}")
+        print(f"✅ Lote de {len(lote)} proveedores: {time.perf_counter() - inicio:.1f}s")
+    medir_memoria(medicion)
+    print(f"🧠 Memoria lote: pico RSS {medicion['pico_mb']:.0f} MB (inicio {medicion['inicio_mb']:.0f} MB)")
+    return generadas
 
 def dividir_dataframe(data, fecha_corte):
     """
@@ -325,10 +1131,93 @@ def dividir_dataframe(data, fecha_corte):
     
     return data_train, data_test
 
+###----------------------------------------------------------------
+# FOTO DE ARTÍCULOS POR CORRIDA
+# {nombre}_Articulos (T051/T050/T060/T710 del proveedor, grabada por generar_datos en S10) es la
+# única lectura de esas tablas en la corrida: S20 la une al forecast (unir_articulos) y las vistas de
+# stock (obtener_datos_stock) y precios (get_precios) se arman localmente a partir de ella.
+# Si la foto no existe, es de una versión sin las columnas necesarias o tiene más de FOTO_ARTICULOS_HORAS
+# horas (según el manifiesto del cache; el stock es el del cierre del día anterior), se consulta la base como antes.
+###----------------------------------------------------------------
+FOTO_ARTICULOS_HORAS = float(secrets.get("FOTO_ARTICULOS_HORAS") or 12)
+COLUMNAS_FOTO_PRECIOS = ['C_PROVEEDOR_PRIMARIO', 'C_ARTICULO', 'C_SUCU_EMPR', 'I_PRECIO_VTA', 'I_COSTO_ESTADISTICO']
+COLUMNAS_FOTO_STOCK = COLUMNAS_FOTO_PRECIOS + [
+    'Q_FACTOR_VTA_SUCU', 'Q_STOCK_UNIDADES', 'Q_STOCK_PESO', 'Q_VENTA_30_DIAS', 'Q_VENTA_15_DIAS',
+    'F_ULTIMA_VTA', 'Q_VTA_ULTIMOS_15DIAS', 'Q_VTA_ULTIMOS_30DIAS']
+
+def leer_foto_articulos(id_proveedor, etiqueta, columnas=None):
+    """
+    Foto artículo x sucursal de la corrida para una etiqueta ('189_X' o '189_X_ALGO_01').
+    Retorna None si no existe, está vencida, le faltan columnas o es de otro proveedor.
+    """
+    nombre = etiqueta.split('_ALGO')[0]
+    edad = edad_cache_horas(f'{nombre}_Articulos')
+    if edad is None or edad > FOTO_ARTICULOS_HORAS:
+        motivo = 'sin entrada en el manifiesto' if edad is None else f'{edad:.1f} h'
+        print(f"-> Foto de artículos de {nombre} no vigente ({motivo}): se consulta la base")
+        return None
+    try:
+        foto = leer_cache(f'{nombre}_Articulos', columnas)
+    except Exception:
+        return None
+    if foto.empty or (foto['C_PROVEEDOR_PRIMARIO'].astype(int) != int(id_proveedor)).any():
+        return None
+    # Los LEFT JOIN con T052/T055 pueden repetir la clave; las vistas son una fila por artículo x sucursal
+    foto = foto.drop_duplicates(subset=['C_ARTICULO', 'C_SUCU_EMPR'], keep='first')
+    return foto.sort_values(['C_ARTICULO', 'C_SUCU_EMPR']).reset_index(drop=True)
+
+def vista_precios(foto):
+    # Mismas columnas que la consulta de get_precios
+    precios = foto[COLUMNAS_FOTO_PRECIOS].copy()
+    for columna in ('C_PROVEEDOR_PRIMARIO', 'C_ARTICULO', 'C_SUCU_EMPR'):
+        precios[columna] = precios[columna].astype(int)
+    for columna in ('I_PRECIO_VTA', 'I_COSTO_ESTADISTICO'):
+        precios[columna] = precios[columna].astype(float)
+    return precios
+
+def vista_stock(foto):
+    """
+    Mismas columnas y cálculos que la consulta de obtener_datos_stock, hechos sobre la foto.
+    Respeta la semántica de NULL de SQL (un término nulo anula la suma) antes del fillna(0) final.
+    """
+    numero = lambda columna: pd.to_numeric(foto[columna], errors='coerce').astype(float)
+    factor, costo = numero('Q_FACTOR_VTA_SUCU'), numero('I_COSTO_ESTADISTICO')
+    unidades, peso = numero('Q_STOCK_UNIDADES'), numero('Q_STOCK_PESO')
+    venta_30, venta_15 = numero('Q_VENTA_30_DIAS'), numero('Q_VENTA_15_DIAS')
+
+    divisor = (venta_30.fillna(0) + venta_15.fillna(0)) * factor.fillna(0) * costo.fillna(0)
+    cociente = ((unidades.fillna(0) + peso.fillna(0)) * costo.fillna(0)) / divisor.where(divisor != 0)
+    dias = np.sign(cociente) * np.floor(np.abs(cociente) + 0.5) * 30   # ROUND(x, 0) de SQL Server
+
+    df_stock = pd.DataFrame({
+        'Codigo_Proveedor': foto['C_PROVEEDOR_PRIMARIO'].astype(int),
+        'Codigo_Articulo': foto['C_ARTICULO'].astype(int),
+        'Codigo_Sucursal': foto['C_SUCU_EMPR'].astype(int),
+        'Precio_Venta': numero('I_PRECIO_VTA'),
+        'Precio_Costo': costo,
+        'Factor_Venta': factor,
+        'Stock_Unidades': unidades + peso,
+        'Venta_Unidades_30_Dias': (venta_30 + venta_15) * factor,
+        'Stock_Valorizado': (unidades + peso) * costo,
+        'Venta_Valorizada': (venta_30 + venta_15) * factor * costo,
+        'Dias_Stock': dias,
+        'F_ULTIMA_VTA': foto['F_ULTIMA_VTA'],
+        'VENTA_UNIDADES_1Q': numero('Q_VTA_ULTIMOS_15DIAS') * factor,
+        'VENTA_UNIDADES_2Q': numero('Q_VTA_ULTIMOS_30DIAS') * factor,
+    })
+    df_stock.fillna(0, inplace= True)
+    return df_stock
+
 def obtener_datos_stock(id_proveedor, etiqueta):
     secrets = dotenv_values(".env")   # Connection String from .env
     folder = secrets["FOLDER_DATOS"]
     
+    # Si la corrida ya tiene la foto de artículos (S10), la vista de stock se arma localmente
+    foto = leer_foto_articulos(id_proveedor, etiqueta, COLUMNAS_FOTO_STOCK)
+    if foto is not None:
+        print(f"-> Stock de {etiqueta} desde la foto de artículos de la corrida")
+        return vista_stock(foto)
+
     #  Intento recuperar datos cacheados
     try:         
         print(f"-> Generando datos para ID: {id_proveedor}, Label: {etiqueta}")
@@ -495,7 +1384,12 @@ def Exportar_Pronostico(df_forecast, proveedor, etiqueta, algoritmo):
     finally:
         Close_Connection(conn)
 
-def get_precios(id_proveedor):
+def get_precios(id_proveedor, etiqueta=None):
+    # Con etiqueta, se usa la foto de artículos de la corrida si existe
+    if etiqueta is not None:
+        foto = leer_foto_articulos(id_proveedor, etiqueta, COLUMNAS_FOTO_PRECIOS)
+        if foto is not None:
+            return vista_precios(foto)
     conn = Open_Connection()
     query = f"""
         SELECT 
@@ -522,36 +1416,194 @@ def get_precios(id_proveedor):
     precios['C_SUCU_EMPR']= precios['C_SUCU_EMPR'].astype(int)
     return precios
 
-def actualizar_site_ids(df_forecast_ext, conn, name):
+###----------------------------------------------------------------
+# CONSULTAS CONCURRENTES (E/S en paralelo, cada una con su conexión)
+# Las consultas de un proveedor (artículos, ventas, stock, demora de OC, precios) son independientes
+# y pasan casi todo el tiempo esperando a la base: se lanzan juntas en un pool chico de hilos.
+# Se cronometra cada una para ver qué tabla de origen es el cuello de botella.
+###----------------------------------------------------------------
+CONSULTAS_CONCURRENTES = int(secrets.get("CONSULTAS_CONCURRENTES") or 4)
+
+def con_conexion(funcion, *args, **kwargs):
+    # Ejecuta funcion(conn, ...) con una conexión propia (pyodbc no comparte conexiones entre hilos)
+    conn = Open_Connection()
+    try:
+        return funcion(conn, *args, **kwargs)
+    finally:
+        Close_Connection(conn)
+
+def consultar_en_paralelo(tareas, etiqueta='', propagar=True):
+    """
+    Ejecuta en paralelo las consultas de 'tareas' (dict nombre -> función sin argumentos).
+
+    - propagar: si es True relanza el primer error; si no, la consulta con error devuelve None.
+    Retorna (resultados, tiempos): dos dict por nombre; tiempos en segundos.
     """
-    Reemplaza site_id en df_forecast_ext con datos válidos desde fnd_site.
-    Asegura que no haya conflictos de columnas durante el merge.
+    def cronometrar(funcion):
+        inicio = time.perf_counter()
+        try:
+            return funcion(), None, time.perf_counter() - inicio
+        except Exception as e:
+            return None, e, time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(CONSULTAS_CONCURRENTES, len(tareas)))) as pool:
+        futuros = {nombre: pool.submit(cronometrar, funcion) for nombre, funcion in tareas.items()}
+    resultados, tiempos, errores = {}, {}, {}
+    for nombre, futuro in futuros.items():
+        resultados[nombre], error, tiempos[nombre] = futuro.result()
+        if error is not None:
+            errores[nombre] = error
+            print(f"❌ Consulta {nombre} {etiqueta}: {error}")
+    total = time.perf_counter() - inicio
+    if tiempos:
+        detalle = ' | '.join(f'{n} {t:.1f}s' for n, t in sorted(tiempos.items(), key=lambda x: -x[1]))
+        print(f"⏱️ Consultas {etiqueta}: {detalle} - total {total:.1f}s (cuello de botella: {max(tiempos, key=tiempos.get)})")
+    if propagar and errores:
+        raise next(iter(errores.values()))
+    return resultados, tiempos
+
+def obtener_datos_complementarios(id_proveedor, etiqueta, consultas=('stock', 'demora', 'precios')):
     """
-    query = """
-    SELECT code, name, id FROM public.fnd_site
-    WHERE company_id = 'e7498b2e-2669-473f-ab73-e2c8b4dcc585'
-    ORDER BY code
+    Stock, OC demoradas y precios de un proveedor consultados en paralelo.
+    Retorna un dict con los DataFrames pedidos (None si la consulta falló).
     """
-    stores = pd.read_sql(query, conn)
+    disponibles = {
+        'stock': lambda: obtener_datos_stock(id_proveedor=id_proveedor, etiqueta=etiqueta),
+        'demora': lambda: obtener_demora_oc(id_proveedor=id_proveedor, etiqueta=etiqueta),
+        'precios': lambda: get_precios(id_proveedor, etiqueta),
+    }
+    resultados, _ = consultar_en_paralelo({c: disponibles[c] for c in consultas}, etiqueta, propagar=False)
+    return resultados
+
+###----------------------------------------------------------------
+# CACHE DE DATOS DE REFERENCIA (fnd_site y fnd_product de CONNEXA)
+# Se leen una vez por proceso (memo), se guardan en {folder}/Referencia_{nombre} y se validan con una
+# consulta que resuelve la base: cantidad de filas, checksum md5 de los pares código/id y, si se configura
+# REFERENCIAS_COLUMNA_FECHA, su máximo. Así un código reasignado a otro id invalida la foto aunque no
+# cambie la cantidad de filas.
+# Las búsquedas código -> id usan índices ya armados: un dict y arrays NumPy ordenados (searchsorted).
+# Si un código está repetido gana la fila modificada más recientemente (REFERENCIAS_COLUMNA_FECHA) o,
+# sin esa columna, la de mayor id, para que el resultado no dependa del orden en que responde la base.
+###----------------------------------------------------------------
+COMPANIA_CONNEXA = secrets.get("COMPANIA_CONNEXA") or 'e7498b2e-2669-473f-ab73-e2c8b4dcc585'
+REFERENCIAS_COLUMNA_FECHA = secrets.get("REFERENCIAS_COLUMNA_FECHA") or ''
+REFERENCIAS_VALIDAR_SEGUNDOS = int(secrets.get("REFERENCIAS_VALIDAR_SEGUNDOS") or 300)
+REFERENCIAS = {
+    'sitios': {'tabla': 'public.fnd_site', 'codigo': 'code', 'columnas': 'code, name, id',
+               'filtro': f"company_id = '{COMPANIA_CONNEXA}'"},
+    'productos': {'tabla': 'public.fnd_product', 'codigo': 'ext_code', 'columnas': 'ext_code, description, id',
+                  'filtro': None},
+}
+_REFERENCIAS = {}   # memo en proceso: nombre -> referencia armada
+
+def firma_referencia(nombre, conn):
+    # Cantidad de filas, checksum de los pares código/id (y máximo de la columna de fecha, si se configuró)
+    definicion = REFERENCIAS[nombre]
+    donde = f"WHERE {definicion['filtro']}" if definicion['filtro'] else ''
+    par = f"coalesce({definicion['codigo']}::text, '') || '|' || id::text"
+    fecha = f", MAX({REFERENCIAS_COLUMNA_FECHA}) AS ultima" if REFERENCIAS_COLUMNA_FECHA else ''
+    firma = pd.read_sql(f"""
+        SELECT COUNT(*) AS filas, md5(coalesce(string_agg({par}, ',' ORDER BY id::text), '')) AS suma{fecha}
+        FROM {definicion['tabla']} {donde}
+    """, conn)
+    return {'filas': int(firma['filas'].iloc[0]), 'suma': str(firma['suma'].iloc[0]),
+            'ultima': str(firma['ultima'].iloc[0]) if REFERENCIAS_COLUMNA_FECHA else None}
+
+def consulta_referencia(nombre):
+    # SELECT de la tabla de referencia (con la columna de fecha como 'modificado', si se configuró)
+    definicion = REFERENCIAS[nombre]
+    donde = f"WHERE {definicion['filtro']}" if definicion['filtro'] else ''
+    fecha = f", {REFERENCIAS_COLUMNA_FECHA} AS modificado" if REFERENCIAS_COLUMNA_FECHA else ''
+    return f"SELECT {definicion['columnas']}{fecha} FROM {definicion['tabla']} {donde}"
+
+def armar_referencia(nombre, tabla, firma):
+    # Deja solo códigos numéricos y arma los índices código -> id
+    codigo = REFERENCIAS[nombre]['codigo']
+    tabla = tabla[pd.to_numeric(tabla[codigo], errors='coerce').notna()].copy()
+    tabla[codigo] = tabla[codigo].astype(int)
+    # Códigos repetidos: queda el más reciente (o el de mayor id si no hay columna de fecha)
+    orden = [codigo, 'modificado', 'id'] if 'modificado' in tabla.columns else [codigo, 'id']
+    unicos = tabla.sort_values(orden, kind='stable', na_position='first').drop_duplicates(subset=codigo, keep='last')
+    return {'tabla': tabla, 'firma': firma, 'validada': time.time(),
+            'codigos': unicos[codigo].to_numpy(dtype=np.int64), 'ids': unicos['id'].to_numpy(dtype=object),
+            'dict': dict(zip(unicos[codigo].tolist(), unicos['id'].tolist()))}
+
+def obtener_referencia(nombre, conn=None):
+    """
+    Tabla de referencia ('sitios' o 'productos') con sus índices: 'tabla', 'codigos', 'ids' y 'dict'.
+    Orden de búsqueda: memo del proceso -> foto en disco -> base. La memo se revalida cada
+    REFERENCIAS_VALIDAR_SEGUNDOS y la foto en disco siempre, comparando la firma con la base.
+    - conn: conexión a CONNEXA (si es None se abre una solo cuando hace falta).
+    """
+    memo = _REFERENCIAS.get(nombre)
+    if memo is not None and time.time() - memo['validada'] < REFERENCIAS_VALIDAR_SEGUNDOS:
+        return memo
 
-    # Asegurar que el campo 'code' sea numérico y entero
-    stores = stores[pd.to_numeric(stores['code'], errors='coerce').notna()].copy()
-    stores['code'] = stores['code'].astype(int)
+    propia = conn is None
+    if propia:
+        conn = Open_Conn_Postgres()
+    try:
+        firma = firma_referencia(nombre, conn)
+        if memo is not None and memo['firma'] == firma:
+            memo['validada'] = time.time()
+            return memo
+
+        ruta_firma = f'{folder}/Referencia_{nombre}.json'
+        try:
+            with open(ruta_firma, encoding='utf-8') as archivo:
+                firma_disco = json.load(archivo)
+            if firma_disco == firma:
+                _REFERENCIAS[nombre] = armar_referencia(nombre, leer_cache(f'Referencia_{nombre}'), firma)
+                print(f"-> Referencia {nombre} recuperada de disco ({firma['filas']} filas)")
+                return _REFERENCIAS[nombre]
+        except (FileNotFoundError, ValueError):
+            pass
+
+        tabla = pd.read_sql(consulta_referencia(nombre), conn)
+        guardar_cache(tabla, f'Referencia_{nombre}')
+        with open(ruta_firma, 'w', encoding='utf-8') as archivo:
+            json.dump(firma, archivo)
+        _REFERENCIAS[nombre] = armar_referencia(nombre, tabla, firma)
+        print(f"-> Referencia {nombre} leída de la base ({firma['filas']} filas)")
+        return _REFERENCIAS[nombre]
+    finally:
+        if propia:
+            Close_Connection(conn)
 
+def mapear_ids(nombre, codigos, conn=None):
+    """
+    Traduce una serie/array de códigos (Sucursal, Codigo_Articulo) al id de CONNEXA con
+    búsqueda binaria sobre el índice ordenado. Los códigos sin id quedan en NaN.
+    """
+    referencia = obtener_referencia(nombre, conn)
+    codigos = pd.to_numeric(pd.Series(codigos), errors='coerce').to_numpy(dtype=float)
+    ids = np.full(len(codigos), np.nan, dtype=object)
+    if len(referencia['codigos']) == 0:
+        return ids
+    validos = ~np.isnan(codigos)
+    buscados = codigos[validos].astype(np.int64)
+    pos = np.minimum(np.searchsorted(referencia['codigos'], buscados), len(referencia['codigos']) - 1)
+    encontrados = referencia['codigos'][pos] == buscados
+    resultado = np.full(len(buscados), np.nan, dtype=object)
+    resultado[encontrados] = referencia['ids'][pos[encontrados]]
+    ids[validos] = resultado
+    return ids
+
+def actualizar_site_ids(df_forecast_ext, conn, name):
+    """
+    Reemplaza site_id en df_forecast_ext con datos válidos desde fnd_site (cache de referencia).
+    Asegura que no haya conflictos de columnas.
+    """
     # Eliminar columna 'site_id' si ya existe
     df_forecast_ext = df_forecast_ext.drop(columns=['site_id'], errors='ignore')
 
-    # Eliminar columna 'code' si ya existe en df_forecast_ext para evitar colisión en el merge
+    # Eliminar columna 'code' si ya existe en df_forecast_ext (versiones anteriores la traían del merge)
     if 'code' in df_forecast_ext.columns:
         df_forecast_ext = df_forecast_ext.drop(columns=['code'])
 
-    # Realizar el merge con stores (fnd_site) para traer el site_id
-    df_forecast_ext = df_forecast_ext.merge(
-        stores[['code', 'id']],
-        left_on='Sucursal',
-        right_on='code',
-        how='left'
-    ).rename(columns={'id': 'site_id'})
+    # Traer el site_id desde el índice de sitios
+    df_forecast_ext['site_id'] = mapear_ids('sitios', df_forecast_ext['Sucursal'], conn)
 
     # Validar valores faltantes de site_id
     missing = df_forecast_ext[df_forecast_ext['site_id'].isna()]
@@ -1149,19 +2201,1338 @@ def Calcular_Demanda_ALGO_06(df, id_proveedor, etiqueta, ventana, current_date):
     df_forecast = df_forecast[['id_proveedor', 'Codigo_Articulo', 'Sucursal',  'algoritmo', 'ventana', 'f1', 'f2', 'f3', 'Fecha_Pronostico',
                             'Forecast', 'Average','ventas_last', 'ventas_previous', 'ventas_same_year']]
 
-    return df_forecast
+    return df_forecast
+
+###----------------------------------------------------------------
+# MOTOR VECTORIZADO: PANEL DENSO DE VENTAS (series × días)
+# Reemplaza el groupby(['Codigo_Articulo','Sucursal']) + resample('D') de cada algoritmo.
+# El panel se arma UNA sola vez por proveedor y los algoritmos operan sobre la matriz completa.
+###----------------------------------------------------------------
+COLUMNAS_FORECAST = ['id_proveedor', 'Codigo_Articulo', 'Sucursal',  'algoritmo', 'ventana', 'f1', 'f2', 'f3', 'Fecha_Pronostico',
+                     'Forecast', 'Average','ventas_last', 'ventas_previous', 'ventas_same_year']
+
+# Motor utilizado por los Procesar_ALGO_xx: 'panel' (vectorizado) o 'clasico' (groupby por serie)
+MOTOR_FORECAST = secrets.get("MOTOR_FORECAST") or 'panel'
+# Ajuste Holt del ALGO_02: 'statsmodels' (una optimización por serie) o 'grilla' (Holt vectorizado)
+HOLT_ALGO_02 = secrets.get("HOLT_ALGO_02") or 'statsmodels'
+HOLT_REFINAR_TOP_N = int(secrets.get("HOLT_REFINAR_TOP_N") or 0)
+# ALGO_03 (Holt-Winters): ajuste en paralelo (S/N), procesos (0 = CPUs - 1) y segundos máximos por serie
+# (0 = sin límite, como el original). Con límite, la serie que lo supera queda con el pronóstico de respaldo.
+# El corte dentro de la grilla de fuerza bruta usa SIGALRM: en Windows, o fuera del hilo principal, solo se
+# controla entre iteraciones del optimizador y una serie puede pasarse del límite mientras dura la grilla.
+ALGO_03_PARALELO = (secrets.get("ALGO_03_PARALELO") or 'N').upper() == 'S'
+PROCESOS_FORECAST = int(secrets.get("PROCESOS_FORECAST") or 0)
+ALGO_03_SEGUNDOS_SERIE = float(secrets.get("ALGO_03_SEGUNDOS_SERIE") or 0)
+# ALGO_02 / ALGO_03 (statsmodels): arrancar desde los parámetros del último ajuste (S/N) y
+# fracción de días nuevos por debajo de la cual se reutilizan sin optimizar (0 = siempre optimiza)
+AJUSTE_ARRANQUE_PREVIO = (secrets.get("AJUSTE_ARRANQUE_PREVIO") or 'N').upper() == 'S'
+AJUSTE_UMBRAL_REUTILIZAR = float(secrets.get("AJUSTE_UMBRAL_REUTILIZAR") or 0)
+# Clasificación previa al ajuste de ALGO_02 / ALGO_03 (S/N): series muertas, intermitentes y regulares
+CLASIFICAR_SERIES = (secrets.get("CLASIFICAR_SERIES") or 'N').upper() == 'S'
+DIAS_SERIE_MUERTA = int(secrets.get("DIAS_SERIE_MUERTA") or 90)
+DIAS_CLASIFICACION = int(secrets.get("DIAS_CLASIFICACION") or 180)
+UMBRAL_ADI = float(secrets.get("UMBRAL_ADI") or 1.32)
+CROSTON_ALFA = float(secrets.get("CROSTON_ALFA") or 0.1)
+# Forecast incremental (S/N): las series cuya historia no cambió reutilizan el forecast de la corrida anterior
+FORECAST_INCREMENTAL = (secrets.get("FORECAST_INCREMENTAL") or 'N').upper() == 'S'
+DIAS_HUELLA = int(secrets.get("DIAS_HUELLA") or 400)
+
+def configuracion_motor():
+    # Parámetros del .env que cambian el resultado de los algoritmos (forman parte de la clave de S10)
+    return {'motor': MOTOR_FORECAST, 'holt_algo_02': HOLT_ALGO_02, 'holt_refinar_top_n': HOLT_REFINAR_TOP_N,
+            'algo_03_segundos_serie': ALGO_03_SEGUNDOS_SERIE, 'arranque_previo': AJUSTE_ARRANQUE_PREVIO,
+            'umbral_reutilizar': AJUSTE_UMBRAL_REUTILIZAR, 'clasificar': CLASIFICAR_SERIES,
+            'dias_serie_muerta': DIAS_SERIE_MUERTA, 'dias_clasificacion': DIAS_CLASIFICACION, 'umbral_adi': UMBRAL_ADI,
+            'croston_alfa': CROSTON_ALFA, 'incremental': FORECAST_INCREMENTAL, 'dias_huella': DIAS_HUELLA,
+            'ventanas_en_servidor': VENTANAS_EN_SERVIDOR}
+
+def construir_panel_ventas(df):
+    """
+    Convierte el DataFrame de ventas (formato largo) en un panel denso series × días.
+
+    Parámetros:
+    - df: DataFrame con columnas 'Fecha', 'Codigo_Articulo', 'Sucursal' y 'Unidades'.
+
+    Retorna un diccionario con:
+    - claves: DataFrame (Codigo_Articulo, Sucursal), en el mismo orden que df.groupby().
+    - valores: matriz float64 (n_series × n_dias) con las unidades diarias (0 en días sin venta).
+    - con_registro: matriz bool (n_series × n_dias), True en los días con al menos un registro.
+    - inicio / fin: primer y último día con registro de cada serie (el rango que generaba el resample).
+    - fecha_inicio: fecha de la columna 0 del panel.
+    """
+    claves_cols = ['Codigo_Articulo', 'Sucursal']
+    df = df[df['Codigo_Articulo'].notna() & df['Sucursal'].notna() & df['Fecha'].notna()]
+    if df.empty:
+        return {
+            'claves': pd.DataFrame(columns=claves_cols),
+            'valores': np.zeros((0, 0)),
+            'con_registro': np.zeros((0, 0), dtype=bool),
+            'inicio': np.zeros(0, dtype=np.int64),
+            'fin': np.zeros(0, dtype=np.int64),
+            'fecha_inicio': pd.NaT,
+        }
+
+    fechas = pd.to_datetime(df['Fecha']).dt.normalize()
+    fecha_inicio = fechas.min()
+    dia = (fechas - fecha_inicio).dt.days.to_numpy(dtype=np.int64)
+    n_dias = int(dia.max()) + 1
+
+    grupos = df.groupby(claves_cols, sort=True)
+    serie = grupos.ngroup().to_numpy(dtype=np.int64)
+    claves = grupos.size().reset_index()[claves_cols]
+    n_series = len(claves)
+
+    # Suma de unidades por (serie, día) en una sola pasada
+    unidades = pd.to_numeric(df['Unidades'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    valores = np.bincount(serie * n_dias + dia, weights=unidades, minlength=n_series * n_dias)
+    valores = valores.reshape(n_series, n_dias)
+    con_registro = np.bincount(serie * n_dias + dia, minlength=n_series * n_dias).reshape(n_series, n_dias) > 0
+
+    rango = pd.Series(dia).groupby(serie).agg(['min', 'max'])
+
+    return {
+        'claves': claves,
+        'valores': valores,
+        'con_registro': con_registro,
+        'inicio': rango['min'].to_numpy(dtype=np.int64),
+        'fin': rango['max'].to_numpy(dtype=np.int64),
+        'fecha_inicio': fecha_inicio,
+    }
+
+def panel_semanal(panel):
+    """
+    Agrega el panel diario a semanas cerradas en domingo (equivalente a resample('W')).
+    Conserva el rango de semanas de cada serie.
+    """
+    valores = panel['valores']
+    n_series, n_dias = valores.shape
+    if n_series == 0:
+        return dict(panel)
+
+    # Desplazamiento para que cada bloque de 7 columnas termine en domingo
+    desfase = panel['fecha_inicio'].weekday()
+    n_semanas = (n_dias + desfase + 6) // 7
+    relleno = np.zeros((n_series, n_semanas * 7), dtype=valores.dtype)
+    relleno[:, desfase:desfase + n_dias] = valores
+
+    return {
+        'claves': panel['claves'],
+        'valores': relleno.reshape(n_series, n_semanas, 7).sum(axis=2),
+        'inicio': (panel['inicio'] + desfase) // 7,
+        'fin': (panel['fin'] + desfase) // 7,
+        'fecha_inicio': panel['fecha_inicio'] - pd.Timedelta(days=desfase),
+    }
+
+def serie_panel(panel, i):
+    # Serie i recortada a su propio rango (lo que devolvía el resample de ese grupo)
+    return panel['valores'][i, panel['inicio'][i]:panel['fin'][i] + 1]
+
+# Índice de sumas por ventana: sumas acumuladas por serie sobre el eje de días. Se arma una vez
+# por panel y la suma de cualquier rango [desde, hasta] de todas las series es una resta de dos columnas.
+def indice_ventanas_panel(panel):
+    """
+    Agrega al panel (y lo reutiliza en las llamadas siguientes):
+    - acumulado: suma acumulada de unidades por serie, con una columna 0 al inicio (n_series × n_dias+1).
+    - acumulado_registros: idem con la cantidad de días con registro (para saber si una serie tuvo
+      movimiento en una ventana aunque las unidades sumen 0).
+    """
+    if 'acumulado' not in panel:
+        n_series = panel['valores'].shape[0]
+        ceros = np.zeros((n_series, 1))
+        panel['acumulado'] = np.hstack([ceros, np.cumsum(panel['valores'], axis=1)])
+        panel['acumulado_registros'] = np.hstack([ceros.astype(np.int32),
+                                                  np.cumsum(panel['con_registro'], axis=1, dtype=np.int32)])
+    return panel
+
+def sumar_dias_panel(panel, desde, hasta, columna='acumulado'):
+    """
+    Suma por serie entre los días desde y hasta (inclusive, en días desde fecha_inicio).
+    desde / hasta pueden ser escalares o arreglos con un valor por serie.
+    """
+    acumulado = indice_ventanas_panel(panel)[columna]
+    n_series, n_dias = acumulado.shape[0], acumulado.shape[1] - 1
+    desde = np.clip(np.broadcast_to(desde, (n_series,)), 0, n_dias)
+    hasta = np.clip(np.broadcast_to(hasta, (n_series,)), -1, n_dias - 1)
+    filas = np.arange(n_series)
+    total = acumulado[filas, np.maximum(hasta + 1, desde)] - acumulado[filas, desde]
+    # La resta de acumulados deja ruido de punto flotante (~1e-12): se redondea para no alterar los ceil
+    return np.round(total, 6) if columna == 'acumulado' else total
+
+def dias_ventana_panel(panel, desde, hasta):
+    # Rango de fechas -> días del panel; ceil/floor reproducen los filtros >= desde y <= hasta
+    un_dia = pd.Timedelta(days=1)
+    a = int(np.ceil((pd.Timestamp(desde) - panel['fecha_inicio']) / un_dia))
+    b = int(np.floor((pd.Timestamp(hasta) - panel['fecha_inicio']) / un_dia))
+    return a, b
+
+def sumar_ventana_panel(panel, desde, hasta):
+    """
+    Suma de unidades de todas las series entre desde y hasta (inclusive), como el filtro
+    df[(df['Fecha'] >= desde) & (df['Fecha'] <= hasta)].
+    """
+    if panel['valores'].shape[0] == 0:
+        return np.zeros(0)
+    return sumar_dias_panel(panel, *dias_ventana_panel(panel, desde, hasta))
+
+def contar_ventana_panel(panel, desde, hasta):
+    # Días con registro de cada serie entre desde y hasta (inclusive)
+    if panel['valores'].shape[0] == 0:
+        return np.zeros(0, dtype=np.int64)
+    return sumar_dias_panel(panel, *dias_ventana_panel(panel, desde, hasta), columna='acumulado_registros')
+
+def rangos_periodos(current_date, ventana):
+    # Rangos (desde, hasta) de ventas_last / ventas_previous / ventas_same_year, como en los Calcular_Demanda_ALGO_xx
+    return {
+        'ventas_last': (current_date - pd.Timedelta(days=ventana - 1),
+                        current_date),
+        'ventas_previous': (current_date - pd.Timedelta(days=2 * ventana - 1),
+                            current_date - pd.Timedelta(days=ventana)),
+        'ventas_same_year': (current_date - pd.DateOffset(years=1) - pd.Timedelta(days=ventana - 1),
+                             current_date - pd.DateOffset(years=1)),
+    }
+
+def ventas_periodos_panel(panel, current_date, ventana):
+    return {columna: sumar_ventana_panel(panel, desde, hasta)
+            for columna, (desde, hasta) in rangos_periodos(current_date, ventana).items()}
+
+def armar_forecast_panel(panel, filas, forecast, average, id_proveedor, algoritmo, ventana, f1, f2, f3, current_date, ventas=None,
+                         decimales=2):
+    """
+    Arma el df_forecast con el mismo esquema que los Calcular_Demanda_ALGO_xx.
+
+    - filas: índices de las series del panel que se informan (en orden).
+    - forecast: pronóstico total por serie (NaN si no se pudo calcular).
+    - average: promedio diario por serie; si es None se calcula como Forecast / ventana.
+    - ventas: ventas_last / ventas_previous / ventas_same_year ya calculadas (por defecto se suman del panel).
+    - decimales: redondeo previo al ceil del Forecast (None = ceil directo, como ALGO_01).
+    """
+    df_forecast = panel['claves'].iloc[filas].reset_index(drop=True)
+    forecast = np.asarray(forecast, dtype=np.float64)
+    if decimales is not None:
+        forecast = np.round(forecast, decimales)
+    df_forecast['Forecast'] = np.ceil(forecast).clip(min=0)
+    if average is None:
+        df_forecast['Average'] = round(df_forecast['Forecast'] / ventana, 3)
+    else:
+        df_forecast['Average'] = np.round(np.asarray(average, dtype=np.float64), 3)
+
+    df_forecast['id_proveedor'] = id_proveedor
+    df_forecast['ventana'] = ventana
+    df_forecast['algoritmo'] = algoritmo
+    df_forecast['f1'] = f1
+    df_forecast['f2'] = f2
+    df_forecast['f3'] = f3
+    df_forecast['Fecha_Pronostico'] = current_date
+
+    ventas = ventas_periodos_panel(panel, current_date, ventana) if ventas is None else ventas
+    for columna, valores in ventas.items():
+        df_forecast[columna] = valores[filas]
+    df_forecast.fillna(0, inplace=True)
+
+    return df_forecast[COLUMNAS_FORECAST]
+
+def ewma_ultimo_panel(panel, alpha):
+    """
+    Último valor de ewm(alpha, adjust=False).mean() de cada serie del panel, en una sola llamada.
+
+    La recursión y_t = (1-alpha)*y_(t-1) + alpha*x_t es un filtro lineal, así que se aplica
+    lfilter sobre el eje de días de toda la matriz. Para arrancar cada serie con y = x en su
+    primer día (como pandas) se divide ese primer valor por alpha: el estado previo es 0
+    porque el panel no tiene ventas antes del inicio de la serie.
+    Coincide con pandas salvo redondeo de punto flotante (~1e-12).
+    """
+    valores, inicio, fin = panel['valores'], panel['inicio'], panel['fin']
+    filas = np.arange(len(inicio))
+    if len(filas) == 0:
+        return np.zeros(0)
+    if alpha <= 0:
+        return valores[filas, inicio].copy()   # Sin suavizado: queda el primer valor
+
+    entrada = valores[:, :int(fin.max()) + 1].copy()
+    entrada[filas, inicio] /= alpha
+    suavizado = lfilter([alpha], [1.0, alpha - 1.0], entrada, axis=1)
+    return suavizado[filas, fin]
+
+###----------------------------------------------------------------
+# ÍNDICE ORDENADO DE VENTAS: sumas por ventana sin armar la matriz densa
+# (searchsorted sobre la clave serie/día + suma acumulada de Unidades)
+###----------------------------------------------------------------
+def indexar_ventas_ordenadas(df):
+    """
+    Ordena las ventas UNA sola vez por (Codigo_Articulo, Sucursal, Fecha) y arma una clave
+    serie * n_dias + día, de modo que la suma de cualquier rango de fechas de todas las series
+    se resuelve con dos searchsorted y una resta de sumas acumuladas.
+
+    Retorna un diccionario con claves (mismo orden que df.groupby()), inicio / fin de cada serie
+    (en días desde fecha_inicio), la clave ordenada y la suma acumulada de Unidades.
+    """
+    df = df[df['Codigo_Articulo'].notna() & df['Sucursal'].notna() & df['Fecha'].notna()]
+    if df.empty:
+        return {
+            'claves': pd.DataFrame(columns=['Codigo_Articulo', 'Sucursal']),
+            'clave': np.zeros(0, dtype=np.int64),
+            'acumulado': np.zeros(1),
+            'n_dias': 0,
+            'inicio': np.zeros(0, dtype=np.int64),
+            'fin': np.zeros(0, dtype=np.int64),
+            'fecha_inicio': pd.NaT,
+        }
+
+    fechas = pd.to_datetime(df['Fecha']).dt.normalize()
+    fecha_inicio = fechas.min()
+    dia = (fechas - fecha_inicio).dt.days.to_numpy(dtype=np.int64)
+    n_dias = int(dia.max()) + 1
+    codigo = df['Codigo_Articulo'].to_numpy()
+    sucursal = df['Sucursal'].to_numpy()
+    unidades = pd.to_numeric(df['Unidades'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+    # Con códigos enteros se ordena por una única clave int64 (mucho más rápido que lexsort)
+    rango_codigo = int(codigo.max()) - int(codigo.min()) + 1 if codigo.dtype.kind in 'iu' else 0
+    rango_sucursal = int(sucursal.max()) - int(sucursal.min()) + 1 if sucursal.dtype.kind in 'iu' else 0
+    if 0 < rango_codigo * rango_sucursal * n_dias < 2**62:
+        clave_unica = ((codigo - codigo.min()) * rango_sucursal + (sucursal - sucursal.min())) * n_dias + dia
+        orden = np.argsort(clave_unica)
+    else:
+        orden = np.lexsort((dia, sucursal, codigo))
+    codigo, sucursal, dia, unidades = codigo[orden], sucursal[orden], dia[orden], unidades[orden]
+
+    # Cortes de serie sobre el arreglo ordenado
+    nueva = np.r_[True, (codigo[1:] != codigo[:-1]) | (sucursal[1:] != sucursal[:-1])]
+    serie = np.cumsum(nueva) - 1
+    primero = np.flatnonzero(nueva)
+    ultimo = np.r_[primero[1:] - 1, len(dia) - 1]
+
+    return {
+        'claves': pd.DataFrame({'Codigo_Articulo': codigo[primero], 'Sucursal': sucursal[primero]}),
+        'clave': serie * n_dias + dia,
+        'acumulado': np.r_[0.0, np.cumsum(unidades)],
+        'n_dias': n_dias,
+        'inicio': dia[primero],
+        'fin': dia[ultimo],
+        'fecha_inicio': fecha_inicio,
+    }
+
+def dia_indice(indice, fecha, redondeo=np.floor):
+    # Días desde fecha_inicio; ceil para el 'desde' y floor para el 'hasta' si la fecha trae hora
+    return int(redondeo((pd.Timestamp(fecha) - indice['fecha_inicio']) / pd.Timedelta(days=1)))
+
+def sumar_ventana_indice(indice, desde, hasta):
+    """
+    Suma de Unidades de cada serie entre los días desde y hasta (inclusive).
+    desde / hasta pueden ser escalares o arreglos con un valor por serie.
+    """
+    n_series, n_dias = len(indice['claves']), indice['n_dias']
+    base = np.arange(n_series, dtype=np.int64) * n_dias
+    desde = np.clip(np.broadcast_to(desde, (n_series,)), 0, n_dias)
+    hasta = np.clip(np.broadcast_to(hasta, (n_series,)), -1, n_dias - 1)
+    lo = np.searchsorted(indice['clave'], base + desde, side='left')
+    hi = np.searchsorted(indice['clave'], base + hasta, side='right')
+    return np.where(hi > lo, indice['acumulado'][np.maximum(hi, lo)] - indice['acumulado'][lo], 0.0)
+
+def ventas_periodos_indice(indice, current_date, ventana):
+    return {columna: sumar_ventana_indice(indice,
+                                          dia_indice(indice, desde, np.ceil),
+                                          dia_indice(indice, hasta, np.floor))
+            for columna, (desde, hasta) in rangos_periodos(current_date, ventana).items()}
+
+def promedio_diario_indice(indice, dias, hasta=None):
+    """
+    Venta media diaria de los últimos 'dias' días de cada serie.
+
+    - hasta: fecha de corte; si es None se toma el último día con venta de cada serie
+      (lo que hacía ventas_diarias[-30:] sobre el resample).
+    Los días anteriores a la primera venta de la serie no se cuentan: si hay menos días
+    que la ventana se promedia sobre el período disponible.
+    """
+    fin = indice['fin'] if hasta is None else np.full(len(indice['fin']), dia_indice(indice, hasta, np.floor))
+    desde = np.maximum(fin - int(dias) + 1, indice['inicio'])
+    total = sumar_ventana_indice(indice, desde, fin)
+    n_dias = fin - desde + 1
+    return np.where(n_dias > 0, total / np.maximum(n_dias, 1), 0.0)
+
+###----------------------------------------------------------------
+# HOLT (DOBLE EXPONENCIAL) VECTORIZADO
+# Misma recursión e inicialización que statsmodels Holt (nivel0 = y0, tendencia0 = y1 - y0):
+#   nivel_t = a*y_t + (1-a)*(nivel + tendencia),  tendencia_t = b*(nivel_t - nivel) + (1-b)*tendencia
+###----------------------------------------------------------------
+def alinear_series_panel(panel, filas):
+    """
+    Copia las series indicadas a una matriz alineada a la izquierda (día 0 = primer registro
+    de cada serie). Retorna la matriz y el largo de cada serie.
+    """
+    inicio, fin = panel['inicio'][filas], panel['fin'][filas]
+    largos = fin - inicio + 1
+    if len(filas) == 0:
+        return np.zeros((0, 0)), largos
+    columnas = np.minimum(inicio[:, None] + np.arange(int(largos.max())), fin[:, None])
+    return panel['valores'][np.asarray(filas)[:, None], columnas], largos
+
+def holt_panel(Y, largos, alpha, beta):
+    """
+    Corre la recursión de Holt sobre todas las series (filas de Y) y todas las combinaciones
+    de parámetros a la vez.
+
+    - alpha, beta: arreglos (n_series × n_combinaciones) o escalares.
+    Retorna (sse, nivel, tendencia) con forma (n_series × n_combinaciones), evaluados al
+    final de cada serie.
+    """
+    alpha = np.atleast_2d(np.asarray(alpha, dtype=np.float64))
+    beta = np.atleast_2d(np.asarray(beta, dtype=np.float64))
+    forma = np.broadcast_shapes((Y.shape[0], 1), alpha.shape, beta.shape)
+
+    nivel = np.broadcast_to(Y[:, :1], forma).copy()
+    tendencia = np.broadcast_to(Y[:, 1:2] - Y[:, :1], forma).copy()
+    sse = np.zeros(forma)
+    for t in range(Y.shape[1]):
+        activa = (t < largos)[:, None]
+        y = Y[:, t:t + 1]
+        prediccion = nivel + tendencia
+        error = y - prediccion
+        nivel_nuevo = alpha * y + (1 - alpha) * prediccion
+        tendencia_nueva = beta * (nivel_nuevo - nivel) + (1 - beta) * tendencia
+        sse = np.where(activa, sse + error * error, sse)
+        nivel = np.where(activa, nivel_nuevo, nivel)
+        tendencia = np.where(activa, tendencia_nueva, tendencia)
+    return sse, nivel, tendencia
+
+def holt_suma_pronostico(nivel, tendencia, horizonte):
+    # Suma de los pronósticos h = 1..horizonte: sum(nivel + h * tendencia)
+    return horizonte * nivel + tendencia * horizonte * (horizonte + 1) / 2
+
+def optimizar_holt_grilla(Y, largos, paso=0.1, pasos_finos=(0.02, 0.005)):
+    """
+    Busca alpha y beta que minimizan el SSE de cada serie, para todas las series a la vez.
+
+    1) Grilla gruesa alpha, beta en [0, 1] con beta <= alpha (la misma restricción que statsmodels).
+    2) Por cada paso fino, grilla de ±4 pasos alrededor del mejor punto de cada serie.
+    Retorna alpha, beta, sse, nivel y tendencia finales de la mejor combinación de cada serie.
+    """
+    filas = np.arange(Y.shape[0])
+    valores = np.round(np.arange(0, 1 + paso / 2, paso), 10)
+    a_grilla, b_grilla = np.meshgrid(valores, valores, indexing='ij')
+    validas = b_grilla <= a_grilla
+    a_grilla, b_grilla = a_grilla[validas][None, :], b_grilla[validas][None, :]
+
+    a_grilla = np.broadcast_to(a_grilla, (len(filas), a_grilla.shape[1]))
+    b_grilla = np.broadcast_to(b_grilla, (len(filas), b_grilla.shape[1]))
+    sse, nivel, tendencia = holt_panel(Y, largos, a_grilla, b_grilla)
+    mejor = np.argmin(sse, axis=1)
+
+    for paso_fino in pasos_finos:
+        a_mejor, b_mejor = a_grilla[filas, mejor], b_grilla[filas, mejor]
+        desplazamientos = np.arange(-4, 5) * paso_fino
+        d_a, d_b = np.meshgrid(desplazamientos, desplazamientos, indexing='ij')
+        a_grilla = np.clip(a_mejor[:, None] + d_a.ravel()[None, :], 0, 1)
+        b_grilla = np.minimum(np.clip(b_mejor[:, None] + d_b.ravel()[None, :], 0, None), a_grilla)
+        sse, nivel, tendencia = holt_panel(Y, largos, a_grilla, b_grilla)
+        mejor = np.argmin(sse, axis=1)
+
+    return {
+        'alpha': a_grilla[filas, mejor],
+        'beta': b_grilla[filas, mejor],
+        'sse': sse[filas, mejor],
+        'nivel': nivel[filas, mejor],
+        'tendencia': tendencia[filas, mejor],
+    }
+
+def holt_statsmodels_serie(y, horizonte):
+    # Ajuste de referencia, idéntico al de Calcular_Demanda_ALGO_02
+    modelo_ajustado = Holt(y).fit(optimized=True)
+    return {
+        'alpha': modelo_ajustado.params['smoothing_level'],
+        'beta': modelo_ajustado.params['smoothing_trend'],
+        'sse': modelo_ajustado.sse,
+        'forecast': modelo_ajustado.forecast(horizonte).sum(),
+    }
+
+def pronostico_holt_grilla_panel(panel, filas, ventana, refinar_top_n=0):
+    """
+    Pronóstico Holt optimizado por grilla para las series 'filas' del panel.
+
+    - refinar_top_n: las N series de mayor volumen se re-ajustan con statsmodels.
+    Retorna el forecast por serie y un DataFrame con los parámetros y el origen de cada ajuste.
+    """
+    detalle = panel['claves'].iloc[filas].reset_index(drop=True)
+    if len(filas) == 0:
+        return np.zeros(0), detalle.assign(alpha=[], beta=[], sse=[], origen=[])
+
+    Y, largos = alinear_series_panel(panel, filas)
+    ajuste = optimizar_holt_grilla(Y, largos)
+    forecast = holt_suma_pronostico(ajuste['nivel'], ajuste['tendencia'], ventana)
+
+    detalle['alpha'] = ajuste['alpha']
+    detalle['beta'] = ajuste['beta']
+    detalle['sse'] = ajuste['sse']
+    detalle['origen'] = 'grilla'
+
+    if refinar_top_n > 0 and len(filas):
+        volumen = Y.sum(axis=1)
+        for j in np.argsort(-volumen, kind='stable')[:refinar_top_n]:
+            try:
+                ref = holt_statsmodels_serie(Y[j, :largos[j]], ventana)
+            except Exception:
+                continue
+            forecast[j] = ref['forecast']
+            detalle.loc[j, ['alpha', 'beta', 'sse', 'origen']] = [ref['alpha'], ref['beta'], ref['sse'], 'statsmodels']
+
+    return forecast, detalle
+
+def validar_holt_panel(df, etiqueta, ventana, muestra=300, panel=None, guardar=True):
+    """
+    Compara el Holt por grilla contra statsmodels (ALGO_02) sobre una muestra de series.
+
+    Informa, por serie, parámetros, SSE y forecast de ambos métodos y sus diferencias, y
+    deja un resumen impreso. Sirve para validar el cambio de HOLT_ALGO_02 antes de adoptarlo.
+    """
+    panel = construir_panel_ventas(df) if panel is None else panel
+    filas = np.flatnonzero(panel['fin'] - panel['inicio'] + 1 >= 2 * 7)
+    if muestra is not None and len(filas) > muestra:
+        filas = np.sort(np.random.default_rng(0).choice(filas, muestra, replace=False))
+
+    forecast, detalle = pronostico_holt_grilla_panel(panel, filas, ventana)
+    detalle = detalle.rename(columns={'alpha': 'alpha_grilla', 'beta': 'beta_grilla', 'sse': 'sse_grilla'}).drop(columns='origen')
+    detalle['forecast_grilla'] = forecast
+
+    referencia = []
+    for i in filas:
+        try:
+            referencia.append(holt_statsmodels_serie(serie_panel(panel, i), ventana))
+        except Exception:
+            referencia.append({'alpha': np.nan, 'beta': np.nan, 'sse': np.nan, 'forecast': np.nan})
+    referencia = pd.DataFrame(referencia, columns=['alpha', 'beta', 'sse', 'forecast'])
+    detalle['alpha_statsmodels'] = referencia['alpha'].to_numpy()
+    detalle['beta_statsmodels'] = referencia['beta'].to_numpy()
+    detalle['sse_statsmodels'] = referencia['sse'].to_numpy()
+    detalle['forecast_statsmodels'] = referencia['forecast'].to_numpy()
+
+    # Diferencias sobre el valor que realmente se publica (ceil y sin negativos)
+    publicado_grilla = np.ceil(np.round(detalle['forecast_grilla'], 2)).clip(lower=0)
+    publicado_sm = np.ceil(np.round(detalle['forecast_statsmodels'], 2)).clip(lower=0)
+    detalle['dif_forecast'] = publicado_grilla - publicado_sm
+    detalle['dif_relativa'] = detalle['dif_forecast'].abs() / publicado_sm.clip(lower=1)
+    detalle['sse_relativo'] = detalle['sse_grilla'] / detalle['sse_statsmodels'].replace(0, np.nan)
+
+    print(f"🔎 Validación Holt grilla vs statsmodels - {etiqueta} - {len(detalle)} series")
+    print(f"   Forecast idéntico: {(detalle['dif_forecast'] == 0).mean():.1%} - "
+          f"dentro de ±1 unidad: {(detalle['dif_forecast'].abs() <= 1).mean():.1%} - "
+          f"dif. relativa media: {detalle['dif_relativa'].mean():.2%} - "
+          f"máxima: {detalle['dif_relativa'].max():.2%}")
+    print(f"   SSE grilla / SSE statsmodels (mediana): {detalle['sse_relativo'].median():.4f}")
+
+    if guardar:
+        file_path = f'{folder}/{etiqueta}_ALGO_02_Validacion_Holt.csv'
+        detalle.to_csv(file_path, index=False)
+        print(f"---> Validación guardada: {file_path}")
+    return detalle
+
+###----------------------------------------------------------------
+# HOLT-WINTERS (ALGO_03) EN PARALELO CON PRESUPUESTO DE TIEMPO POR SERIE
+# Pool de procesos persistente: los workers importan statsmodels una sola vez y se reutilizan
+# entre ejecuciones. Si se fija un presupuesto (ALGO_03_SEGUNDOS_SERIE, apagado por defecto) y una serie
+# lo supera, se usa un pronóstico de respaldo.
+# El presupuesto cubre todos los ajustes candidatos de la serie (arranque tibio y ajuste completo),
+# incluida la grilla de fuerza bruta (use_brute) de statsmodels, que no llama al callback del optimizador.
+###----------------------------------------------------------------
+_POOL_FORECAST = None
+_PROCESOS_POOL_FORECAST = 0
+
+def _iniciar_worker_forecast():
+    # Corre una vez por worker: statsmodels ya queda importado junto con este módulo
+    warnings.simplefilter('ignore')
+
+def obtener_pool_forecast(procesos=None):
+    # Pool reutilizable; se dimensiona por cantidad de CPUs dejando una libre
+    global _POOL_FORECAST, _PROCESOS_POOL_FORECAST
+    if _POOL_FORECAST is None:
+        procesos = procesos or PROCESOS_FORECAST or max(cpu_count() - 1, 1)
+        print(f"⚙️ Iniciando pool de forecast con {procesos} procesos")
+        _POOL_FORECAST = Pool(processes=procesos, initializer=_iniciar_worker_forecast)
+        _PROCESOS_POOL_FORECAST = procesos
+    return _POOL_FORECAST
+
+def cerrar_pool_forecast(forzar=False):
+    global _POOL_FORECAST
+    if _POOL_FORECAST is not None:
+        if forzar:
+            _POOL_FORECAST.terminate()
+        else:
+            _POOL_FORECAST.close()
+        _POOL_FORECAST.join()
+        _POOL_FORECAST = None
+
+atexit.register(cerrar_pool_forecast, True)
+
+###----------------------------------------------------------------
+# CLASIFICACIÓN DE SERIES ANTES DEL AJUSTE
+# - muerta: sin ventas en los últimos DIAS_SERIE_MUERTA días -> forecast 0 sin ajustar nada.
+# - intermitente: intervalo medio entre ventas (ADI) >= UMBRAL_ADI (criterio Syntetos-Boylan)
+#   en los últimos DIAS_CLASIFICACION días -> Croston con corrección SBA, vectorizado.
+# - regular: el resto, que sigue al optimizador del algoritmo.
+###----------------------------------------------------------------
+def clasificar_series_panel(panel, filas, current_date, dias_muerta=None, dias_historia=None, umbral_adi=None):
+    # Retorna un arreglo con 'muerta' / 'intermitente' / 'regular' para cada serie de 'filas'
+    dias_muerta = DIAS_SERIE_MUERTA if dias_muerta is None else dias_muerta
+    dias_historia = DIAS_CLASIFICACION if dias_historia is None else dias_historia
+    umbral_adi = UMBRAL_ADI if umbral_adi is None else umbral_adi
+    clases = np.full(len(filas), 'regular', dtype=object)
+    if len(filas) == 0:
+        return clases
+
+    valores = panel['valores'][filas]
+    hasta = min(dias_ventana_panel(panel, current_date, current_date)[1], valores.shape[1] - 1)
+    recientes = valores[:, max(hasta - dias_muerta + 1, 0):hasta + 1].sum(axis=1)
+
+    desde = np.maximum(panel['inicio'][filas], hasta - dias_historia + 1)
+    columnas = np.arange(valores.shape[1])
+    en_ventana = (columnas >= desde[:, None]) & (columnas <= hasta)
+    dias_con_venta = ((valores > 0) & en_ventana).sum(axis=1)
+    adi = np.maximum(hasta - desde + 1, 1) / np.maximum(dias_con_venta, 1)
+
+    clases[adi >= umbral_adi] = 'intermitente'
+    clases[recientes <= 0] = 'muerta'
+    return clases
+
+def croston_sba_panel(Y, largos, alfa=None):
+    """
+    Croston con corrección SBA para todas las series (filas de Y, alineadas a la izquierda)
+    a la vez: tamaño de la demanda z e intervalo entre demandas p se actualizan solo en los
+    días con venta. Retorna la demanda diaria estimada (1 - alfa/2) * z / p.
+    """
+    alfa = CROSTON_ALFA if alfa is None else alfa
+    n_series = Y.shape[0]
+    z = np.zeros(n_series)
+    p = np.ones(n_series)
+    ultimo = np.full(n_series, -1)
+    for t in range(Y.shape[1]):
+        y = Y[:, t]
+        venta = (t < largos) & (y > 0)
+        primera = venta & (ultimo < 0)
+        siguiente = venta & (ultimo >= 0)
+        z = np.where(primera, y, np.where(siguiente, z + alfa * (y - z), z))
+        p = np.where(primera, t + 1, np.where(siguiente, p + alfa * ((t - ultimo) - p), p))
+        ultimo = np.where(venta, t, ultimo)
+    return np.where(ultimo >= 0, (1 - alfa / 2) * z / p, 0.0)
+
+def pronostico_por_clase(panel, filas, current_date, ventana, clasificar=None):
+    """
+    Clasifica las series y resuelve muertas e intermitentes.
+    Retorna (forecast con NaN en las regulares, máscara de regulares, clases).
+    """
+    clasificar = CLASIFICAR_SERIES if clasificar is None else clasificar
+    forecast = np.full(len(filas), np.nan)
+    if not clasificar:
+        return forecast, np.ones(len(filas), dtype=bool), np.full(len(filas), 'regular', dtype=object)
+
+    clases = clasificar_series_panel(panel, filas, current_date)
+    forecast[clases == 'muerta'] = 0.0
+    intermitentes = np.flatnonzero(clases == 'intermitente')
+    if len(intermitentes):
+        Y, largos = alinear_series_panel(panel, np.asarray(filas)[intermitentes])
+        forecast[intermitentes] = croston_sba_panel(Y, largos) * ventana
+
+    resumen = pd.Series(clases).value_counts().to_dict()
+    print(f"-> Clasificación de series: muertas {resumen.get('muerta', 0)} - intermitentes {resumen.get('intermitente', 0)}"
+          f" - regulares {resumen.get('regular', 0)}")
+    return forecast, clases == 'regular', clases
+
+###----------------------------------------------------------------
+# FORECAST INCREMENTAL: huella de cada serie y reutilización del forecast anterior
+# La huella combina la fecha de inicio y de fin de la serie, el total vendido y los valores de los
+# últimos DIAS_HUELLA días. Si coincide con la guardada (y la configuración del algoritmo es la misma)
+# el forecast de la corrida anterior sigue siendo válido: solo cambia la Fecha_Pronostico.
+###----------------------------------------------------------------
+def ruta_huellas_forecast(etiqueta, algoritmo):
+    return f'{folder}/{etiqueta}_{algoritmo}_Huellas.csv'
+
+def huellas_series_panel(panel, filas, dias=None):
+    dias = DIAS_HUELLA if dias is None else dias
+    acumulado = indice_ventanas_panel(panel)['acumulado']
+    base = panel['fecha_inicio'].toordinal() if len(filas) else 0
+    huellas = []
+    for i in filas:
+        inicio, fin = int(panel['inicio'][i]), int(panel['fin'][i])
+        h = hashlib.blake2b(digest_size=12)
+        h.update(np.array([base + inicio, base + fin], dtype=np.int64).tobytes())
+        h.update(np.array([acumulado[i, fin + 1] - acumulado[i, inicio]], dtype=np.float64).round(6).tobytes())
+        h.update(panel['valores'][i, max(fin - dias + 1, inicio):fin + 1].tobytes())
+        huellas.append(h.hexdigest())
+    return np.array(huellas, dtype=object)
+
+def reutilizables_panel(panel, filas, etiqueta, algoritmo, configuracion, incremental=None):
+    """
+    Compara la huella de cada serie de 'filas' con la de la corrida anterior.
+    Retorna (huellas, máscara de reutilizables, forecast anterior, segundos por serie de la corrida anterior).
+    """
+    incremental = FORECAST_INCREMENTAL if incremental is None else incremental
+    anterior = np.full(len(filas), np.nan)
+    if not incremental:
+        return None, np.zeros(len(filas), dtype=bool), anterior, None
+    huellas = huellas_series_panel(panel, filas)
+    try:
+        previas = pd.read_csv(ruta_huellas_forecast(etiqueta, algoritmo))
+        previas = previas[previas['configuracion'].astype(str) == configuracion]
+    except FileNotFoundError:
+        return huellas, np.zeros(len(filas), dtype=bool), anterior, None
+    except Exception as e:
+        print(f"⚠️ No se pudieron leer las huellas de {etiqueta} {algoritmo}: {e}")
+        return huellas, np.zeros(len(filas), dtype=bool), anterior, None
+
+    claves = panel['claves'].iloc[filas]
+    actuales = pd.DataFrame({'Codigo_Articulo': claves['Codigo_Articulo'].astype(int).to_numpy(),
+                             'Sucursal': claves['Sucursal'].astype(int).to_numpy(),
+                             'huella': huellas})
+    cruce = actuales.merge(previas, on=['Codigo_Articulo', 'Sucursal', 'huella'], how='left')
+    anterior = cruce['forecast'].to_numpy(dtype=np.float64)
+    segundos = previas['segundos_serie'].iloc[0] if len(previas) else None
+    return huellas, cruce['forecast'].notna().to_numpy(), anterior, segundos
+
+def guardar_huellas_forecast(panel, filas, huellas, forecast, etiqueta, algoritmo, configuracion, segundos_serie,
+                             validas=None):
+    # Se guardan las series resueltas por el modelo (ajustadas o reutilizadas) para la próxima corrida.
+    # validas: máscara sobre 'filas'; las series con pronóstico de respaldo o error se vuelven a ajustar
+    # la próxima vez, así que no se guarda su huella.
+    if huellas is None:
+        return
+    validas = np.ones(len(filas), dtype=bool) if validas is None else np.asarray(validas, dtype=bool)
+    validas = validas & ~np.isnan(np.asarray(forecast, dtype=np.float64))
+    claves = panel['claves'].iloc[filas]
+    pd.DataFrame({
+        'Codigo_Articulo': claves['Codigo_Articulo'].astype(int).to_numpy(),
+        'Sucursal': claves['Sucursal'].astype(int).to_numpy(),
+        'huella': huellas,
+        'configuracion': configuracion,
+        'forecast': forecast,
+        'segundos_serie': segundos_serie,
+    })[validas].to_csv(ruta_huellas_forecast(etiqueta, algoritmo), index=False)
+
+def informar_reutilizacion(algoritmo, reutilizadas, ajustadas, segundos_ajuste, segundos_previos):
+    # Ahorro estimado: series reutilizadas × costo medio por serie (de esta corrida o, si no hubo ajustes, de la anterior)
+    segundos_serie = segundos_ajuste / ajustadas if ajustadas else (segundos_previos or 0.0)
+    if reutilizadas:
+        print(f"♻️ {algoritmo}: {reutilizadas} series reutilizadas, {ajustadas} ajustadas - "
+              f"ahorro estimado: {round(reutilizadas * segundos_serie, 2)} seg")
+    return segundos_serie
+
+###----------------------------------------------------------------
+# PARÁMETROS DE AJUSTE PERSISTIDOS (arranque en caliente de ALGO_02 / ALGO_03)
+# Por (proveedor, artículo, sucursal, algoritmo) se guarda el último ajuste de statsmodels:
+# suavizados, estados iniciales y el vector libre del optimizador (mle_retvals.x), que se usa
+# como start_params en la corrida siguiente evitando la búsqueda por fuerza bruta.
+###----------------------------------------------------------------
+COLUMNAS_PARAMETROS = ['id_proveedor', 'Codigo_Articulo', 'Sucursal', 'algoritmo', 'configuracion',
+                       'alpha', 'beta', 'gamma', 'nivel', 'tendencia', 'estaciones', 'inicial',
+                       'largo', 'suma', 'fecha_ajuste']
+
+def ruta_parametros_ajuste(etiqueta, algoritmo):
+    return f'{folder}/{etiqueta}_{algoritmo}_Parametros_Ajuste.csv'
+
+def cargar_parametros_ajuste(etiqueta, algoritmo):
+    # Diccionario (Codigo_Articulo, Sucursal) -> último ajuste; vacío si todavía no hay archivo
+    try:
+        df = pd.read_csv(ruta_parametros_ajuste(etiqueta, algoritmo))
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"⚠️ No se pudieron leer los parámetros previos de {etiqueta} {algoritmo}: {e}")
+        return {}
+    df['estaciones'] = df['estaciones'].fillna('[]').map(json.loads)
+    df['inicial'] = df['inicial'].fillna('[]').map(json.loads)
+    return {(int(r['Codigo_Articulo']), int(r['Sucursal'])): r for r in df.to_dict('records')}
+
+def guardar_parametros_ajuste(etiqueta, algoritmo, previos, registros):
+    # Se actualizan las series ajustadas y se conservan las demás (pueden volver en otra corrida)
+    parametros = dict(previos)
+    parametros.update(registros)
+    if not parametros:
+        return
+    df = pd.DataFrame(list(parametros.values()), columns=COLUMNAS_PARAMETROS)
+    df['estaciones'] = df['estaciones'].map(lambda x: json.dumps([float(v) for v in x]))
+    df['inicial'] = df['inicial'].map(lambda x: json.dumps([float(v) for v in x]))
+    df.to_csv(ruta_parametros_ajuste(etiqueta, algoritmo), index=False)
+    print(f"-> Parámetros de ajuste guardados: {len(registros)} series actualizadas ({etiqueta} {algoritmo})")
+
+def _valor_parametro(valor):
+    # statsmodels informa NaN en los componentes que el modelo no usa
+    return None if valor is None or pd.isna(valor) else float(valor)
+
+def ajustar_suavizado_serie(y, ventana, previo=None, umbral=0.0, configuracion='holt', periodos=None, f2=None, f3=None,
+                            minimize_kwargs=None):
+    """
+    Ajusta Holt (periodos None, como ALGO_02) o Holt-Winters (ALGO_03) usando, si existe, el ajuste previo.
+
+    - previo: registro guardado de la serie (o None). Solo se usa si la configuración coincide y
+      los días ya ajustados no cambiaron (misma suma de ese tramo).
+    - umbral: si los días nuevos son a lo sumo esta fracción del largo, se reutilizan los
+      parámetros sin optimizar.
+
+    Retorna (forecast, registro, estado) con estado 'ok' (ajuste completo), 'tibio' (optimizado
+    desde el ajuste previo) o 'reutilizado'.
+    """
+    holt = periodos is None
+    estado = 'ok'
+    vigente = (previo is not None and previo['configuracion'] == configuracion
+               and 0 < previo['largo'] <= len(y)
+               and abs(float(y[:int(previo['largo'])].sum()) - previo['suma']) < 1e-6)
+
+    if vigente and (len(y) - previo['largo']) / len(y) <= umbral:
+        suavizados = dict(smoothing_level=_valor_parametro(previo['alpha']),
+                          smoothing_trend=_valor_parametro(previo['beta']))
+        if holt:
+            modelo = Holt(y, initialization_method='known', initial_level=previo['nivel'],
+                          initial_trend=_valor_parametro(previo['tendencia']))
+        else:
+            suavizados['smoothing_seasonal'] = _valor_parametro(previo['gamma'])
+            modelo = ExponentialSmoothing(y, trend=f2, seasonal=f3, seasonal_periods=periodos,
+                                          initialization_method='known',
+                                          initial_level=previo['nivel'],
+                                          initial_trend=_valor_parametro(previo['tendencia']),
+                                          initial_seasonal=previo['estaciones'] or None)
+        modelo_ajustado = modelo.fit(**suavizados, optimized=False)
+        estado = 'reutilizado'
+    else:
+        modelo = Holt(y) if holt else ExponentialSmoothing(y, trend=f2, seasonal=f3, seasonal_periods=periodos)
+        modelo_ajustado = None
+        if vigente and previo['inicial']:
+            try:
+                modelo_ajustado = modelo.fit(optimized=True, start_params=np.asarray(previo['inicial']),
+                                             use_brute=False, minimize_kwargs=minimize_kwargs)
+                estado = 'tibio'
+            except ValueError:
+                modelo_ajustado = None      # El vector guardado no corresponde al modelo actual
+        if modelo_ajustado is None:
+            modelo_ajustado = modelo.fit(optimized=True, minimize_kwargs=minimize_kwargs)
+
+    p = modelo_ajustado.params
+    retorno = getattr(modelo_ajustado, 'mle_retvals', None)
+    registro = {
+        'configuracion': configuracion,
+        'alpha': _valor_parametro(p['smoothing_level']),
+        'beta': _valor_parametro(p['smoothing_trend']),
+        'gamma': _valor_parametro(p['smoothing_seasonal']),
+        'nivel': _valor_parametro(p['initial_level']),
+        'tendencia': _valor_parametro(p['initial_trend']),
+        'estaciones': list(np.asarray(p['initial_seasons'], dtype=float)),
+        'inicial': list(retorno.x) if retorno is not None and hasattr(retorno, 'x') else (previo['inicial'] if previo else []),
+        'largo': len(y),
+        'suma': float(y.sum()),
+        'fecha_ajuste': datetime.today().strftime('%Y-%m-%d'),
+    }
+    return modelo_ajustado.forecast(ventana).sum(), registro, estado
+
+def completar_registros_ajuste(panel, filas, registros, id_proveedor, algoritmo):
+    # Agrega la clave de cada serie a los registros devueltos por ajustar_suavizado_serie
+    claves = panel['claves'].iloc[filas]
+    completos = {}
+    for (codigo, sucursal), registro in zip(zip(claves['Codigo_Articulo'], claves['Sucursal']), registros):
+        if registro is not None:
+            completos[(int(codigo), int(sucursal))] = dict(registro, id_proveedor=id_proveedor, Codigo_Articulo=int(codigo),
+                                                           Sucursal=int(sucursal), algoritmo=algoritmo)
+    return completos
+
+def previos_panel(panel, filas, previos):
+    # Ajuste previo de cada serie de 'filas' (None si no hay)
+    claves = panel['claves'].iloc[filas]
+    return [previos.get((int(c), int(s))) for c, s in zip(claves['Codigo_Articulo'], claves['Sucursal'])]
+
+def pronostico_respaldo_estacional(y, ventana, periodos):
+    # Modelo barato: promedio diario de los últimos 4 ciclos estacionales × ventana
+    return float(np.mean(y[-4 * int(periodos):])) * ventana
+
+@contextmanager
+def limitar_tiempo(limite):
+    """
+    Levanta TimeoutError si el bloque sigue corriendo al llegar a 'limite' (time.perf_counter()).
+    Usa un temporizador de señal (SIGALRM), que corta también la grilla de fuerza bruta; donde no
+    está disponible (Windows o fuera del hilo principal) queda solo el control del callback.
+    """
+    if (limite is None or not hasattr(signal, 'setitimer')
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+
+    def vencer(*args):
+        raise TimeoutError
+
+    anterior = signal.signal(signal.SIGALRM, vencer)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, max(limite - time.perf_counter(), 1e-6))
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
+
+def ajustar_holt_winters_serie(tarea):
+    """
+    Ajusta Holt-Winters sobre una serie respetando un presupuesto de segundos.
+    El plazo vale para todos los ajustes candidatos de la serie: lo controla el callback del
+    optimizador y un temporizador (limitar_tiempo) que también corta la grilla de fuerza bruta.
+    Al vencer se devuelve el pronóstico de respaldo.
+
+    tarea = (j, y, ventana, periodos, f2, f3, presupuesto, previo, umbral);
+    retorna (j, forecast, resultado, registro del ajuste).
+    """
+    j, y, ventana, periodos, f2, f3, presupuesto, previo, umbral = tarea
+    limite = time.perf_counter() + presupuesto if presupuesto else None
+
+    def controlar_tiempo(*args):
+        if limite is not None and time.perf_counter() > limite:
+            raise TimeoutError
+
+    try:
+        with limitar_tiempo(limite):
+            forecast, registro, estado = ajustar_suavizado_serie(y, ventana, previo, umbral, f'{periodos}|{f2}|{f3}',
+                                                                 periodos, f2, f3, {'callback': controlar_tiempo})
+        return j, forecast, estado, registro
+    except TimeoutError:
+        return j, pronostico_respaldo_estacional(y, ventana, periodos), 'respaldo', None
+    except Exception:
+        return j, np.nan, 'error', None
+
+def ajustar_holt_winters_bloque(tareas):
+    # Unidad de trabajo enviada al pool: varias series por envío para amortizar el pickle
+    return [ajustar_holt_winters_serie(tarea) for tarea in tareas]
+
+def ajustar_holt_winters_panel(panel, filas, ventana, periodos, f2, f3, paralelo=False, presupuesto=None,
+                               previos=None, umbral=0.0):
+    """
+    Ajusta Holt-Winters para las series 'filas' del panel, en serie o repartiendo las series
+    en el pool de procesos. El resultado queda en el orden de 'filas', sea cual sea el orden
+    en que terminen los workers.
+
+    - previos: ajuste previo de cada serie de 'filas' (ver previos_panel), o None.
+    Retorna (forecast, registros de ajuste por serie, resultado por serie: 'ok', 'tibio', 'reutilizado',
+    'respaldo' o 'error').
+    """
+    forecast = np.full(len(filas), np.nan)
+    resultado = np.full(len(filas), 'pendiente', dtype=object)
+    registros = [None] * len(filas)
+    previos = previos or [None] * len(filas)
+    tareas = [(j, serie_panel(panel, i), ventana, periodos, f2, f3, presupuesto, previos[j], umbral)
+              for j, i in enumerate(filas)]
+
+    if paralelo and len(tareas) > 1:
+        pool = obtener_pool_forecast()
+        bloque = max(1, len(tareas) // (_PROCESOS_POOL_FORECAST * 8))
+        envios = [pool.apply_async(ajustar_holt_winters_bloque, (tareas[k:k + bloque],))
+                  for k in range(0, len(tareas), bloque)]
+        # Resguardo por si un worker queda colgado fuera del optimizador (solo con presupuesto: sin él se espera)
+        espera = presupuesto * bloque + 60 if presupuesto else None
+        try:
+            for envio in envios:
+                for j, valor, estado, registro in envio.get(timeout=espera):
+                    forecast[j], resultado[j], registros[j] = valor, estado, registro
+        except PoolTimeoutError:
+            print(f"⚠️ Pool sin respuesta tras {espera} seg: se reinicia y se completa con el respaldo")
+            cerrar_pool_forecast(forzar=True)
+    else:
+        for tarea in tareas:
+            j, valor, estado, registro = ajustar_holt_winters_serie(tarea)
+            forecast[j], resultado[j], registros[j] = valor, estado, registro
+
+    for j in np.flatnonzero(resultado == 'pendiente'):
+        forecast[j] = pronostico_respaldo_estacional(tareas[j][1], ventana, periodos)
+        resultado[j] = 'respaldo'
+
+    resumen = pd.Series(resultado).value_counts().to_dict()
+    print(f"-> Holt-Winters: {len(filas)} series - {resumen}")
+    return forecast, registros, resultado
+
+###----------------------------------------------------------------
+# ALGORITMOS SOBRE EL PANEL (misma salida que Calcular_Demanda_ALGO_xx)
+###----------------------------------------------------------------
+def Calcular_Demanda_ALGO_01_Panel(df, id_proveedor, etiqueta, period_length, current_date, factor_last, factor_previous, factor_year,
+                                   panel=None):
+    print('Dentro del Calcular_Demanda_ALGO_01_Panel')
+    print(f'FORECAST control: {id_proveedor} - {etiqueta} - ventana: {period_length} - factores: {factor_last} - {factor_previous} - {factor_year}')
+    period_length = int(period_length)
+    factor_last = float(factor_last)
+    factor_previous = float(factor_previous)
+    factor_year = float(factor_year)
+    panel = construir_panel_ventas(df) if panel is None else panel
+
+    # El merge outer del original deja las series con algún registro en cualquiera de los tres períodos
+    rangos = rangos_periodos(current_date, period_length)
+    con_movimiento = np.zeros(len(panel['inicio']), dtype=bool)
+    for desde, hasta in rangos.values():
+        con_movimiento |= contar_ventana_panel(panel, desde, hasta) > 0
+    filas = np.flatnonzero(con_movimiento)
+
+    ventas = ventas_periodos_panel(panel, current_date, period_length)
+    forecast = (ventas['ventas_last'][filas] * factor_last +
+                ventas['ventas_previous'][filas] * factor_previous +
+                ventas['ventas_same_year'][filas] * factor_year)
+
+    return armar_forecast_panel(panel, filas, forecast, None, id_proveedor, 'ALGO_01', period_length,
+                                factor_last, factor_previous, factor_year, current_date, ventas=ventas, decimales=None)
+
+def Calcular_Demanda_ALGO_02_Panel(df, id_proveedor, etiqueta, ventana, current_date, panel=None,
+                                   metodo_holt=None, refinar_top_n=None, arranque_previo=None, umbral=None, clasificar=None,
+                                   incremental=None):
+    """
+    - metodo_holt: 'statsmodels' (ajuste por serie, como el original) o 'grilla' (Holt vectorizado).
+      Por defecto HOLT_ALGO_02 del .env.
+    - refinar_top_n: con 'grilla', las N series de mayor volumen se re-ajustan con statsmodels.
+    - arranque_previo / umbral: con 'statsmodels', arranque desde el último ajuste guardado
+      (AJUSTE_ARRANQUE_PREVIO / AJUSTE_UMBRAL_REUTILIZAR del .env).
+    - clasificar: muertas e intermitentes se resuelven sin ajustar Holt (CLASIFICAR_SERIES del .env).
+    - incremental: las series sin cambios reutilizan el forecast anterior (FORECAST_INCREMENTAL del .env).
+    """
+    print('Dentro del Calcular_Demanda_ALGO_02_Panel')
+    print(f'FORECAST Holt control: {id_proveedor} - {etiqueta} - ventana: {ventana} ')
+    panel = construir_panel_ventas(df) if panel is None else panel
+    metodo_holt = HOLT_ALGO_02 if metodo_holt is None else metodo_holt
+    refinar_top_n = HOLT_REFINAR_TOP_N if refinar_top_n is None else refinar_top_n
+
+    filas = np.flatnonzero(panel['fin'] - panel['inicio'] + 1 >= 2 * 7)
+    forecast, es_regular, _ = pronostico_por_clase(panel, filas, current_date, ventana, clasificar)
+    modeladas = np.flatnonzero(es_regular)
+    configuracion = f'{metodo_holt}|{ventana}'
+    huellas, reutilizable, anterior, segundos_previos = reutilizables_panel(panel, filas[modeladas], etiqueta, 'ALGO_02',
+                                                                            configuracion, incremental)
+    forecast[modeladas[reutilizable]] = anterior[reutilizable]
+    regulares = modeladas[~reutilizable]
+    inicio_ajuste = time.time()
+
+    if metodo_holt == 'grilla':
+        forecast[regulares], _ = pronostico_holt_grilla_panel(panel, filas[regulares], ventana, refinar_top_n)
+        segundos_serie = informar_reutilizacion('ALGO_02', int(reutilizable.sum()), len(regulares),
+                                                time.time() - inicio_ajuste, segundos_previos)
+        guardar_huellas_forecast(panel, filas[modeladas], huellas, forecast[modeladas], etiqueta, 'ALGO_02',
+                                 configuracion, segundos_serie)
+        return armar_forecast_panel(panel, filas, forecast, None, id_proveedor, 'ALGO_02', ventana,
+                                    'na', 'na', 'na', current_date)
+
+    arranque_previo = AJUSTE_ARRANQUE_PREVIO if arranque_previo is None else arranque_previo
+    umbral = AJUSTE_UMBRAL_REUTILIZAR if umbral is None else umbral
+    previos = cargar_parametros_ajuste(etiqueta, 'ALGO_02') if arranque_previo else {}
+    previo_fila = previos_panel(panel, filas, previos) if previos else [None] * len(filas)
+
+    registros = [None] * len(filas)
+    estados = []
+    for j in regulares:
+        i = filas[j]
+        try:
+            forecast[j], registros[j], estado = ajustar_suavizado_serie(serie_panel(panel, i), ventana, previo_fila[j], umbral)
+        except Exception:
+            forecast[j], estado = np.nan, 'error'
+        estados.append(estado)
+    print(f"-> Holt: {len(regulares)} series - {pd.Series(estados).value_counts().to_dict()}")
+    segundos_serie = informar_reutilizacion('ALGO_02', int(reutilizable.sum()), len(regulares),
+                                            time.time() - inicio_ajuste, segundos_previos)
+    guardar_huellas_forecast(panel, filas[modeladas], huellas, forecast[modeladas], etiqueta, 'ALGO_02',
+                             configuracion, segundos_serie)
+    if arranque_previo:
+        guardar_parametros_ajuste(etiqueta, 'ALGO_02', previos,
+                                  completar_registros_ajuste(panel, filas, registros, id_proveedor, 'ALGO_02'))
+
+    return armar_forecast_panel(panel, filas, forecast, None, id_proveedor, 'ALGO_02', ventana,
+                                'na', 'na', 'na', current_date)
+
+def Calcular_Demanda_ALGO_03_Panel(df, id_proveedor, etiqueta, ventana, current_date, periodos, f2, f3, panel=None,
+                                   paralelo=None, presupuesto=None, arranque_previo=None, umbral=None, clasificar=None,
+                                   incremental=None):
+    """
+    - paralelo: reparte los ajustes en el pool de procesos (por defecto ALGO_03_PARALELO del .env).
+    - presupuesto: segundos máximos por serie antes de usar el respaldo (ALGO_03_SEGUNDOS_SERIE; 0 = sin límite).
+    - arranque_previo / umbral: arranque desde el último ajuste guardado
+      (AJUSTE_ARRANQUE_PREVIO / AJUSTE_UMBRAL_REUTILIZAR del .env).
+    - clasificar: muertas e intermitentes se resuelven sin ajustar el modelo (CLASIFICAR_SERIES del .env).
+    - incremental: las series sin cambios reutilizan el forecast anterior (FORECAST_INCREMENTAL del .env).
+    """
+    print('Dentro del Calcular_Demanda_ALGO_03_Panel')
+    print(f'FORECAST control: {id_proveedor} - {etiqueta} - ventana: {ventana} - factores: Períodos Estacionalidad  {periodos} - Tendencia: {f2} - Estacionalidad: {f3}')
+    panel = construir_panel_ventas(df) if panel is None else panel
+    paralelo = ALGO_03_PARALELO if paralelo is None else paralelo
+    presupuesto = ALGO_03_SEGUNDOS_SERIE if presupuesto is None else presupuesto
+
+    arranque_previo = AJUSTE_ARRANQUE_PREVIO if arranque_previo is None else arranque_previo
+    umbral = AJUSTE_UMBRAL_REUTILIZAR if umbral is None else umbral
+
+    filas = np.flatnonzero(panel['fin'] - panel['inicio'] + 1 >= 2 * 7)
+    forecast, es_regular, _ = pronostico_por_clase(panel, filas, current_date, ventana, clasificar)
+    modeladas = np.flatnonzero(es_regular)
+    configuracion = f'{periodos}|{f2}|{f3}|{ventana}'
+    huellas, reutilizable, anterior, segundos_previos = reutilizables_panel(panel, filas[modeladas], etiqueta, 'ALGO_03',
+                                                                            configuracion, incremental)
+    forecast[modeladas[reutilizable]] = anterior[reutilizable]
+    a_ajustar = modeladas[~reutilizable]
+    regulares = filas[a_ajustar]
+
+    inicio_ajuste = time.time()
+    previos = cargar_parametros_ajuste(etiqueta, 'ALGO_03') if arranque_previo else {}
+    forecast[a_ajustar], registros, resultado = ajustar_holt_winters_panel(
+        panel, regulares, ventana, periodos, f2, f3, paralelo, presupuesto,
+        previos_panel(panel, regulares, previos) if previos else None, umbral)
+    segundos_serie = informar_reutilizacion('ALGO_03', int(reutilizable.sum()), len(regulares),
+                                            time.time() - inicio_ajuste, segundos_previos)
+    validas = np.ones(len(modeladas), dtype=bool)
+    validas[~reutilizable] = ~np.isin(resultado, ['respaldo', 'error'])
+    guardar_huellas_forecast(panel, filas[modeladas], huellas, forecast[modeladas], etiqueta, 'ALGO_03',
+                             configuracion, segundos_serie, validas)
+    if arranque_previo:
+        guardar_parametros_ajuste(etiqueta, 'ALGO_03', previos,
+                                  completar_registros_ajuste(panel, regulares, registros, id_proveedor, 'ALGO_03'))
+
+    return armar_forecast_panel(panel, filas, forecast, None, id_proveedor, 'ALGO_03', ventana,
+                                periodos, f2, f3, current_date)
+
+def Calcular_Demanda_ALGO_04_Panel(df, id_proveedor, etiqueta, ventana, current_date, alpha, panel=None):
+    print('Dentro del Calcular_Demanda_ALGO_04_Panel')
+    print(f'FORECAST control: {id_proveedor} - {etiqueta} - ventana: {ventana} - Fator Alpha: {alpha} ')
+    panel = construir_panel_ventas(df) if panel is None else panel
+    alpha = float(alpha)
+
+    ewma = ewma_ultimo_panel(panel, alpha)
+
+    filas = np.arange(len(panel['inicio']))
+    return armar_forecast_panel(panel, filas, ewma * ventana, ewma, id_proveedor, 'ALGO_04', ventana,
+                                alpha, 'na', 'na', current_date)
+
+def Calcular_Demanda_ALGO_05_Panel(df, id_proveedor, etiqueta, ventana, current_date, indice=None, dias_media=30, anclar_en_fecha=False):
+    """
+    PVS vectorizado: no arma el panel denso, usa el índice ordenado de ventas.
+
+    - dias_media: días de historia que se promedian (30 en el método de los compradores).
+    - anclar_en_fecha: si es True la ventana termina en current_date para todas las series;
+      si es False termina en la última venta de cada serie (comportamiento original).
+    """
+    indice = indexar_ventas_ordenadas(df) if indice is None else indice
+
+    media_diaria = promedio_diario_indice(indice, dias_media, current_date if anclar_en_fecha else None)
+    filas = np.arange(len(indice['claves']))
+    ventas = ventas_periodos_indice(indice, current_date, ventana)
+
+    return armar_forecast_panel(indice, filas, media_diaria * ventana, None, id_proveedor, 'ALGO_05', ventana,
+                                'na', 'na', 'na', current_date, ventas=ventas)
+
+def Calcular_Demanda_ALGO_06_Panel(df, id_proveedor, etiqueta, ventana, current_date, panel=None):
+    print('Dentro del Calcular_Demanda_ALGO_06_Panel')
+    print(f'FORECAST Holt control: {id_proveedor} - {etiqueta} - ventana: {ventana}')
+
+    try:
+        forecast_window = int(ventana) // 7  # Semanas de forecast
+        if forecast_window < 4:
+            raise ValueError("La ventana debe ser al menos 28 días para calcular el forecast.")
+    except ValueError:
+        print("Error: La ventana proporcionada no es válida.")
+        return pd.DataFrame()
+
+    panel = construir_panel_ventas(df) if panel is None else panel
+    semanal = panel_semanal(panel)
+
+    filas = np.flatnonzero(semanal['fin'] - semanal['inicio'] + 1 >= 4)
+    if len(filas) == 0:
+        print("Advertencia: No se generaron pronósticos debido a falta de datos.")
+        return pd.DataFrame()
+
+    # Holt con parámetros fijos (0.8, 0.2): una sola recursión vectorizada sobre todas las series semanales
+    Y, largos = alinear_series_panel(semanal, filas)
+    _, nivel, tendencia = holt_panel(Y, largos, 0.8, 0.2)
+    forecast = np.nan_to_num(holt_suma_pronostico(nivel[:, 0], tendencia[:, 0], forecast_window))
+
+    return armar_forecast_panel(panel, filas, forecast, None, id_proveedor, 'ALGO_06', ventana,
+                                'na', 'na', 'na', current_date)
+
+###----------------------------------------------------------------
+# SUMAS POR VENTANA EN EL SERVIDOR (ALGO_01 y ALGO_05)
+# Estos dos algoritmos solo necesitan, por serie, la suma de Unidades en las ventanas de
+# rangos_periodos (y ALGO_05 además la venta de los últimos días con movimiento).
+# Con VENTANAS_EN_SERVIDOR = 'S' en el .env, get_forecast_multiple le pide esas sumas a
+# SQL Server agrupadas por artículo y sucursal (una fila por serie) en lugar de bajar la
+# historia diaria completa. Aplica solo con MOTOR_FORECAST = 'panel' y si todos los
+# algoritmos del proveedor son de ventana; si no, se usa generar_datos como siempre.
+# Los gráficos de S30 y S40 siguen leyendo {etiqueta}_Ventas: si no está vigente se graba solo la
+# cola de los últimos DIAS_COLA_VENTAS días (artefacto 'ventas_cola'), que generar_datos no toma
+# como historia completa.
+###----------------------------------------------------------------
+VENTANAS_EN_SERVIDOR = (secrets.get("VENTANAS_EN_SERVIDOR") or 'N').upper() == 'S'
+ALGORITMOS_VENTANAS = ('ALGO_01', 'ALGO_05')
+# Minigráfico de S40: 6 meses completos más el mes en curso; el detalle de S30 usa los últimos 50 días
+DIAS_COLA_VENTAS = int(secrets.get("DIAS_COLA_VENTAS") or 220)
+
+def usa_ventanas_servidor(algoritmos):
+    return VENTANAS_EN_SERVIDOR and MOTOR_FORECAST == 'panel' and all(a in ALGORITMOS_VENTANAS for a in algoritmos)
+
+def consultar_fecha_corte_ventas(conn, id_proveedor):
+    # Última F_VENTA del proveedor (la fecha que generar_datos toma como current_date por defecto)
+    query = f"""
+    SELECT MAX(V.[F_VENTA]) as Fecha
+    FROM [DCO-DBCORE-P02].[DiarcoEst].[dbo].[T702_EST_VTAS_POR_ARTICULO] V
+    INNER JOIN [DCO-DBCORE-P02].[DiarcoEst].[dbo].[T050_ARTICULOS] A
+        ON V.C_ARTICULO = A.C_ARTICULO
+    WHERE A.[C_PROVEEDOR_PRIMARIO] = {int(id_proveedor)}
+        AND A.M_BAJA ='N'
+        AND V.F_VENTA >= '{FECHA_INICIO_VENTAS}' ;
+    """
+    return pd.to_datetime(pd.read_sql(query, conn)['Fecha'].iloc[0])
+
+def consultar_sumas_ventanas(conn, id_proveedor, current_date, ventanas, dias_media=None):
+    """
+    Sumas de Q_UNIDADES_VENDIDAS por artículo y sucursal, calculadas en el servidor.
+
+    - ventanas: ventanas en días; por cada una vienen ventas_last_{v}, ventas_previous_{v},
+      ventas_same_year_{v} y registros_{v} (filas con venta en alguna de las tres).
+    - dias_media: si se pasa, también ventas_media (venta de los últimos dias_media días hasta
+      la última venta de cada serie), Primera_Venta y Ultima_Venta, y se recorre toda la historia
+      desde FECHA_INICIO_VENTAS; si no, solo se leen las fechas de las ventanas.
+    """
+    columnas, condiciones, desde_min, hasta_max = [], [], None, None
+    for ventana in ventanas:
+        periodos = []
+        for columna, (desde, hasta) in rangos_periodos(current_date, int(ventana)).items():
+            # Mismo criterio que dia_indice: ceil para el desde, floor para el hasta (inclusive)
+            desde, hasta = pd.Timestamp(desde).ceil('D'), pd.Timestamp(hasta).floor('D') + pd.Timedelta(days=1)
+            desde_min = desde if desde_min is None else min(desde_min, desde)
+            hasta_max = hasta if hasta_max is None else max(hasta_max, hasta)
+            condicion = f"V.F_VENTA >= '{desde:%Y%m%d}' AND V.F_VENTA < '{hasta:%Y%m%d}'"
+            periodos.append(f"({condicion})")
+            columnas.append(f"SUM(CASE WHEN {condicion} THEN V.Q_UNIDADES_VENDIDAS ELSE 0 END) as {columna}_{ventana}")
+        columnas.append(f"COUNT(CASE WHEN {' OR '.join(periodos)} THEN 1 END) as registros_{ventana}")
+
+    if dias_media:
+        ultima = ",MAX(V.[F_VENTA]) OVER (PARTITION BY V.[C_ARTICULO], V.[C_SUCU_EMPR]) as F_ULTIMA"
+        filtro = f"V.F_VENTA >= '{FECHA_INICIO_VENTAS}'"
+        columnas += [f"SUM(CASE WHEN V.F_VENTA > DATEADD(day, -{int(dias_media)}, V.F_ULTIMA) THEN V.Q_UNIDADES_VENDIDAS ELSE 0 END) as ventas_media",
+                     "MIN(V.F_VENTA) as Primera_Venta",
+                     "MAX(V.F_VENTA) as Ultima_Venta"]
+    else:
+        ultima = ""
+        filtro = f"V.F_VENTA >= '{desde_min:%Y%m%d}' AND V.F_VENTA < '{hasta_max:%Y%m%d}'"
+    sumas = '\n        ,'.join(columnas)
+    query = f"""
+    WITH V AS (
+        SELECT V.[C_ARTICULO], V.[C_SUCU_EMPR], V.[F_VENTA], V.[Q_UNIDADES_VENDIDAS]
+            {ultima}
+        FROM [DCO-DBCORE-P02].[DiarcoEst].[dbo].[T702_EST_VTAS_POR_ARTICULO] V
+        INNER JOIN [DCO-DBCORE-P02].[DiarcoEst].[dbo].[T050_ARTICULOS] A
+            ON V.C_ARTICULO = A.C_ARTICULO
+        WHERE A.[C_PROVEEDOR_PRIMARIO] = {int(id_proveedor)}
+            AND A.M_BAJA ='N'
+            AND {filtro}
+    )
+    SELECT V.[C_ARTICULO] as Codigo_Articulo
+        ,V.[C_SUCU_EMPR] as Sucursal
+        ,{sumas}
+    FROM V
+    GROUP BY V.[C_ARTICULO], V.[C_SUCU_EMPR]
+    ORDER BY V.[C_ARTICULO], V.[C_SUCU_EMPR] ;
+    """
+    return pd.read_sql(query, conn)
+
+def consultar_cola_ventas(conn, id_proveedor, current_date, dias=None):
+    # Ventas diarias de los últimos 'dias' días (DIAS_COLA_VENTAS): lo que leen los gráficos de S30 y S40
+    dias = DIAS_COLA_VENTAS if dias is None else dias
+    desde = (pd.Timestamp(current_date).normalize() - pd.Timedelta(days=dias)).strftime('%Y%m%d')
+    bloques = [bloque[COLUMNAS_VENTAS] for bloque in consultar_ventas_proveedores(conn, {int(id_proveedor): desde})]
+    return pd.concat(bloques, ignore_index=True) if bloques else pd.DataFrame(columns=COLUMNAS_VENTAS)
+
+def guardar_cola_ventas(cola, id_proveedor, etiqueta, articulos, marca):
+    # Solo las series de artículos VÁLIDOS, como armar_datos_proveedor
+    claves = articulos[['C_ARTICULO', 'C_SUCU_EMPR']].drop_duplicates()
+    claves = claves.rename(columns={'C_ARTICULO': 'Codigo_Articulo', 'C_SUCU_EMPR': 'Sucursal'}).astype('int32')
+    cola = cola.astype({'Codigo_Articulo': 'int32', 'Sucursal': 'int32'}).merge(claves, on=['Codigo_Articulo', 'Sucursal'],
+                                                                              how='inner')
+    file_path = guardar_cache(cola, f'{etiqueta}_Ventas')
+    registrar_cache(f'{etiqueta}_Ventas', id_proveedor, 'ventas_cola', cola, marca)
+    print(f"---> Cola de ventas para gráficos guardada ({DIAS_COLA_VENTAS} días, {len(cola)} filas): {file_path}")
+
+def preparar_sumas_ventanas(sumas, articulos):
+    # Solo las series de artículos VÁLIDOS (como armar_datos_proveedor), en el orden de groupby
+    claves = articulos[['C_ARTICULO', 'C_SUCU_EMPR']].drop_duplicates().astype(int)
+    claves = claves.rename(columns={'C_ARTICULO': 'Codigo_Articulo', 'C_SUCU_EMPR': 'Sucursal'})
+    sumas = sumas.astype({'Codigo_Articulo': int, 'Sucursal': int})
+    sumas = sumas.merge(claves, on=['Codigo_Articulo', 'Sucursal'], how='inner')
+    for columna in ('Primera_Venta', 'Ultima_Venta'):
+        if columna in sumas.columns:
+            sumas[columna] = pd.to_datetime(sumas[columna]).dt.normalize()
+    numericas = sumas.columns.difference(['Codigo_Articulo', 'Sucursal', 'Primera_Venta', 'Ultima_Venta'])
+    sumas[numericas] = sumas[numericas].apply(pd.to_numeric, errors='coerce').fillna(0)
+    return sumas.sort_values(['Codigo_Articulo', 'Sucursal']).reset_index(drop=True)
+
+def generar_sumas_ventanas(id_proveedor, etiqueta, ejecuciones, current_date=None):
+    """
+    Reemplaza a generar_datos cuando todos los algoritmos son de ventana (ver usa_ventanas_servidor).
+
+    - ejecuciones: diccionarios con 'algoritmo' y 'ventana' (como en get_forecast_multiple).
+    Retorna (sumas, articulos, current_date, marca): una fila por serie con las columnas de
+    consultar_sumas_ventanas, la dimensión de artículos, la fecha de referencia y la última venta.
+    La dimensión se toma del cache si está vigente; si no, se consulta en paralelo con las sumas.
+    """
+    start_time = time.time()
+    marca = con_conexion(consultar_fecha_corte_ventas, id_proveedor)
+    current_date = marca if current_date is None else pd.to_datetime(current_date)
+    ventanas = sorted({int(e['ventana']) for e in ejecuciones})
+    dias_media = 30 if any(e['algoritmo'] == 'ALGO_05' for e in ejecuciones) else None
+
+    tareas = {'sumas': lambda: con_conexion(consultar_sumas_ventanas, id_proveedor, current_date, ventanas, dias_media)}
+    vigente, _ = estado_cache(f'{etiqueta}_Articulos')
+    if not vigente:
+        tareas['articulos'] = lambda: con_conexion(consultar_articulos_proveedores, [id_proveedor])
+    # Historia para los gráficos: alcanza con la cola (si el cache completo o la cola siguen vigentes no se consulta)
+    if not estado_cache(f'{etiqueta}_Ventas')[0]:
+        tareas['cola'] = lambda: con_conexion(consultar_cola_ventas, id_proveedor, marca)
+    resultados, _ = consultar_en_paralelo(tareas, etiqueta)
+
+    if vigente:
+        articulos = leer_cache(f'{etiqueta}_Articulos')
+    else:
+        articulos = preparar_articulos(resultados['articulos'], ventanas[0])
+        guardar_cache(articulos, f'{etiqueta}_Articulos')
+        registrar_cache(f'{etiqueta}_Articulos', id_proveedor, 'articulos', articulos, marca)
+    if 'cola' in tareas:
+        guardar_cola_ventas(resultados['cola'], id_proveedor, etiqueta, articulos, marca)
+    sumas = preparar_sumas_ventanas(resultados['sumas'], articulos)
+    kb = resultados['sumas'].memory_usage(deep=True).sum() / 1024
+    print(f"-> Sumas por ventana en el servidor: {len(sumas)} series, {kb:.0f} KB "
+          f"- ventanas {ventanas} - Tiempo: {round(time.time() - start_time, 2)} seg")
+    return sumas, articulos, current_date, marca
+
+def ventas_periodos_sumas(sumas, ventana):
+    return {columna: sumas[f'{columna}_{ventana}'].to_numpy(dtype=np.float64)
+            for columna in ('ventas_last', 'ventas_previous', 'ventas_same_year')}
+
+def Calcular_Demanda_ALGO_01_Ventanas(sumas, id_proveedor, etiqueta, period_length, current_date, factor_last, factor_previous, factor_year):
+    # Igual que Calcular_Demanda_ALGO_01_Panel, con las sumas ya calculadas en el servidor
+    print(f'FORECAST control (sumas del servidor): {id_proveedor} - {etiqueta} - ventana: {period_length} - factores: {factor_last} - {factor_previous} - {factor_year}')
+    period_length = int(period_length)
+    factor_last = float(factor_last)
+    factor_previous = float(factor_previous)
+    factor_year = float(factor_year)
+
+    filas = np.flatnonzero(sumas[f'registros_{period_length}'].to_numpy() > 0)
+    ventas = ventas_periodos_sumas(sumas, period_length)
+    forecast = (ventas['ventas_last'][filas] * factor_last +
+                ventas['ventas_previous'][filas] * factor_previous +
+                ventas['ventas_same_year'][filas] * factor_year)
+
+    return armar_forecast_panel({'claves': sumas[['Codigo_Articulo', 'Sucursal']]}, filas, forecast, None, id_proveedor, 'ALGO_01',
+                                period_length, factor_last, factor_previous, factor_year, current_date, ventas=ventas, decimales=None)
+
+def Calcular_Demanda_ALGO_05_Ventanas(sumas, id_proveedor, etiqueta, ventana, current_date, dias_media=30):
+    # Igual que Calcular_Demanda_ALGO_05_Panel (media hasta la última venta de cada serie)
+    ventana = int(ventana)
+    dias = np.minimum((sumas['Ultima_Venta'] - sumas['Primera_Venta']).dt.days.to_numpy() + 1, dias_media)
+    media_diaria = np.where(dias > 0, sumas['ventas_media'].to_numpy(dtype=np.float64) / np.maximum(dias, 1), 0.0)
+    filas = np.arange(len(sumas))
+
+    return armar_forecast_panel({'claves': sumas[['Codigo_Articulo', 'Sucursal']]}, filas, media_diaria * ventana, None, id_proveedor,
+                                'ALGO_05', ventana, 'na', 'na', 'na', current_date, ventas=ventas_periodos_sumas(sumas, ventana))
 
 ###----------------------------------------------------------------
 # RUTINAS DE PROCESAMIENTO DE ALGORITMOS
-###----------------------------------------------------------------  
+###----------------------------------------------------------------
 
-def Procesar_ALGO_06(data, proveedor, etiqueta, ventana, fecha):
+def Procesar_ALGO_06(data, proveedor, etiqueta, ventana, fecha, panel=None, checkpoint=True):
     print(f'--> Procesar_ALGO_06 ventana {ventana} - fecha {fecha} - No usa Factores')
-    df_forecast = Calcular_Demanda_ALGO_06(data, proveedor, etiqueta, ventana, fecha)    # Exportar el resultado a un CSV para su posterior procesamiento
+    if MOTOR_FORECAST == 'panel':
+        df_forecast = Calcular_Demanda_ALGO_06_Panel(data, proveedor, etiqueta, ventana, fecha, panel=panel)
+    else:
+        df_forecast = Calcular_Demanda_ALGO_06(data, proveedor, etiqueta, ventana, fecha)    # Exportar el resultado a un CSV para su posterior procesamiento
     df_forecast['Codigo_Articulo']= df_forecast['Codigo_Articulo'].astype(int)
     df_forecast['Sucursal']= df_forecast['Sucursal'].astype(int)
-    df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_06_Solicitudes_Compra.csv', index=False)
-    print(f'-> ** Solicitudes Exportadas: {etiqueta}_ALGO_06_Solicitudes_Compra.csv *** : ventana: {ventana}  - {fecha}')
+    if checkpoint:
+        df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_06_Solicitudes_Compra.csv', index=False)
+        print(f'-> ** Solicitudes Exportadas: {etiqueta}_ALGO_06_Solicitudes_Compra.csv *** : ventana: {ventana}  - {fecha}')
     
     # df_validacion = Calcular_Demanda_Extendida_ALGO_06(data, ventana, proveedor, etiqueta, fecha)
     # df_validacion['Codigo_Articulo']= df_validacion['Codigo_Articulo'].astype(int)
@@ -1170,9 +3541,9 @@ def Procesar_ALGO_06(data, proveedor, etiqueta, ventana, fecha):
     # print(f'-> ** Validación Exportada: {etiqueta}_ALGO_06_Datos_Validacion.csv *** : ventana: {ventana}  - {fecha}')
     
     Exportar_Pronostico(df_forecast, proveedor, etiqueta, 'ALGO_06')  # Impactar Datos en la Interface   
-    return
+    return df_forecast
     
-def Procesar_ALGO_05(data, proveedor, etiqueta, ventana, fecha):
+def Procesar_ALGO_05(data, proveedor, etiqueta, ventana, fecha, indice=None, sumas=None, checkpoint=True):
     
         # Determinar la fecha base
     if fecha is None:
@@ -1182,15 +3553,21 @@ def Procesar_ALGO_05(data, proveedor, etiqueta, ventana, fecha):
         
     print(f'--> Procesar_ALGO_05 ventana {ventana} - fecha {fecha} - No usa Factores')
         
-    df_forecast = Calcular_Demanda_ALGO_05(data, proveedor, etiqueta, ventana, fecha)    # Exportar el resultado a un CSV para su posterior procesamiento
+    if sumas is not None:
+        df_forecast = Calcular_Demanda_ALGO_05_Ventanas(sumas, proveedor, etiqueta, ventana, fecha)
+    elif MOTOR_FORECAST == 'panel':
+        df_forecast = Calcular_Demanda_ALGO_05_Panel(data, proveedor, etiqueta, ventana, fecha, indice=indice)
+    else:
+        df_forecast = Calcular_Demanda_ALGO_05(data, proveedor, etiqueta, ventana, fecha)    # Exportar el resultado a un CSV para su posterior procesamiento
     df_forecast['Codigo_Articulo']= df_forecast['Codigo_Articulo'].astype(int)
     df_forecast['Sucursal']= df_forecast['Sucursal'].astype(int)
-    df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_05_Solicitudes_Compra.csv', index=False)
+    if checkpoint:
+        df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_05_Solicitudes_Compra.csv', index=False)
     
     Exportar_Pronostico(df_forecast, proveedor, etiqueta, 'ALGO_05')  # Impactar Datos en la Interface   
-    return
+    return df_forecast
 
-def Procesar_ALGO_04(data, proveedor, etiqueta, ventana, current_date=None,  alfa=None):    
+def Procesar_ALGO_04(data, proveedor, etiqueta, ventana, current_date=None,  alfa=None, panel=None, checkpoint=True):
     # Asignar valores por defecto si los factores no están definidos
     alfa = 0.5 if alfa is None else float(alfa)
     
@@ -1204,15 +3581,19 @@ def Procesar_ALGO_04(data, proveedor, etiqueta, ventana, current_date=None,  alf
     
     print(f'--> Procesar_ALGO_04 ventana {ventana} - fecha {current_date} Peso de los Factores Utilizados: Factor Alpha: {alfa} ')
         
-    df_forecast = Calcular_Demanda_ALGO_04(data, proveedor, etiqueta, ventana, current_date, alfa)
+    if MOTOR_FORECAST == 'panel':
+        df_forecast = Calcular_Demanda_ALGO_04_Panel(data, proveedor, etiqueta, ventana, current_date, alfa, panel=panel)
+    else:
+        df_forecast = Calcular_Demanda_ALGO_04(data, proveedor, etiqueta, ventana, current_date, alfa)
     df_forecast['Codigo_Articulo']= df_forecast['Codigo_Articulo'].astype(int)
     df_forecast['Sucursal']= df_forecast['Sucursal'].astype(int)
-    df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_04_Solicitudes_Compra.csv', index=False)   # Exportar el resultado a un CSV para su posterior procesamiento
+    if checkpoint:
+        df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_04_Solicitudes_Compra.csv', index=False)   # Exportar el resultado a un CSV para su posterior procesamiento
     
     Exportar_Pronostico(df_forecast, proveedor, etiqueta, 'ALGO_04')  # Impactar Datos en la Interface        
-    return
+    return df_forecast
 
-def Procesar_ALGO_03(data, proveedor, etiqueta, ventana, fecha, periodos=None, f2=None, f3=None):    
+def Procesar_ALGO_03(data, proveedor, etiqueta, ventana, fecha, periodos=None, f2=None, f3=None, panel=None, checkpoint=True):
     # Asignar valores por defecto si los factores no están definidos
     periodos = 7 if periodos is None else int(periodos)
     f2 = 'add' if f2 is None else str(f2)  # Incorporar Efecto Estacionalidad
@@ -1220,26 +3601,35 @@ def Procesar_ALGO_03(data, proveedor, etiqueta, ventana, fecha, periodos=None, f
     
     print(f'--> Procesar_ALGO_03 ventana {ventana} - Factores Utilizados: Períodos: {periodos} estacionalidad: {f2} tendencia: {f3}')
         
-    df_forecast = Calcular_Demanda_ALGO_03(data, proveedor, etiqueta, ventana, fecha, periodos, f2, f3)
+    if MOTOR_FORECAST == 'panel':
+        df_forecast = Calcular_Demanda_ALGO_03_Panel(data, proveedor, etiqueta, ventana, fecha, periodos, f2, f3, panel=panel)
+    else:
+        df_forecast = Calcular_Demanda_ALGO_03(data, proveedor, etiqueta, ventana, fecha, periodos, f2, f3)
     df_forecast['Codigo_Articulo']= df_forecast['Codigo_Articulo'].astype(int)
     df_forecast['Sucursal']= df_forecast['Sucursal'].astype(int)
-    df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_03_Solicitudes_Compra.csv', index=False)   # Exportar el resultado a un CSV para su posterior procesamiento
-    print(f'-> ** Datos Exportados: {etiqueta}_ALGO_03_Solicitudes_Compra.csv *** : ventana: {ventana}  - {fecha}')
+    if checkpoint:
+        df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_03_Solicitudes_Compra.csv', index=False)   # Exportar el resultado a un CSV para su posterior procesamiento
+        print(f'-> ** Datos Exportados: {etiqueta}_ALGO_03_Solicitudes_Compra.csv *** : ventana: {ventana}  - {fecha}')
     Exportar_Pronostico(df_forecast, proveedor, etiqueta, 'ALGO_03')  # Impactar Datos en la Interface        
-    return
+    return df_forecast
 
-def Procesar_ALGO_02(data, proveedor, etiqueta, ventana, fecha):    
+def Procesar_ALGO_02(data, proveedor, etiqueta, ventana, fecha, panel=None, checkpoint=True):
     print(f'--> Procesar_ALGO_02 ventana {ventana} - Holt - No usa Factores')
         
-    df_forecast = Calcular_Demanda_ALGO_02(data, proveedor, etiqueta, ventana, fecha)
+    if MOTOR_FORECAST == 'panel':
+        df_forecast = Calcular_Demanda_ALGO_02_Panel(data, proveedor, etiqueta, ventana, fecha, panel=panel)
+    else:
+        df_forecast = Calcular_Demanda_ALGO_02(data, proveedor, etiqueta, ventana, fecha)
     df_forecast['Codigo_Articulo']= df_forecast['Codigo_Articulo'].astype(int)
     df_forecast['Sucursal']= df_forecast['Sucursal'].astype(int)
-    df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_02_Solicitudes_Compra.csv', index=False)   # Exportar el resultado a un CSV para su posterior procesamiento
-    print(f'-> ** Datos Exportados: {etiqueta}_ALGO_02_Solicitudes_Compra.csv *** : ventana: {ventana}  - {fecha}')
+    if checkpoint:
+        df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_02_Solicitudes_Compra.csv', index=False)   # Exportar el resultado a un CSV para su posterior procesamiento
+        print(f'-> ** Datos Exportados: {etiqueta}_ALGO_02_Solicitudes_Compra.csv *** : ventana: {ventana}  - {fecha}')
     Exportar_Pronostico(df_forecast, proveedor, etiqueta, 'ALGO_02')  # Impactar Datos en la Interface        
-    return
+    return df_forecast
 
-def Procesar_ALGO_01(data, proveedor, etiqueta, ventana, fecha, factor_last=None, factor_previous=None, factor_year=None):    
+def Procesar_ALGO_01(data, proveedor, etiqueta, ventana, fecha, factor_last=None, factor_previous=None, factor_year=None, panel=None,
+                     sumas=None, checkpoint=True):
     # Asignar valores por defecto si los factores no están definidos
     factor_last = 0.77 if factor_last is None else factor_last
     factor_previous = 0.22 if factor_previous is None else factor_previous
@@ -1247,17 +3637,64 @@ def Procesar_ALGO_01(data, proveedor, etiqueta, ventana, fecha, factor_last=None
 
     print(f'--> Procesar_ALGO_01 ventana {ventana} - Peso de los Factores Utilizados: último: {factor_last} previo: {factor_previous} año anterior: {factor_year}')
         
-    df_forecast = Calcular_Demanda_ALGO_01(data, proveedor, etiqueta, ventana, fecha, factor_last, factor_previous, factor_year)
+    if sumas is not None:
+        df_forecast = Calcular_Demanda_ALGO_01_Ventanas(sumas, proveedor, etiqueta, ventana, fecha, factor_last, factor_previous, factor_year)
+    elif MOTOR_FORECAST == 'panel':
+        df_forecast = Calcular_Demanda_ALGO_01_Panel(data, proveedor, etiqueta, ventana, fecha, factor_last, factor_previous, factor_year, panel=panel)
+    else:
+        df_forecast = Calcular_Demanda_ALGO_01(data, proveedor, etiqueta, ventana, fecha, factor_last, factor_previous, factor_year)
     df_forecast['Codigo_Articulo']= df_forecast['Codigo_Articulo'].astype(int)
     df_forecast['Sucursal']= df_forecast['Sucursal'].astype(int)
-    df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_01_Solicitudes_Compra.csv', index=False)   # Exportar el resultado a un CSV para su posterior procesamiento
+    if checkpoint:
+        df_forecast.to_csv(f'{folder}/{etiqueta}_ALGO_01_Solicitudes_Compra.csv', index=False)   # Exportar el resultado a un CSV para su posterior procesamiento
     
     Exportar_Pronostico(df_forecast, proveedor, etiqueta, 'ALGO_01')  # Impactar Datos en la Interface        
-    return
+    return df_forecast
 
 ###---------------------------------------------------------------- 
 # RUTINA PRINCIPAL para SELECCIONAR  el ALGORITMO de FORECAST
 ###---------------------------------------------------------------- 
+ALGORITMOS_PANEL = ('ALGO_01', 'ALGO_02', 'ALGO_03', 'ALGO_04', 'ALGO_06')
+VERSION_ALGORITMOS = {'ALGO_01': 1, 'ALGO_02': 1, 'ALGO_03': 1, 'ALGO_04': 1, 'ALGO_05': 1, 'ALGO_06': 1}   # Subir al cambiar un cálculo (invalida los resultados guardados de S10)
+
+def preparar_datos_forecast(data, algoritmos):
+    """
+    Preprocesamiento compartido por todos los algoritmos de un mismo proveedor: el panel denso
+    (ALGO_01..04 y 06) y el índice ordenado (ALGO_05) se arman una sola vez y solo si algún
+    algoritmo de la lista los usa. Con MOTOR_FORECAST = 'clasico' no se prepara nada.
+    """
+    compartidos = {'panel': None, 'indice': None}
+    if MOTOR_FORECAST != 'panel':
+        return compartidos
+    start_time = time.time()
+    if any(algoritmo in ALGORITMOS_PANEL for algoritmo in algoritmos):
+        compartidos['panel'] = construir_panel_ventas(data)
+    if 'ALGO_05' in algoritmos:
+        compartidos['indice'] = indexar_ventas_ordenadas(data)
+    print(f"-> Datos compartidos preparados - Tiempo: {round(time.time() - start_time, 2)} seg")
+    return compartidos
+
+def Procesar_Algoritmo(algorithm, data, id_proveedor, lbl_proveedor, period_lengh, current_date, f1=None, f2=None, f3=None,
+                       panel=None, indice=None, sumas=None, checkpoint=True):
+    # Selección del algoritmo de predicción. Retorna el df_forecast calculado.
+    # sumas: sumas por ventana calculadas en el servidor (solo ALGO_01 y ALGO_05, ver generar_sumas_ventanas)
+    # checkpoint: si es False no se graba {lbl_proveedor}_ALGO_xx_Solicitudes_Compra.csv (el forecast sigue en memoria)
+    match algorithm:
+        case 'ALGO_01':
+            return Procesar_ALGO_01(data, id_proveedor, lbl_proveedor, period_lengh, current_date, f1, f2, f3, panel=panel, sumas=sumas, checkpoint=checkpoint)  # Promedio Ponderado x 3 Factores
+        case 'ALGO_02':
+            return Procesar_ALGO_02(data, id_proveedor, lbl_proveedor, period_lengh, current_date, panel=panel, checkpoint=checkpoint) # Doble Exponencial - Modelo Holt (Tendencia)
+        case 'ALGO_03':
+            return Procesar_ALGO_03(data, id_proveedor, lbl_proveedor, period_lengh, current_date, f1, f2, f3, panel=panel, checkpoint=checkpoint) # Triple Exponencial Holt-WInter (Tendencia + Estacionalidad) (periodos, add, add)
+        case 'ALGO_04':
+            return Procesar_ALGO_04(data, id_proveedor, lbl_proveedor, period_lengh, current_date, f1, panel=panel, checkpoint=checkpoint) # EWMA con Factor alpha
+        case 'ALGO_05':
+            return Procesar_ALGO_05(data, id_proveedor, lbl_proveedor, period_lengh, current_date, indice=indice, sumas=sumas, checkpoint=checkpoint) # Promedio Venta Simple en Ventana
+        case 'ALGO_06':
+            return Procesar_ALGO_06(data, id_proveedor, lbl_proveedor, period_lengh, current_date, panel=panel, checkpoint=checkpoint) # Tendencias Ventas Semanales
+        case _:
+            raise ValueError(f"Error: El algoritmo '{algorithm}' no está implementado.")
+
 def get_forecast( id_proveedor, lbl_proveedor, period_lengh=30, algorithm='basic', f1=None, f2=None, f3=None, current_date=None ):
     """
     Genera la predicción de demanda según el algoritmo seleccionado.
@@ -1266,14 +3703,17 @@ def get_forecast( id_proveedor, lbl_proveedor, period_lengh=30, algorithm='basic
     - id_proveedor: ID del proveedor.
     - lbl_proveedor: Etiqueta del proveedor.
     - period_lengh: Número de días del período a analizar (por defecto 30).
-    - algorithm: Algoritmo a utilizar.
+    - algorithm: Algoritmo a utilizar, o una lista de algoritmos (ver get_forecast_multiple).
     - current_date: Fecha de referencia; si es None, se toma la fecha máxima de los datos.
     - factores de ponderación: F1, F2, F3  (No importa en que unidades estén, luego los hace relativos al total del peso)
 
     Retorna:
     - Un DataFrame con las predicciones.
     """
-    
+    if isinstance(algorithm, (list, tuple)):
+        return get_forecast_multiple(id_proveedor, lbl_proveedor, algorithm, current_date,
+                                     period_lengh=period_lengh, f1=f1, f2=f2, f3=f3)
+
     print('Dentro del get_forecast')
     print(f'FORECAST control: {id_proveedor} - {lbl_proveedor} - ventana: {period_lengh} - {algorithm} factores: {f1} - {f2} - {f3}')
     # Generar los datos de entrada
@@ -1286,34 +3726,106 @@ def get_forecast( id_proveedor, lbl_proveedor, period_lengh=30, algorithm='basic
         current_date = pd.to_datetime(current_date)  # Se asegura que sea un objeto datetime
     print(f'Fecha actual {current_date}')
     
+    return Procesar_Algoritmo(algorithm, data, id_proveedor, lbl_proveedor, period_lengh, current_date, f1, f2, f3)
 
-    # Selección del algoritmo de predicción
-    match algorithm:
-        case 'ALGO_01':
-            return Procesar_ALGO_01(data, id_proveedor, lbl_proveedor, period_lengh, current_date, f1, f2, f3)  # Promedio Ponderado x 3 Factores
-        case 'ALGO_02':
-            return Procesar_ALGO_02(data, id_proveedor, lbl_proveedor, period_lengh, current_date) # Doble Exponencial - Modelo Holt (Tendencia)
-        case 'ALGO_03':
-            return Procesar_ALGO_03(data, id_proveedor, lbl_proveedor, period_lengh, current_date, f1, f2, f3) # Triple Exponencial Holt-WInter (Tendencia + Estacionalidad) (periodos, add, add)
-        case 'ALGO_04':
-            return Procesar_ALGO_04(data, id_proveedor, lbl_proveedor, period_lengh, current_date, f1) # EWMA con Factor alpha
-        case 'ALGO_05':
-            return Procesar_ALGO_05(data, id_proveedor, lbl_proveedor, period_lengh, current_date) # Promedio Venta Simple en Ventana
-        case 'ALGO_06':
-            return Procesar_ALGO_06(data, id_proveedor, lbl_proveedor, period_lengh, current_date) # Tendencias Ventas Semanales
-        case _:
-            raise ValueError(f"Error: El algoritmo '{algorithm}' no está implementado.")
+def get_forecast_multiple(id_proveedor, lbl_proveedor, ejecuciones, current_date=None, period_lengh=30, f1=None, f2=None, f3=None,
+                          checkpoint=True):
+    """
+    Ejecuta varios algoritmos de un mismo proveedor con UNA sola carga de datos y el
+    preprocesamiento compartido. Cada algoritmo genera su {lbl_proveedor}_ALGO_xx_Solicitudes_Compra.csv.
+
+    Parámetros:
+    - ejecuciones: lista de algoritmos ('ALGO_01', ...) o de diccionarios con las claves
+      'algoritmo', 'ventana', 'f1', 'f2', 'f3' (las que falten toman period_lengh / f1 / f2 / f3).
+    - current_date: Fecha de referencia; si es None, se toma la fecha máxima de los datos.
+    - checkpoint: si es False los Solicitudes_Compra.csv no se graban (ver S00_PIPELINE_Completo.py).
+
+    Retorna:
+    - Lista de diccionarios (uno por ejecución, en el mismo orden) con algoritmo, ok, segundos, error,
+      marca_ventas (última venta de los datos usados, según el manifiesto del cache) y forecast
+      (el df_forecast calculado, None si hubo error).
+      Un algoritmo con error no interrumpe al resto.
+
+    Si todos los algoritmos son de ventana y VENTANAS_EN_SERVIDOR = 'S', no se baja la historia
+    de ventas: se usan las sumas por serie calculadas en el servidor (ver generar_sumas_ventanas).
+    Un algoritmo con los mismos insumos que una corrida anterior retoma su resultado guardado (ver clave_etapa).
+    """
+    ejecuciones = [e if isinstance(e, dict) else {'algoritmo': e} for e in ejecuciones]
+    for e in ejecuciones:
+        e.setdefault('ventana', period_lengh)
+        e.setdefault('f1', f1)
+        e.setdefault('f2', f2)
+        e.setdefault('f3', f3)
+    algoritmos = [e['algoritmo'] for e in ejecuciones]
+
+    print('Dentro del get_forecast_multiple')
+    print(f'FORECAST control: {id_proveedor} - {lbl_proveedor} - algoritmos: {algoritmos}')
+    start_time = time.time()
+    compartidos = None
+    if usa_ventanas_servidor(algoritmos):
+        try:
+            sumas, articulos, current_date, marca = generar_sumas_ventanas(id_proveedor, lbl_proveedor, ejecuciones, current_date)
+            data, compartidos = None, {'sumas': sumas}
+            print(f'Fecha actual {current_date} - Sumas por ventana: {round(time.time() - start_time, 2)} seg')
+        except Exception as e:
+            print(f"⚠️ Falló la consulta de sumas por ventana, se baja la historia de ventas: {e}")
+
+    if compartidos is None:
+        data, articulos = generar_datos(id_proveedor, lbl_proveedor, ejecuciones[0]['ventana'])
+
+        if current_date is None:
+            current_date = data['Fecha'].max()  # Se toma la última fecha en los datos
+        else:
+            current_date = pd.to_datetime(current_date)  # Se asegura que sea un objeto datetime
+        print(f'Fecha actual {current_date} - Carga de datos: {round(time.time() - start_time, 2)} seg')
+        marca = marca_cache(f'{lbl_proveedor}_Ventas')
+
+    # Resultados guardados de S10 con los mismos insumos (ver clave_etapa)
+    filas_datos = len(data) if data is not None else len(compartidos['sumas'])
+    claves = [clave_etapa('S10', id_proveedor=int(id_proveedor), algoritmo=e['algoritmo'],
+                          version_algoritmo=VERSION_ALGORITMOS.get(e['algoritmo']), ventana=int(e['ventana']),
+                          f1=e['f1'], f2=e['f2'], f3=e['f3'], fecha=current_date, marca_ventas=marca,
+                          filas_datos=filas_datos, motor=configuracion_motor()) for e in ejecuciones]
+    guardados = [leer_resultado_etapa('S10', clave) for clave in claves]
+
+    if compartidos is None:
+        compartidos = preparar_datos_forecast(data, [e['algoritmo'] for e, g in zip(ejecuciones, guardados) if g is None])
+
+    resultados = []
+    for e, clave, guardado in zip(ejecuciones, claves, guardados):
+        inicio = time.time()
+        try:
+            if guardado is not None:
+                # Se reutiliza el cálculo pero se vuelve a exportar a la precarga, como Procesar_ALGO_xx:
+                # cada ejecución deja sus filas y un reintento repite la inserción si la anterior falló
+                forecast = guardado
+                if checkpoint:
+                    forecast.to_csv(f"{folder}/{lbl_proveedor}_{e['algoritmo']}_Solicitudes_Compra.csv", index=False)
+                Exportar_Pronostico(forecast, id_proveedor, lbl_proveedor, e['algoritmo'])
+            else:
+                forecast = Procesar_Algoritmo(e['algoritmo'], data, id_proveedor, lbl_proveedor, int(e['ventana']), current_date,
+                                              e['f1'], e['f2'], e['f3'], **compartidos, checkpoint=checkpoint)
+                guardar_resultado_etapa('S10', clave, forecast, id_proveedor, marca)
+            resultado = {'algoritmo': e['algoritmo'], 'ok': True, 'error': None, 'forecast': forecast}
+        except Exception as ex:
+            print(f"❌ Error en {e['algoritmo']} de {lbl_proveedor}: {ex}")
+            resultado = {'algoritmo': e['algoritmo'], 'ok': False, 'error': str(ex), 'forecast': None}
+        resultado['segundos'] = round(time.time() - inicio, 2)
+        resultado['marca_ventas'] = marca
+        print(f"⏱️ {e['algoritmo']} - ventana {e['ventana']}: {resultado['segundos']} seg")
+        resultados.append(resultado)
+
+    print(f"✅ {lbl_proveedor}: {len(ejecuciones)} algoritmos - Tiempo total: {round(time.time() - start_time, 2)} seg")
+    return resultados
 
 
 # -----------------------------------------------------------
 # 0. Rutinas Locales para la generación de gráficos
 # -----------------------------------------------------------
-def generar_mini_grafico( folder, name):
-    # Recuperar Historial de Ventas
-    df_ventas = pd.read_csv(f'{folder}/{name}_Ventas.csv')
-    df_ventas['Codigo_Articulo']= df_ventas['Codigo_Articulo'].astype(int)
-    df_ventas['Sucursal']= df_ventas['Sucursal'].astype(int)
-    df_ventas['Fecha']= pd.to_datetime(df_ventas['Fecha'])
+def generar_mini_grafico( folder, name, df_ventas=None):
+    # Recuperar Historial de Ventas (si no viene ya cargado)
+    if df_ventas is None:
+        df_ventas = leer_cache(f'{name}_Ventas', COLUMNAS_VENTAS)
 
     # RUTINA DE MINIGRAFICO
     fecha_maxima = df_ventas["Fecha"].max()   # Obtener la fecha máxima
@@ -1348,10 +3860,68 @@ def generar_mini_grafico( folder, name):
     
     return base64.b64encode(buffer.getvalue()).decode("utf-8")    
 
-def generar_grafico_base64(dfv, articulo, sucursal, Forecast, Average, ventas_last, ventas_previous, ventas_same_year):
+def indexar_ventas_graficos(dfv, dias=50):
+    """
+    Prepara UNA sola vez las ventas para graficar todas las series de un proveedor:
+    - recorte: ventas de los últimos 'dias' días, ordenadas por serie (se conserva el orden original
+      dentro de cada serie), con la posición de cada serie para tomarla sin volver a filtrar dfv.
+    - ventas_json / ventas_base64: las tres sumas de comparación de cada gráfico, calculadas para
+      todas las series con el índice de sumas por ventana del panel.
+    Se asume Fecha sin hora, como la guarda generar_datos.
+    """
     fecha_maxima = dfv["Fecha"].max()
-    df_filtrado = dfv[(dfv["Codigo_Articulo"] == articulo) & (dfv["Sucursal"] == sucursal)]
-    df_filtrado = df_filtrado[df_filtrado["Fecha"] >= (fecha_maxima - pd.Timedelta(days=50))]
+    recorte = dfv[dfv["Fecha"] >= (fecha_maxima - pd.Timedelta(days=dias))]
+    recorte = recorte[recorte["Codigo_Articulo"].notna() & recorte["Sucursal"].notna()]
+    recorte = recorte.sort_values(["Codigo_Articulo", "Sucursal"], kind="stable")
+
+    panel = construir_panel_ventas(recorte)
+    codigo = recorte["Codigo_Articulo"].to_numpy()
+    sucursal = recorte["Sucursal"].to_numpy()
+    cortes = np.flatnonzero(np.r_[True, (codigo[1:] != codigo[:-1]) | (sucursal[1:] != sucursal[:-1]), True])
+    posicion = {(codigo[lo], sucursal[lo]): (lo, hi, i) for i, (lo, hi) in enumerate(zip(cortes[:-1], cortes[1:]))}
+
+    # Mismos límites que generar_grafico_json: (desde, hasta] respecto de la fecha máxima del archivo
+    estricto = pd.Timedelta(1, unit='ns')
+    fecha_inicio_ultimos30 = fecha_maxima - pd.Timedelta(days=30)
+    fecha_inicio_previos30 = fecha_inicio_ultimos30 - pd.Timedelta(days=30)
+    fecha_inicio_anio_anterior = fecha_inicio_ultimos30 - pd.DateOffset(years=1)
+    fecha_fin_anio_anterior = fecha_inicio_previos30 - pd.DateOffset(years=1)
+    ventas_json = np.column_stack([
+        sumar_ventana_panel(panel, fecha_inicio_ultimos30 + estricto, fecha_maxima),
+        sumar_ventana_panel(panel, fecha_inicio_previos30 + estricto, fecha_inicio_ultimos30),
+        sumar_ventana_panel(panel, fecha_inicio_anio_anterior + pd.DateOffset(years=1) + estricto,
+                            fecha_fin_anio_anterior + pd.DateOffset(years=1)),
+    ]) if len(posicion) else np.zeros((0, 3))
+
+    # generar_grafico_base64 toma la fecha máxima de cada serie (su último día con venta)
+    fin = panel['fin']
+    ventas_base64 = np.column_stack([
+        sumar_dias_panel(panel, fin - 29, fin),
+        sumar_dias_panel(panel, fin - 59, fin - 30),
+        np.zeros(len(fin)),     # Rango año anterior vacío (inicio posterior al fin), como en el original
+    ]) if len(posicion) else np.zeros((0, 3))
+
+    return {
+        'recorte': recorte,
+        'posicion': posicion,
+        'ventas_json': ventas_json,
+        'ventas_base64': ventas_base64,
+    }
+
+def serie_grafico(indice, articulo, sucursal, formato):
+    # Ventas de la serie y sus tres sumas de comparación, tomadas del índice de gráficos
+    if (articulo, sucursal) not in indice['posicion']:
+        return indice['recorte'].iloc[0:0].copy(), (0.0, 0.0, 0.0)
+    lo, hi, i = indice['posicion'][(articulo, sucursal)]
+    return indice['recorte'].iloc[lo:hi].copy(), tuple(float(x) for x in indice[f'ventas_{formato}'][i])
+
+def generar_grafico_base64(dfv, articulo, sucursal, Forecast, Average, ventas_last, ventas_previous, ventas_same_year, indice=None):
+    if indice is not None:
+        df_filtrado, ventas_indice = serie_grafico(indice, articulo, sucursal, 'base64')
+    else:
+        fecha_maxima = dfv["Fecha"].max()
+        df_filtrado = dfv[(dfv["Codigo_Articulo"] == articulo) & (dfv["Sucursal"] == sucursal)]
+        df_filtrado = df_filtrado[df_filtrado["Fecha"] >= (fecha_maxima - pd.Timedelta(days=50))]
 
     fig, ax = plt.subplots(
         figsize=(8, 6), nrows= 2, ncols= 2
@@ -1398,28 +3968,31 @@ def generar_grafico_base64(dfv, articulo, sucursal, Forecast, Average, ventas_la
     ax[1, 0].set_ylabel("Unidades")
     ax[1, 0].grid(axis="y", linestyle="--", alpha=0.7)
 
-    # Definir fechas de referencia
-    fecha_maxima = df_filtrado["Fecha"].max()
-    fecha_inicio_ultimos30 = fecha_maxima - pd.Timedelta(days=30)
-    fecha_inicio_previos30 = fecha_inicio_ultimos30 - pd.Timedelta(days=30)
-    fecha_inicio_anio_anterior = fecha_inicio_ultimos30 - pd.DateOffset(years=1)
-    fecha_fin_anio_anterior = fecha_inicio_previos30 - pd.DateOffset(years=1)
-
-    # Calcular ventas de los últimos 30 días
-    ventas_ultimos_30 = df_filtrado[(df_filtrado["Fecha"] > fecha_inicio_ultimos30)]["Unidades"].sum()
-
-    # Calcular ventas de los 30 días previos a los últimos 30 días
-    ventas_previos_30 = df_filtrado[
-        (df_filtrado["Fecha"] > fecha_inicio_previos30) & (df_filtrado["Fecha"] <= fecha_inicio_ultimos30)
-    ]["Unidades"].sum()
-
-    # Simulación de datos para las ventas del año anterior
-    df_filtrado_anio_anterior = df_filtrado.copy()
-    df_filtrado_anio_anterior["Fecha"] = df_filtrado_anio_anterior["Fecha"] - pd.DateOffset(years=1)
-    ventas_mismo_periodo_anio_anterior = df_filtrado_anio_anterior[
-        (df_filtrado_anio_anterior["Fecha"] > fecha_inicio_anio_anterior) &
-        (df_filtrado_anio_anterior["Fecha"] <= fecha_fin_anio_anterior)
-    ]["Unidades"].sum()
+    if indice is not None:
+        ventas_ultimos_30, ventas_previos_30, ventas_mismo_periodo_anio_anterior = ventas_indice
+    else:
+        # Definir fechas de referencia
+        fecha_maxima = df_filtrado["Fecha"].max()
+        fecha_inicio_ultimos30 = fecha_maxima - pd.Timedelta(days=30)
+        fecha_inicio_previos30 = fecha_inicio_ultimos30 - pd.Timedelta(days=30)
+        fecha_inicio_anio_anterior = fecha_inicio_ultimos30 - pd.DateOffset(years=1)
+        fecha_fin_anio_anterior = fecha_inicio_previos30 - pd.DateOffset(years=1)
+
+        # Calcular ventas de los últimos 30 días
+        ventas_ultimos_30 = df_filtrado[(df_filtrado["Fecha"] > fecha_inicio_ultimos30)]["Unidades"].sum()
+
+        # Calcular ventas de los 30 días previos a los últimos 30 días
+        ventas_previos_30 = df_filtrado[
+            (df_filtrado["Fecha"] > fecha_inicio_previos30) & (df_filtrado["Fecha"] <= fecha_inicio_ultimos30)
+        ]["Unidades"].sum()
+
+        # Simulación de datos para las ventas del año anterior
+        df_filtrado_anio_anterior = df_filtrado.copy()
+        df_filtrado_anio_anterior["Fecha"] = df_filtrado_anio_anterior["Fecha"] - pd.DateOffset(years=1)
+        ventas_mismo_periodo_anio_anterior = df_filtrado_anio_anterior[
+            (df_filtrado_anio_anterior["Fecha"] > fecha_inicio_anio_anterior) &
+            (df_filtrado_anio_anterior["Fecha"] <= fecha_fin_anio_anterior)
+        ]["Unidades"].sum()
 
     # Datos para el histograma
     labels = ["Últimos 30", "Anteriores 30", "Año anterior", "Average"]
@@ -1444,10 +4017,7 @@ def generar_grafico_base64(dfv, articulo, sucursal, Forecast, Average, ventas_la
 def insertar_graficos_forecast(algoritmo, name, id_proveedor):
         
     # Recuperar Historial de Ventas
-    df_ventas = pd.read_csv(f'{folder}/{name}_Ventas.csv')
-    df_ventas['Codigo_Articulo']= df_ventas['Codigo_Articulo'].astype(int)
-    df_ventas['Sucursal']= df_ventas['Sucursal'].astype(int)
-    df_ventas['Fecha']= pd.to_datetime(df_ventas['Fecha'])
+    df_ventas = leer_cache(f'{name}_Ventas', COLUMNAS_VENTAS)
 
     # Recuperando Forecast Calculado
     df_forecast = pd.read_csv(f'{folder}/{algoritmo}_Solicitudes_Compra.csv')
@@ -1526,10 +4096,14 @@ def guardar_grafico_base64(base64_str, path_archivo):
         f.write(base64.b64decode(base64_str))
 
 
-def generar_grafico_json(dfv, articulo, sucursal, Forecast, Average, ventas_last, ventas_previous, ventas_same_year):
-    fecha_maxima = dfv["Fecha"].max()
-    df_filtrado = dfv[(dfv["Codigo_Articulo"] == articulo) & (dfv["Sucursal"] == sucursal)]
-    df_filtrado = df_filtrado[df_filtrado["Fecha"] >= (fecha_maxima - pd.Timedelta(days=50))]
+def generar_grafico_json(dfv, articulo, sucursal, Forecast, Average, ventas_last, ventas_previous, ventas_same_year, indice=None):
+    # indice: resultado de indexar_ventas_graficos(dfv); evita filtrar dfv en cada llamada
+    if indice is not None:
+        df_filtrado, ventas_indice = serie_grafico(indice, articulo, sucursal, 'json')
+    else:
+        fecha_maxima = dfv["Fecha"].max()
+        df_filtrado = dfv[(dfv["Codigo_Articulo"] == articulo) & (dfv["Sucursal"] == sucursal)]
+        df_filtrado = df_filtrado[df_filtrado["Fecha"] >= (fecha_maxima - pd.Timedelta(days=50))]
 
     df_filtrado["Media_Movil"] = df_filtrado["Unidades"].rolling(window=7, min_periods=1).mean().fillna(0)
     df_filtrado["Semana"] = df_filtrado["Fecha"].dt.to_period("W").astype(str)
@@ -1538,25 +4112,28 @@ def generar_grafico_json(dfv, articulo, sucursal, Forecast, Average, ventas_last
     df_semanal["Semana_Num"] = df_filtrado.groupby("Semana")["Fecha"].min().reset_index()["Fecha"].dt.isocalendar().week.astype(int)
     df_semanal["Media_Movil"] = df_semanal["Unidades"].rolling(window=7, min_periods=1).mean()
 
-    # Fechas de comparación
-    fecha_inicio_ultimos30 = fecha_maxima - pd.Timedelta(days=30)
-    fecha_inicio_previos30 = fecha_inicio_ultimos30 - pd.Timedelta(days=30)
-    fecha_inicio_anio_anterior = fecha_inicio_ultimos30 - pd.DateOffset(years=1)
-    fecha_fin_anio_anterior = fecha_inicio_previos30 - pd.DateOffset(years=1)
-
-    ventas_ultimos_30 = float(df_filtrado[df_filtrado["Fecha"] > fecha_inicio_ultimos30]["Unidades"].sum().item())
-    ventas_previos_30 = float(df_filtrado[
-        (df_filtrado["Fecha"] > fecha_inicio_previos30) & (df_filtrado["Fecha"] <= fecha_inicio_ultimos30)
-    ]["Unidades"].sum().item())
-
-    df_filtrado_anio_anterior = df_filtrado.copy()
-    df_filtrado_anio_anterior["Fecha"] = df_filtrado_anio_anterior["Fecha"] - pd.DateOffset(years=1)
-    ventas_mismo_periodo_anio_anterior = float(
-        df_filtrado_anio_anterior[
-            (df_filtrado_anio_anterior["Fecha"] > fecha_inicio_anio_anterior) &
-            (df_filtrado_anio_anterior["Fecha"] <= fecha_fin_anio_anterior)
-        ]["Unidades"].sum().item()
-    )
+    if indice is not None:
+        ventas_ultimos_30, ventas_previos_30, ventas_mismo_periodo_anio_anterior = ventas_indice
+    else:
+        # Fechas de comparación
+        fecha_inicio_ultimos30 = fecha_maxima - pd.Timedelta(days=30)
+        fecha_inicio_previos30 = fecha_inicio_ultimos30 - pd.Timedelta(days=30)
+        fecha_inicio_anio_anterior = fecha_inicio_ultimos30 - pd.DateOffset(years=1)
+        fecha_fin_anio_anterior = fecha_inicio_previos30 - pd.DateOffset(years=1)
+
+        ventas_ultimos_30 = float(df_filtrado[df_filtrado["Fecha"] > fecha_inicio_ultimos30]["Unidades"].sum().item())
+        ventas_previos_30 = float(df_filtrado[
+            (df_filtrado["Fecha"] > fecha_inicio_previos30) & (df_filtrado["Fecha"] <= fecha_inicio_ultimos30)
+        ]["Unidades"].sum().item())
+
+        df_filtrado_anio_anterior = df_filtrado.copy()
+        df_filtrado_anio_anterior["Fecha"] = df_filtrado_anio_anterior["Fecha"] - pd.DateOffset(years=1)
+        ventas_mismo_periodo_anio_anterior = float(
+            df_filtrado_anio_anterior[
+                (df_filtrado_anio_anterior["Fecha"] > fecha_inicio_anio_anterior) &
+                (df_filtrado_anio_anterior["Fecha"] <= fecha_fin_anio_anterior)
+            ]["Unidades"].sum().item()
+        )
 
     return {
         "articulo": int(articulo),
@@ -1597,10 +4174,7 @@ def convertir_json(obj):
 def insertar_graficos_json(algoritmo, name, id_proveedor):
         
     # Recuperar Historial de Ventas
-    df_ventas = pd.read_csv(f'{folder}/{name}_Ventas.csv')
-    df_ventas['Codigo_Articulo']= df_ventas['Codigo_Articulo'].astype(int)
-    df_ventas['Sucursal']= df_ventas['Sucursal'].astype(int)
-    df_ventas['Fecha']= pd.to_datetime(df_ventas['Fecha'])
+    df_ventas = leer_cache(f'{name}_Ventas', COLUMNAS_VENTAS)
 
     # Recuperando Forecast Calculado
     df_forecast = pd.read_csv(f'{folder}/{algoritmo}_Solicitudes_Compra.csv')
@@ -1823,19 +4397,8 @@ def get_execution_by_status(status):
     finally:
         Close_Connection(conn)
         
-# Comentario 1 antes del simbolo raro.
-
-# Comentario 1
-def get_execution_execute_by_status(status):
-    if not status:
-        print("No hay estados para filtrar")
-        return None
-    
-    conn = Open_Conn_Postgres()
-    if conn is None:
-        return None
-    try:
-        query = f"""
+# Ejecuciones (execute) con los datos de la ejecución y el modelo que usan los scripts S10..S40
+SELECT_EJECUCIONES_EXECUTE = """
         SELECT   e.name, 
             m.method,
             fee.ext_supplier_code, 
@@ -1853,7 +4416,21 @@ def get_execution_execute_by_status(status):
                 ON fee.supply_forecast_execution_id = e.id
             LEFT JOIN public.spl_supply_forecast_model as m
                 ON e.supply_forecast_model_id= m.id
+"""
 
+# Comentario 1 antes del simbolo raro.
+
+# Comentario 1
+def get_execution_execute_by_status(status):
+    if not status:
+        print("No hay estados para filtrar")
+        return None
+    
+    conn = Open_Conn_Postgres()
+    if conn is None:
+        return None
+    try:
+        query = f"""{SELECT_EJECUCIONES_EXECUTE}
         WHERE fee.supply_forecast_execution_status_id = {status}
             AND fee.last_execution = true
         ORDER BY fee.ext_supplier_code;
@@ -2167,6 +4744,489 @@ def delete_execution_execute(exec_id):
         Close_Connection(conn)
 
 
+# -----------------------------------------------------------
+# 5.1 RECLAMO DE EJECUCIONES CON LEASE (varios workers en paralelo)
+# Un worker reclama filas de spl_supply_forecast_execution_execute en una sola transacción:
+# SELECT ... FOR UPDATE SKIP LOCKED + pasaje al estado en proceso (10->15, 30->35, 40->45).
+# Otro worker que consulta al mismo tiempo salta las filas bloqueadas y ya no las ve en el estado N.
+# Dueño y vencimiento del reclamo quedan en spl_supply_forecast_execution_lease: tabla nueva que agrega
+# S00_MIGRACION_Esquema.py (las tablas de CONNEXA no se modifican). Si el worker muere, al vencer
+# el lease la fila vuelve a N.
+# El 20 no tiene estado intermedio en CONNEXA: la fila sigue en 20 y el lease vigente la oculta a los demás.
+# -----------------------------------------------------------
+ESTADOS_EN_PROCESO = {10: 15, 20: 20, 30: 35, 40: 45}
+LEASE_MINUTOS = float(secrets.get("LEASE_MINUTOS") or 30)
+
+def id_trabajador():
+    # Dueño de los leases de este proceso: host:pid
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+_TABLA_LEASES = {'existe': False}   # Se verifica hasta encontrarla una vez en el proceso
+
+def existe_tabla_leases(cur):
+    # La tabla la crea S00_MIGRACION_Esquema.py; acá solo se comprueba que esté
+    if not _TABLA_LEASES['existe']:
+        cur.execute("SELECT to_regclass('public.spl_supply_forecast_execution_lease') IS NOT NULL")
+        _TABLA_LEASES['existe'] = bool(cur.fetchone()[0])
+    return _TABLA_LEASES['existe']
+
+def normalizar_codigo_proveedor(codigo):
+    # Mismo texto para '189', 189, 189.0 o ' 0189 ' (ver la expresión SQL de reclamar_ejecuciones)
+    if isinstance(codigo, (float, np.floating)) and float(codigo).is_integer():
+        return str(int(codigo))
+    texto = str(codigo).strip()
+    return str(int(texto)) if texto.isdigit() else texto
+
+def liberar_leases_vencidos(cur, status=None):
+    # Devuelve al estado original las filas con lease vencido que siguen en proceso (worker caído)
+    filtro = "" if status is None else "AND l.status_from = %s"
+    cur.execute(f"""
+        WITH vencidos AS (
+            DELETE FROM public.spl_supply_forecast_execution_lease l
+            WHERE l.expires_at < now() {filtro}
+            RETURNING l.supply_forecast_execution_execute_id, l.status_from, l.status_to, l.owner
+        )
+        UPDATE public.spl_supply_forecast_execution_execute fee
+        SET supply_forecast_execution_status_id = v.status_from
+        FROM vencidos v
+        WHERE fee.id::text = v.supply_forecast_execution_execute_id
+            AND fee.supply_forecast_execution_status_id = v.status_to
+        RETURNING fee.id, v.owner
+    """, () if status is None else (status,))
+    recuperadas = cur.fetchall()
+    for exec_id, owner in recuperadas:
+        print(f"♻️ Lease vencido de {owner}: ejecución {exec_id} vuelve a la cola")
+    return len(recuperadas)
+
+def reclamar_ejecuciones(status, owner=None, limite=1, por_proveedor=False, minutos=None, excluir=None, orden=None):
+    """
+    Reclama hasta 'limite' ejecuciones en estado status (10, 20, 30 o 40) y las pasa a su estado en proceso.
+
+    - owner: dueño del lease (por defecto id_trabajador()).
+    - por_proveedor: suma al reclamo las demás ejecuciones pendientes de los mismos proveedores
+      (S10 carga los datos una sola vez por proveedor).
+    - minutos: duración del lease (LEASE_MINUTOS del .env); se extiende con renovar_lease / mantener_lease.
+    - excluir: ids que no se deben reclamar (p. ej. las que ya fallaron en este proceso).
+    - orden: códigos de proveedor en el orden en que se deben tomar (ver prioridad_proveedores);
+      los que no están van al final, por código.
+    Retorna un DataFrame con las mismas columnas que get_execution_execute_by_status (vacío si no quedó nada).
+    """
+    if status not in ESTADOS_EN_PROCESO:
+        raise ValueError(f"El estado {status} no tiene estado en proceso para reclamar")
+    owner = owner or id_trabajador()
+    minutos = LEASE_MINUTOS if minutos is None else minutos
+    excluir = [str(i) for i in (excluir or [])]
+    libre = """
+                AND NOT (fee.id::text = ANY(%(excluir)s))
+                AND NOT EXISTS (SELECT 1 FROM public.spl_supply_forecast_execution_lease l
+                                WHERE l.supply_forecast_execution_execute_id = fee.id::text AND l.expires_at >= now())"""
+
+    conn = Open_Conn_Postgres()
+    if conn is None:
+        return None
+    try:
+        cur = conn.cursor()
+        if not existe_tabla_leases(cur):
+            print("❌ Falta la tabla public.spl_supply_forecast_execution_lease: correr S00_MIGRACION_Esquema.py")
+            conn.rollback()
+            return None
+        liberar_leases_vencidos(cur, status)
+
+        cur.execute(f"""
+            SELECT fee.id, fee.ext_supplier_code
+            FROM public.spl_supply_forecast_execution_execute fee
+            WHERE fee.supply_forecast_execution_status_id = %(status)s
+                AND fee.last_execution = true {libre}
+            ORDER BY array_position(%(orden)s::text[],
+                                    CASE WHEN trim(fee.ext_supplier_code::text) ~ '^[0-9]+$'
+                                         THEN trim(fee.ext_supplier_code::text)::numeric::text
+                                         ELSE trim(fee.ext_supplier_code::text) END),
+                     fee.ext_supplier_code
+            LIMIT %(limite)s
+            FOR UPDATE SKIP LOCKED
+        """, {'status': status, 'limite': int(limite), 'excluir': excluir,
+              'orden': [normalizar_codigo_proveedor(p) for p in (orden or [])]})
+        filas = cur.fetchall()
+        ids = [str(exec_id) for exec_id, _ in filas]
+        if filas and por_proveedor:
+            cur.execute(f"""
+                SELECT fee.id
+                FROM public.spl_supply_forecast_execution_execute fee
+                WHERE fee.supply_forecast_execution_status_id = %(status)s
+                    AND fee.last_execution = true {libre}
+                    AND fee.ext_supplier_code = ANY(%(proveedores)s)
+                FOR UPDATE SKIP LOCKED
+            """, {'status': status, 'excluir': excluir, 'proveedores': list({proveedor for _, proveedor in filas})})
+            ids = list(dict.fromkeys(ids + [str(exec_id) for (exec_id,) in cur.fetchall()]))
+
+        if ids and ESTADOS_EN_PROCESO[status] != status:
+            cur.execute("""
+                UPDATE public.spl_supply_forecast_execution_execute
+                SET supply_forecast_execution_status_id = %s
+                WHERE id::text = ANY(%s)
+            """, (ESTADOS_EN_PROCESO[status], ids))
+        if ids:
+            cur.execute("""
+                INSERT INTO public.spl_supply_forecast_execution_lease
+                    (supply_forecast_execution_execute_id, owner, status_from, status_to, claimed_at, expires_at)
+                SELECT unnest(%s::text[]), %s, %s, %s, now(), now() + %s * interval '1 minute'
+                ON CONFLICT (supply_forecast_execution_execute_id) DO UPDATE
+                    SET owner = EXCLUDED.owner, status_from = EXCLUDED.status_from, status_to = EXCLUDED.status_to,
+                        claimed_at = EXCLUDED.claimed_at, expires_at = EXCLUDED.expires_at
+            """, (ids, owner, status, ESTADOS_EN_PROCESO[status], minutos))
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        print(f"Error en reclamar_ejecuciones: {e}")
+        conn.rollback()
+        return None
+    finally:
+        Close_Connection(conn)
+
+    if not ids:
+        return pd.DataFrame()
+    print(f"🔒 {owner} reclamó {len(ids)} ejecuciones ({status} -> {ESTADOS_EN_PROCESO[status]})")
+    return get_execution_execute_by_ids(ids)
+
+def get_execution_execute_by_ids(ids):
+    conn = Open_Conn_Postgres()
+    if conn is None:
+        return None
+    try:
+        query = f"""{SELECT_EJECUCIONES_EXECUTE}
+        WHERE fee.id::text = ANY(%(ids)s)
+        ORDER BY fee.ext_supplier_code;
+        """
+        return pd.read_sql(query, conn, params={'ids': [str(i) for i in ids]})
+    except Exception as e:
+        print(f"Error en get_execution_execute_by_ids: {e}")
+        return None
+    finally:
+        Close_Connection(conn)
+
+def renovar_lease(ids, owner=None, minutos=None):
+    # Extiende el vencimiento de los leases propios. Retorna cuántos se renovaron (menos que ids = lease perdido)
+    owner = owner or id_trabajador()
+    minutos = LEASE_MINUTOS if minutos is None else minutos
+    conn = Open_Conn_Postgres()
+    if conn is None:
+        return 0
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE public.spl_supply_forecast_execution_lease
+            SET expires_at = now() + %s * interval '1 minute'
+            WHERE supply_forecast_execution_execute_id = ANY(%s) AND owner = %s
+        """, (minutos, [str(i) for i in ids], owner))
+        renovados = cur.rowcount
+        conn.commit()
+        cur.close()
+        return renovados
+    except Exception as e:
+        print(f"Error en renovar_lease: {e}")
+        conn.rollback()
+        return 0
+    finally:
+        Close_Connection(conn)
+
+def liberar_ejecuciones(ids, owner=None, status=None):
+    """
+    Da por terminado el lease de las ejecuciones (solo los del owner).
+    - status: si se pasa, además se deja la fila en ese estado (p. ej. devolverla a la cola);
+      si no, queda en el estado que le puso la etapa.
+    """
+    owner = owner or id_trabajador()
+    conn = Open_Conn_Postgres()
+    if conn is None:
+        return 0
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            DELETE FROM public.spl_supply_forecast_execution_lease
+            WHERE supply_forecast_execution_execute_id = ANY(%s) AND owner = %s
+            RETURNING supply_forecast_execution_execute_id
+        """, ([str(i) for i in ids], owner))
+        propios = [exec_id for (exec_id,) in cur.fetchall()]
+        if propios and status is not None:
+            cur.execute("""
+                UPDATE public.spl_supply_forecast_execution_execute
+                SET supply_forecast_execution_status_id = %s
+                WHERE id::text = ANY(%s)
+            """, (status, propios))
+        conn.commit()
+        cur.close()
+        return len(propios)
+    except Exception as e:
+        print(f"Error en liberar_ejecuciones: {e}")
+        conn.rollback()
+        return 0
+    finally:
+        Close_Connection(conn)
+
+@contextmanager
+def mantener_lease(ids, owner=None, minutos=None):
+    # Renueva el lease en segundo plano (cada tercio de su duración) mientras dura el bloque
+    owner = owner or id_trabajador()
+    minutos = LEASE_MINUTOS if minutos is None else minutos
+    detener = threading.Event()
+
+    def latido():
+        while not detener.wait(minutos * 60 / 3):
+            if renovar_lease(ids, owner, minutos) < len(ids):
+                print(f"⚠️ {owner} perdió el lease de alguna de las ejecuciones {list(ids)}")
+
+    hilo = threading.Thread(target=latido, daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        detener.set()
+        hilo.join()
+
+def atender_reclamo(status, procesar, por_proveedor=False, owner=None, minutos=None, excluir=None, etapa=None, orden=None):
+    """
+    Reclama un lote de ejecuciones en estado status, llama procesar(fes) con el DataFrame reclamado
+    manteniendo el lease y lo libera al terminar. Retorna el DataFrame reclamado (vacío o None si no había).
+    Un error en procesar no se propaga: la fila queda en el estado en que la dejó la etapa.
+    - etapa: etapa que corre procesar, para estimar costos (por defecto la del estado, ver ETAPA_POR_ESTADO).
+    - orden: proveedores del más costoso al menos costoso (ver prioridad_proveedores). Quien reclama en
+      un loop lo calcula una vez por ciclo y lo pasa; si es None y PLANIFICAR_POR_COSTO, se calcula acá.
+    """
+    owner = owner or id_trabajador()
+    if orden is None and PLANIFICAR_POR_COSTO:
+        orden = prioridad_proveedores(status, etapa or ETAPA_POR_ESTADO[status])
+    fes = reclamar_ejecuciones(status, owner, por_proveedor=por_proveedor, minutos=minutos, excluir=excluir, orden=orden)
+    if fes is None or fes.empty:
+        return fes
+    ids = fes['forecast_execution_execute_id'].tolist()
+    with mantener_lease(ids, owner, minutos):
+        try:
+            procesar(fes)
+        except Exception as e:
+            traceback.print_exc()
+            print(f"❌ Error procesando las ejecuciones {ids}: {e}")
+    liberar_ejecuciones(ids, owner)
+    return fes
+
+def drenar_cola(status, procesar, por_proveedor=False, owner=None, minutos=None, etapa=None):
+    # Loop de un worker (--worker en S10..S40): atiende reclamos hasta que no queden pendientes en status
+    owner = owner or id_trabajador()
+    procesadas = 0
+    # Prioridades una sola vez para toda la cola (las que lleguen después van al final)
+    orden = prioridad_proveedores(status, etapa or ETAPA_POR_ESTADO[status]) if PLANIFICAR_POR_COSTO else None
+    while True:
+        fes = atender_reclamo(status, procesar, por_proveedor, owner, minutos, etapa=etapa, orden=orden)
+        if fes is None or fes.empty:
+            break
+        procesadas += len(fes)
+    print(f"✅ Worker {owner}: sin ejecuciones pendientes en estado {status} ({procesadas} procesadas)")
+    return procesadas
+
+
+
+# -----------------------------------------------------------
+# 5.2 AVISOS DE CAMBIO DE ESTADO (LISTEN / NOTIFY)
+# Un trigger sobre spl_supply_forecast_execution_execute publica en CANAL_EJECUCIONES cada alta o cambio
+# de estado (incluidas las que crea ABM_PRONOSTICOS.py), así el daemon despacha la etapa siguiente
+# sin esperar al próximo ciclo del cron. La función y el trigger los instala S00_MIGRACION_Esquema.py;
+# si no están, el daemon sigue solo con el sondeo.
+# -----------------------------------------------------------
+CANAL_EJECUCIONES = secrets.get("CANAL_EJECUCIONES") or "spl_forecast_execute_estado"
+
+def existe_aviso_estados():
+    # True si el trigger de aviso está instalado (ver S00_MIGRACION_Esquema.py)
+    conn = Open_Conn_Postgres()
+    if conn is None:
+        return False
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT EXISTS (SELECT 1 FROM pg_trigger
+                           WHERE tgname = 'spl_aviso_estado_execute'
+                               AND tgrelid = 'public.spl_supply_forecast_execution_execute'::regclass)
+        """)
+        existe = bool(cur.fetchone()[0])
+        cur.close()
+        return existe
+    except Exception as e:
+        print(f"⚠️ No se pudo verificar el aviso de estados: {e}")
+        conn.rollback()
+        return False
+    finally:
+        Close_Connection(conn)
+
+def abrir_escucha_estados():
+    # Conexión dedicada (fuera del pool) en autocommit, suscripta al canal
+    secrets = dotenv_values(".env")
+    conn_str = f"dbname={secrets['BASE4']} user={secrets['USUARIO4']} password={secrets['CONTRASENA4']} host={secrets['SERVIDOR4']} port={secrets['PUERTO4']}"
+    try:
+        conn = pg2.connect(conn_str)
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute(f"LISTEN {CANAL_EJECUCIONES}")
+        cur.close()
+        return conn
+    except Exception as e:
+        print(f"⚠️ No se pudo escuchar el canal {CANAL_EJECUCIONES}: {e}")
+        return None
+
+def esperar_avisos_estados(conn, segundos):
+    """
+    Espera hasta 'segundos' un aviso en el canal. Retorna la lista de avisos recibidos
+    ({'id': ..., 'status': ...}; vacía si venció el tiempo) o None si la conexión se cayó.
+    """
+    if conn is None or conn.closed:
+        time.sleep(segundos)
+        return None
+    try:
+        if select.select([conn], [], [], segundos) == ([], [], []):
+            return []
+        conn.poll()
+        avisos = []
+        while conn.notifies:
+            aviso = conn.notifies.pop(0)
+            try:
+                avisos.append(json.loads(aviso.payload))
+            except ValueError:
+                avisos.append({'id': aviso.payload, 'status': None})
+        return avisos
+    except Exception as e:
+        print(f"⚠️ Se perdió la escucha del canal {CANAL_EJECUCIONES}: {e}")
+        return None
+
+
+# -----------------------------------------------------------
+# 5.3 PLANIFICACIÓN POR COSTO ESTIMADO
+# El costo de una ejecución se estima en unidades relativas: series del proveedor (filas de {etiqueta}_Articulos)
+# por el peso del algoritmo y de la etapa, más las filas de ventas a cargar (filas de {etiqueta}_Ventas).
+# La escala unidades -> segundos sale de los tiempos reales registrados en {folder}/Tiempos_Ejecuciones.csv
+# (mediana del proveedor si tiene historia, si no la de la etapa), así la estimación mejora con cada corrida.
+# Con el costo se reclama primero lo más largo y se reparten proveedores entre procesos (planificar_lotes).
+# -----------------------------------------------------------
+PLANIFICAR_POR_COSTO = (secrets.get("PLANIFICAR_POR_COSTO") or 'S').upper() == 'S'
+ETAPA_POR_ESTADO = {10: 'S10', 20: 'S20', 30: 'S30', 40: 'S40'}
+PESO_ALGORITMOS = {'ALGO_01': 1, 'ALGO_02': 3, 'ALGO_03': 6, 'ALGO_04': 1, 'ALGO_05': 1, 'ALGO_06': 2}   # Por serie (S10)
+PESO_ETAPAS = {'S10': 0, 'S20': 0.1, 'S30': 4, 'S40': 4, 'pipeline': 8}   # Por serie y ejecución, además del algoritmo
+PESO_FILA_VENTAS = 0.001
+ESCALA_INICIAL = 0.01   # Segundos por unidad mientras no hay tiempos registrados
+COLUMNAS_TIEMPOS = ['fecha', 'etapa', 'id_proveedor', 'etiqueta', 'algoritmos', 'series', 'filas', 'unidades',
+                    'estimado_seg', 'real_seg', 'ok']
+
+def ruta_tiempos():
+    return f'{folder}/Tiempos_Ejecuciones.csv'
+
+def leer_tiempos():
+    try:
+        return pd.read_csv(ruta_tiempos())
+    except FileNotFoundError:
+        return pd.DataFrame(columns=COLUMNAS_TIEMPOS)
+
+def medidas_proveedor(etiqueta, manifiesto=None):
+    # (series, filas de ventas) según el manifiesto del cache; None si el proveedor todavía no se extrajo
+    manifiesto = leer_manifiesto_cache() if manifiesto is None else manifiesto
+    filas = manifiesto.set_index('nombre')['filas'].dropna()
+    series, ventas = filas.get(f'{etiqueta}_Articulos'), filas.get(f'{etiqueta}_Ventas')
+    return (None if series is None else int(series)), (None if ventas is None else int(ventas))
+
+def unidades_costo(etapa, algoritmos, series, filas):
+    con_algoritmo = etapa in ('S10', 'pipeline')
+    unidades = sum((PESO_ALGORITMOS.get(a, 1) if con_algoritmo else 0) + PESO_ETAPAS.get(etapa, 1) for a in algoritmos) * series
+    if con_algoritmo:
+        unidades += PESO_FILA_VENTAS * (filas or 0)
+    return unidades
+
+def estimar_costo(etapa, id_proveedor, etiqueta, algoritmos, tiempos=None, manifiesto=None):
+    """
+    Estima la duración de correr 'etapa' para los algoritmos de un proveedor.
+    Retorna un diccionario con series, filas, unidades y estimado_seg.
+    Un proveedor sin cache se estima con la mediana de los tiempos reales de la etapa.
+    """
+    tiempos = leer_tiempos() if tiempos is None else tiempos
+    historia = tiempos[(tiempos['etapa'] == etapa) & (tiempos['ok'] == True) &
+                       (pd.to_numeric(tiempos['unidades']) > 0)].tail(500)
+    series, filas = medidas_proveedor(etiqueta, manifiesto)
+    if series is None:
+        estimado = float(historia['real_seg'].median()) if not historia.empty else 0.0
+        return {'series': None, 'filas': filas, 'unidades': None, 'estimado_seg': round(estimado, 1)}
+
+    unidades = unidades_costo(etapa, algoritmos, series, filas)
+    escalas = historia['real_seg'].astype(float) / historia['unidades'].astype(float)
+    propias = escalas[historia['id_proveedor'].astype(str) == str(id_proveedor)].tail(20)
+    if not propias.empty:
+        escala = propias.median()
+    elif not escalas.empty:
+        escala = escalas.median()
+    else:
+        escala = ESCALA_INICIAL
+    return {'series': series, 'filas': filas, 'unidades': round(unidades, 3), 'estimado_seg': round(float(unidades * escala), 1)}
+
+def registrar_tiempo(etapa, id_proveedor, etiqueta, algoritmos, estimacion, real_seg, ok=True):
+    # Agrega la duración real junto a la estimada (base para calibrar estimar_costo)
+    fila = pd.DataFrame([{'fecha': pd.Timestamp.now().floor('s'), 'etapa': etapa, 'id_proveedor': id_proveedor,
+                          'etiqueta': etiqueta, 'algoritmos': '|'.join(algoritmos), 'series': estimacion['series'],
+                          'filas': estimacion['filas'], 'unidades': estimacion['unidades'],
+                          'estimado_seg': estimacion['estimado_seg'], 'real_seg': round(real_seg, 2), 'ok': ok}])
+    try:
+        with bloquear_archivo(ruta_tiempos()):
+            fila[COLUMNAS_TIEMPOS].to_csv(ruta_tiempos(), mode='a', header=not os.path.exists(ruta_tiempos()), index=False)
+    except Exception as e:
+        print(f"⚠️ No se pudo registrar el tiempo de {etiqueta}: {e}")
+    print(f"⏱️ {etapa} {etiqueta}: estimado {estimacion['estimado_seg']} seg - real {round(real_seg, 1)} seg")
+
+def costos_por_proveedor(fes, etapa):
+    # Costo estimado de cada proveedor pendiente en fes (agrupado por proveedor y etiqueta), de mayor a menor
+    if fes is None or fes.empty:
+        return pd.DataFrame(columns=['ext_supplier_code', 'etiqueta', 'estimado_seg'])
+    tiempos, manifiesto = leer_tiempos(), leer_manifiesto_cache()
+    costos = []
+    for (id_proveedor, etiqueta), grupo in fes.groupby(["ext_supplier_code", fes["name"].str.split('_ALGO').str[0]], sort=False):
+        estimacion = estimar_costo(etapa, id_proveedor, etiqueta, grupo['method'].tolist(), tiempos, manifiesto)
+        costos.append({'ext_supplier_code': id_proveedor, 'etiqueta': etiqueta, 'estimado_seg': estimacion['estimado_seg']})
+    return pd.DataFrame(costos).sort_values('estimado_seg', ascending=False, kind='stable')
+
+def ordenar_grupos_por_costo(fes, etapa):
+    """
+    Grupos ((proveedor, etiqueta), ejecuciones) de fes para recorrer en un solo proceso (cron): del más
+    costoso al menos costoso si PLANIFICAR_POR_COSTO, si no (o si no se pudo estimar) en el orden de la base.
+    """
+    grupos = list(fes.groupby(["ext_supplier_code", fes["name"].str.split('_ALGO').str[0]], sort=False))
+    if not PLANIFICAR_POR_COSTO or len(grupos) < 2:
+        return grupos
+    try:
+        costos = costos_por_proveedor(fes, etapa)
+    except Exception as e:
+        print(f"⚠️ No se pudo estimar el costo de los proveedores ({etapa}), se sigue el orden de la base: {e}")
+        return grupos
+    posicion = {clave: k for k, clave in enumerate(zip(costos['ext_supplier_code'], costos['etiqueta']))}
+    return sorted(grupos, key=lambda grupo: posicion.get(grupo[0], len(posicion)))
+
+def prioridad_proveedores(status, etapa):
+    # Proveedores pendientes en status, del más costoso al menos costoso (None si no se pudo estimar)
+    try:
+        fes = get_execution_execute_by_status(status)
+        fes = fes[fes["fee_status_id"] == status]
+        return costos_por_proveedor(fes, etapa)['ext_supplier_code'].drop_duplicates().tolist()
+    except Exception as e:
+        print(f"⚠️ No se pudo estimar el costo de las ejecuciones en estado {status}: {e}")
+        return None
+
+def planificar_lotes(trabajos, trabajadores):
+    """
+    Reparte trabajos [(clave, costo_seg), ...] entre 'trabajadores' lotes: el más largo primero,
+    siempre al lote con menos carga (LPT), para acortar el tiempo total de la tanda.
+    Retorna (lotes, cargas): listas de claves y segundos estimados de cada lote.
+    """
+    lotes = [[] for _ in range(max(1, int(trabajadores)))]
+    cargas = [0.0] * len(lotes)
+    for clave, costo in sorted(trabajos, key=lambda t: t[1], reverse=True):
+        i = cargas.index(min(cargas))
+        lotes[i].append(clave)
+        cargas[i] += costo
+    print(f"📋 {len(trabajos)} trabajos en {len(lotes)} lotes - tiempo estimado de la tanda: {round(max(cargas), 1)} seg "
+          f"(secuencial: {round(sum(cargas), 1)} seg)")
+    return lotes, cargas
+
+
 # -----------------------------------------------------------
 # 6. Operaciones CRUD para spl_supply_forecast_execution_execute_result
 # -----------------------------------------------------------
@@ -0,0 +1,61 @@
+"""
+Configuración común de las pruebas.
+
+funciones_forecast lee el .env del directorio actual al importarse (FOLDER_DATOS es obligatorio),
+así que antes de importarlo se arma una carpeta temporal con un .env mínimo y se trabaja desde ahí.
+Las pruebas no se conectan a ninguna base: solo usan los algoritmos sobre datos sintéticos.
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARPETA_PRUEBAS = tempfile.mkdtemp(prefix='forecast_pruebas_')
+
+with open(os.path.join(CARPETA_PRUEBAS, '.env'), 'w') as archivo:
+    archivo.write(f'FOLDER_DATOS={CARPETA_PRUEBAS}\n')
+os.chdir(CARPETA_PRUEBAS)
+sys.path.insert(0, RAIZ)
+
+def armar_ventas(n_articulos=6, n_sucursales=3, dias=240, semilla=0):
+    """
+    Ventas diarias sintéticas (formato largo, como {name}_Ventas) con series de largo variable,
+    más algunas series intermitentes y otras sin ventas en los últimos meses.
+    """
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range('2024-01-01', periods=dias, freq='D')
+    filas = []
+    for a in range(n_articulos):
+        for s in range(n_sucursales):
+            desde = int(rng.integers(0, dias // 3))
+            for f in fechas[desde:]:
+                if rng.random() < 0.6:
+                    filas.append((f, 1000 + a, s + 1, float(rng.poisson(4))))
+    for a in range(3):
+        # Intermitentes: pocas ventas repartidas en todo el período
+        for f in fechas:
+            if rng.random() < 0.12:
+                filas.append((f, 5000 + a, 1, float(rng.integers(1, 4))))
+    for a in range(2):
+        # Muertas: vendieron al principio y dejaron de vender
+        for f in fechas[:dias // 3]:
+            filas.append((f, 7000 + a, 2, float(rng.poisson(2))))
+    df = pd.DataFrame(filas, columns=['Fecha', 'Codigo_Articulo', 'Sucursal', 'Unidades'])
+    return df.sample(frac=1, random_state=semilla).reset_index(drop=True)
+
+@pytest.fixture(scope='session')
+def ff():
+    import funciones_forecast
+    return funciones_forecast
+
+@pytest.fixture(scope='session')
+def ventas():
+    return armar_ventas()
+
+@pytest.fixture(scope='session')
+def fecha_pronostico(ventas):
+    return ventas['Fecha'].max()
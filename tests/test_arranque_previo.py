@@ -0,0 +1,23 @@
+"""
+Arranque desde el ajuste previo (AJUSTE_ARRANQUE_PREVIO): opcional y, al reutilizar los parámetros
+sin optimizar, con los mismos estados iniciales que el ajuste guardado.
+"""
+import numpy as np
+import pytest
+
+def test_arranque_previo_apagado_por_defecto(ff):
+    assert ff.AJUSTE_ARRANQUE_PREVIO is False
+
+@pytest.mark.parametrize('periodos', [None, 7])
+def test_reutilizado_reproduce_el_ajuste_guardado(ff, ventas, periodos):
+    panel = ff.construir_panel_ventas(ventas)
+    y = ff.serie_panel(panel, 0)
+    configuracion = 'holt' if periodos is None else f'{periodos}|add|add'
+    argumentos = dict(configuracion=configuracion, periodos=periodos, f2='add', f3='add') if periodos else {}
+
+    forecast, registro, estado = ff.ajustar_suavizado_serie(y, 30, **argumentos)
+    assert estado == 'ok'
+    # Misma serie y umbral 1: se reutilizan los parámetros guardados sin optimizar
+    reutilizado, _, estado = ff.ajustar_suavizado_serie(y, 30, registro, 1.0, **argumentos)
+    assert estado == 'reutilizado'
+    np.testing.assert_allclose(reutilizado, forecast, rtol=1e-8)
@@ -0,0 +1,30 @@
+"""
+Lectura del cache: primero el formato de CACHE_FORMATO y el otro solo si ese archivo no existe.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+@pytest.fixture
+def versiones(ff, ventas):
+    # Mismo cache en los dos formatos con contenidos distintos, para saber cuál se leyó
+    nombre = 'PRUEBA_FORMATOS_Ventas'
+    ff.guardar_cache(ventas.iloc[:10], nombre, 'parquet')
+    ff.guardar_cache(ventas.iloc[:20], nombre, 'csv')
+    yield nombre
+    ff.borrar_cache(nombre, manifiesto=False)
+
+@pytest.mark.parametrize('formato, filas', [('parquet', 10), ('csv', 20)])
+def test_lee_primero_el_formato_configurado(ff, monkeypatch, versiones, formato, filas):
+    monkeypatch.setattr(ff, 'CACHE_FORMATO', formato)
+    assert len(ff.leer_cache(versiones, ff.COLUMNAS_VENTAS)) == filas
+    assert sum(len(b) for b in ff.leer_cache_por_bloques(versiones, ff.COLUMNAS_VENTAS, filas_bloque=3)) == filas
+
+@pytest.mark.parametrize('formato, filas', [('parquet', 20), ('csv', 10)])
+def test_usa_el_otro_formato_si_falta(ff, monkeypatch, versiones, formato, filas):
+    monkeypatch.setattr(ff, 'CACHE_FORMATO', formato)
+    os.remove(ff.ruta_cache(versiones, formato))
+    leido = ff.leer_cache(versiones, ff.COLUMNAS_VENTAS)
+    assert len(leido) == filas
+    assert pd.api.types.is_datetime64_any_dtype(leido['Fecha'])
@@ -0,0 +1,48 @@
+"""
+CLASIFICAR_SERIES es opcional: apagada, ALGO_02 y ALGO_03 sobre el panel deben dar exactamente
+lo mismo que los algoritmos originales (Calcular_Demanda_ALGO_02 / _03).
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNAS_COMPARADAS = ['Forecast', 'Average', 'ventas_last', 'ventas_previous', 'ventas_same_year']
+
+def ordenar(df):
+    return df.sort_values(['Codigo_Articulo', 'Sucursal']).reset_index(drop=True)
+
+def comparar(esperado, obtenido):
+    esperado, obtenido = ordenar(esperado), ordenar(obtenido)
+    assert list(esperado.columns) == list(obtenido.columns)
+    pd.testing.assert_frame_equal(esperado[['Codigo_Articulo', 'Sucursal']].astype(int),
+                                  obtenido[['Codigo_Articulo', 'Sucursal']].astype(int))
+    for columna in COLUMNAS_COMPARADAS:
+        np.testing.assert_allclose(esperado[columna].astype(float), obtenido[columna].astype(float),
+                                   rtol=0, atol=1e-9, err_msg=columna)
+
+def test_clasificacion_apagada_por_defecto(ff):
+    assert ff.CLASIFICAR_SERIES is False
+
+def test_algo_02_sin_clasificar_igual_al_original(ff, ventas, fecha_pronostico):
+    esperado = ff.Calcular_Demanda_ALGO_02(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico)
+    por_defecto = ff.Calcular_Demanda_ALGO_02_Panel(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico,
+                                                    metodo_holt='statsmodels', arranque_previo=False, incremental=False)
+    explicito = ff.Calcular_Demanda_ALGO_02_Panel(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico,
+                                                  metodo_holt='statsmodels', arranque_previo=False, incremental=False,
+                                                  clasificar=False)
+    comparar(esperado, por_defecto)
+    comparar(esperado, explicito)
+
+def test_algo_03_sin_clasificar_igual_al_original(ff, ventas, fecha_pronostico):
+    esperado = ff.Calcular_Demanda_ALGO_03(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico, 7, 'add', 'add')
+    obtenido = ff.Calcular_Demanda_ALGO_03_Panel(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico, 7, 'add', 'add',
+                                                 paralelo=False, presupuesto=0, arranque_previo=False,
+                                                 incremental=False, clasificar=False)
+    comparar(esperado, obtenido)
+
+def test_clasificacion_encendida_cambia_muertas_e_intermitentes(ff, ventas, fecha_pronostico):
+    # Control de que los datos de prueba ejercitan la clasificación: encendida, las muertas quedan en 0
+    obtenido = ordenar(ff.Calcular_Demanda_ALGO_02_Panel(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico,
+                                                         metodo_holt='statsmodels', arranque_previo=False,
+                                                         incremental=False, clasificar=True))
+    muertas = obtenido[obtenido['Codigo_Articulo'].astype(int) >= 7000]
+    assert len(muertas) and (muertas['Forecast'] == 0).all()
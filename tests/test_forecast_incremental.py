@@ -0,0 +1,29 @@
+"""
+Forecast incremental (FORECAST_INCREMENTAL): opcional y sin huellas para las series que quedaron
+con el pronóstico de respaldo.
+"""
+import os
+
+import pandas as pd
+
+def test_incremental_apagado_por_defecto(ff):
+    assert ff.FORECAST_INCREMENTAL is False
+
+def test_no_guarda_huellas_de_respaldo(ff, ventas, fecha_pronostico):
+    ruta = ff.ruta_huellas_forecast('PRUEBA_RESPALDO', 'ALGO_03')
+    # Presupuesto ínfimo: todos los ajustes se cortan y quedan con el respaldo estacional
+    ff.Calcular_Demanda_ALGO_03_Panel(ventas.copy(), 1, 'PRUEBA_RESPALDO', 30, fecha_pronostico, 7, 'add', 'add',
+                                      paralelo=False, presupuesto=1e-9, arranque_previo=False,
+                                      clasificar=False, incremental=True)
+    assert os.path.exists(ruta)
+    assert pd.read_csv(ruta).empty
+
+def test_reutiliza_series_ajustadas(ff, ventas, fecha_pronostico):
+    argumentos = dict(paralelo=False, presupuesto=0, arranque_previo=False, clasificar=False, incremental=True)
+    primero = ff.Calcular_Demanda_ALGO_03_Panel(ventas.copy(), 1, 'PRUEBA_REUSO', 30, fecha_pronostico,
+                                                7, 'add', 'add', **argumentos)
+    huellas = pd.read_csv(ff.ruta_huellas_forecast('PRUEBA_REUSO', 'ALGO_03'))
+    assert len(huellas) == len(primero)
+    segundo = ff.Calcular_Demanda_ALGO_03_Panel(ventas.copy(), 1, 'PRUEBA_REUSO', 30, fecha_pronostico,
+                                                7, 'add', 'add', **argumentos)
+    pd.testing.assert_frame_equal(primero, segundo)
@@ -0,0 +1,29 @@
+"""
+Foto de artículos por corrida: solo se usa mientras es reciente (FOTO_ARTICULOS_HORAS); vencida o sin
+registrar en el manifiesto se vuelve a consultar la base.
+"""
+import pandas as pd
+import pytest
+
+@pytest.fixture
+def foto(ff):
+    nombre = 'PRUEBA_FOTO_Articulos'
+    articulos = pd.DataFrame({'C_PROVEEDOR_PRIMARIO': 189, 'C_ARTICULO': [2, 1, 1], 'C_SUCU_EMPR': [1, 1, 1],
+                              'Q_STOCK_UNIDADES': [5.0, 3.0, 4.0]})
+    ff.guardar_cache(articulos, nombre)
+    yield nombre
+    ff.borrar_cache(nombre)
+
+def test_foto_registrada_y_reciente(ff, foto):
+    ff.registrar_cache(foto, 189, 'articulos', 3)
+    leida = ff.leer_foto_articulos(189, 'PRUEBA_FOTO_ALGO_01')
+    assert leida['C_ARTICULO'].tolist() == [1, 2]
+    assert ff.leer_foto_articulos(190, 'PRUEBA_FOTO') is None
+
+def test_foto_sin_registrar_se_consulta(ff, foto):
+    assert ff.leer_foto_articulos(189, 'PRUEBA_FOTO') is None
+
+def test_foto_vencida_se_consulta(ff, monkeypatch, foto):
+    ff.registrar_cache(foto, 189, 'articulos', 3)
+    monkeypatch.setattr(ff, 'FOTO_ARTICULOS_HORAS', 0)
+    assert ff.leer_foto_articulos(189, 'PRUEBA_FOTO') is None
@@ -0,0 +1,71 @@
+"""
+Paridad del motor sobre el panel denso (Calcular_Demanda_ALGO_xx_Panel) con los algoritmos originales
+(Calcular_Demanda_ALGO_xx): mismos datos de prueba, mismas series y el mismo Forecast y Average.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+def ordenar(df):
+    return df.sort_values(['Codigo_Articulo', 'Sucursal']).reset_index(drop=True)
+
+def comparar(esperado, obtenido, columnas=('Forecast', 'Average')):
+    esperado, obtenido = ordenar(esperado), ordenar(obtenido)
+    assert list(esperado.columns) == list(obtenido.columns)
+    assert len(esperado) > 0
+    pd.testing.assert_frame_equal(esperado[['Codigo_Articulo', 'Sucursal']].astype(int),
+                                  obtenido[['Codigo_Articulo', 'Sucursal']].astype(int))
+    for columna in columnas:
+        np.testing.assert_allclose(esperado[columna].astype(float), obtenido[columna].astype(float),
+                                   rtol=0, atol=1e-9, err_msg=columna)
+
+def test_algo_01_panel_igual_al_original(ff, ventas, fecha_pronostico):
+    esperado = ff.Calcular_Demanda_ALGO_01(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico, 0.5, 0.3, 0.2)
+    obtenido = ff.Calcular_Demanda_ALGO_01_Panel(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico, 0.5, 0.3, 0.2)
+    comparar(esperado, obtenido)
+
+@pytest.mark.parametrize('alpha', [0.1, 0.5, 0.9])
+def test_algo_04_panel_igual_al_original(ff, ventas, fecha_pronostico, alpha):
+    esperado = ff.Calcular_Demanda_ALGO_04(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico, alpha)
+    obtenido = ff.Calcular_Demanda_ALGO_04_Panel(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico, alpha)
+    comparar(esperado, obtenido)
+
+@pytest.mark.parametrize('ventana', [15, 30])
+def test_algo_05_panel_igual_al_original(ff, ventas, fecha_pronostico, ventana):
+    esperado = ff.Calcular_Demanda_ALGO_05(ventas.copy(), 1, 'PRUEBA', ventana, fecha_pronostico)
+    obtenido = ff.Calcular_Demanda_ALGO_05_Panel(ventas.copy(), 1, 'PRUEBA', ventana, fecha_pronostico)
+    comparar(esperado, obtenido)
+
+def test_algo_06_panel_igual_al_original(ff, ventas, fecha_pronostico):
+    esperado = ff.Calcular_Demanda_ALGO_06(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico)
+    obtenido = ff.Calcular_Demanda_ALGO_06_Panel(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico)
+    comparar(esperado, obtenido)
+
+def test_algo_02_panel_igual_al_original(ff, ventas, fecha_pronostico):
+    esperado = ff.Calcular_Demanda_ALGO_02(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico)
+    obtenido = ff.Calcular_Demanda_ALGO_02_Panel(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico,
+                                                 metodo_holt='statsmodels', arranque_previo=False,
+                                                 incremental=False, clasificar=False)
+    comparar(esperado, obtenido)
+
+@pytest.mark.parametrize('paralelo', [False, True])
+def test_algo_03_panel_igual_al_original(ff, ventas, fecha_pronostico, paralelo):
+    esperado = ff.Calcular_Demanda_ALGO_03(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico, 7, 'add', 'add')
+    try:
+        obtenido = ff.Calcular_Demanda_ALGO_03_Panel(ventas.copy(), 1, 'PRUEBA', 30, fecha_pronostico, 7, 'add', 'add',
+                                                     paralelo=paralelo, presupuesto=0, arranque_previo=False,
+                                                     incremental=False, clasificar=False)
+    finally:
+        ff.cerrar_pool_forecast()
+    comparar(esperado, obtenido)
+
+@pytest.mark.parametrize('period_length', [7, 30, 90])
+def test_ventanas_panel_iguales_al_original(ff, period_length):
+    # Más de un año de historia para que ventas_same_year no quede en cero
+    from conftest import armar_ventas
+    ventas = armar_ventas(dias=450, semilla=1)
+    fecha = ventas['Fecha'].max()
+    esperado = ff.Calcular_Demanda_ALGO_01(ventas.copy(), 1, 'PRUEBA', period_length, fecha, 0.5, 0.3, 0.2)
+    obtenido = ff.Calcular_Demanda_ALGO_01_Panel(ventas.copy(), 1, 'PRUEBA', period_length, fecha, 0.5, 0.3, 0.2)
+    assert (esperado['ventas_same_year'] > 0).any()
+    comparar(esperado, obtenido, ('Forecast', 'Average', 'ventas_last', 'ventas_previous', 'ventas_same_year'))
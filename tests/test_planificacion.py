@@ -0,0 +1,31 @@
+"""
+Planificación por costo en el camino de un solo proceso (cron): los proveedores se recorren del más
+costoso al menos costoso cuando PLANIFICAR_POR_COSTO está activo.
+"""
+import pandas as pd
+import pytest
+
+@pytest.fixture
+def fes():
+    return pd.DataFrame({'ext_supplier_code': [10, 10, 20, 30],
+                         'name': ['10_A_ALGO_01', '10_A_ALGO_05', '20_B_ALGO_01', '30_C_ALGO_03'],
+                         'method': ['ALGO_01', 'ALGO_05', 'ALGO_01', 'ALGO_03']})
+
+@pytest.fixture
+def costos(ff, monkeypatch):
+    tabla = pd.DataFrame({'ext_supplier_code': [30, 10, 20], 'etiqueta': ['30_C', '10_A', '20_B'],
+                          'estimado_seg': [90.0, 40.0, 5.0]})
+    monkeypatch.setattr(ff, 'costos_por_proveedor', lambda fes, etapa: tabla)
+
+def claves(grupos):
+    return [clave for clave, _ in grupos]
+
+def test_ordena_del_mas_costoso_al_menos_costoso(ff, monkeypatch, fes, costos):
+    monkeypatch.setattr(ff, 'PLANIFICAR_POR_COSTO', True)
+    grupos = ff.ordenar_grupos_por_costo(fes, 'S10')
+    assert claves(grupos) == [(30, '30_C'), (10, '10_A'), (20, '20_B')]
+    assert len(grupos[1][1]) == 2
+
+def test_sin_planificar_respeta_el_orden_de_la_base(ff, monkeypatch, fes, costos):
+    monkeypatch.setattr(ff, 'PLANIFICAR_POR_COSTO', False)
+    assert claves(ff.ordenar_grupos_por_costo(fes, 'S10')) == [(10, '10_A'), (20, '20_B'), (30, '30_C')]
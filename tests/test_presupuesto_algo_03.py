@@ -0,0 +1,30 @@
+"""
+Presupuesto de tiempo por serie de ALGO_03: corta también la grilla de fuerza bruta de statsmodels.
+"""
+import time
+
+import numpy as np
+import pytest
+
+def test_presupuesto_apagado_por_defecto(ff):
+    assert ff.ALGO_03_SEGUNDOS_SERIE == 0
+
+@pytest.mark.skipif(not hasattr(__import__('signal'), 'setitimer'), reason='sin temporizador de señal')
+def test_presupuesto_corta_la_fuerza_bruta(ff):
+    # Serie larga: la grilla de arranque sola tarda varios segundos
+    y = np.random.default_rng(0).poisson(5, 300000).astype(float) + 1
+    inicio = time.perf_counter()
+    j, forecast, estado, registro = ff.ajustar_holt_winters_serie((0, y, 30, 7, 'add', 'add', 0.2, None, 0.0))
+    assert time.perf_counter() - inicio < 2
+    assert estado == 'respaldo' and registro is None
+    assert forecast == pytest.approx(ff.pronostico_respaldo_estacional(y, 30, 7))
+
+def test_paralelo_igual_que_en_serie(ff, ventas):
+    panel = ff.construir_panel_ventas(ventas)
+    filas = np.arange(min(6, len(panel['claves'])))
+    en_serie, _, _ = ff.ajustar_holt_winters_panel(panel, filas, 30, 7, 'add', 'add', presupuesto=60)
+    try:
+        paralelo, _, _ = ff.ajustar_holt_winters_panel(panel, filas, 30, 7, 'add', 'add', paralelo=True, presupuesto=60)
+    finally:
+        ff.cerrar_pool_forecast()
+    np.testing.assert_allclose(paralelo, en_serie)
@@ -0,0 +1,18 @@
+"""
+Índices de las tablas de referencia: con códigos repetidos gana la fila más reciente (o la de mayor id),
+sin importar el orden en que respondió la base.
+"""
+import pandas as pd
+
+def test_codigo_repetido_gana_el_mas_reciente(ff):
+    tabla = pd.DataFrame({'code': ['2', '1', '2', 'x'], 'name': list('abcd'), 'id': ['s2b', 's1', 's2a', 'sx'],
+                          'modificado': pd.to_datetime(['2025-01-01', '2025-01-01', '2025-03-01', None])})
+    for orden in (tabla, tabla.iloc[::-1]):
+        referencia = ff.armar_referencia('sitios', orden, {})
+        assert referencia['dict'] == {1: 's1', 2: 's2a'}
+        assert referencia['codigos'].tolist() == [1, 2]
+
+def test_codigo_repetido_sin_fecha_gana_el_mayor_id(ff):
+    tabla = pd.DataFrame({'code': ['2', '2', '1'], 'name': list('abc'), 'id': ['s2b', 's2a', 's1']})
+    for orden in (tabla, tabla.iloc[::-1]):
+        assert ff.armar_referencia('sitios', orden, {})['dict'] == {1: 's1', 2: 's2b'}